@@ -14,6 +14,8 @@ import os
 from pathlib import Path
 import datetime
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -58,9 +60,12 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.replicas.PrimaryPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    # Below CorsMiddleware so replayed responses get the CORS headers
+    'core.idempotency.IdempotencyMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -73,6 +78,13 @@ CORS_ALLOWED_ORIGINS = [
      "http://localhost:8000",
  ]
 
+CORS_ALLOW_HEADERS = list(default_headers) + [
+    'idempotency-key',
+    'if-match',
+]
+
+CORS_EXPOSE_HEADERS = ['etag', 'idempotent-replayed']
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -105,6 +117,80 @@ DATABASES = {
     }
 }
 
+# Read replicas, comma separated hosts in DB_REPLICA_HOSTS. Without any, a
+# replica alias mirroring the primary is still defined so routing can be
+# exercised locally, but reads are only routed to configured replicas.
+REPLICA_HOSTS = [
+    host for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if host
+]
+for number, host in enumerate(REPLICA_HOSTS or [DATABASES['default']['HOST']]):
+    DATABASES['replica_%d' % (number + 1)] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [
+    'replica_%d' % (number + 1) for number in range(len(REPLICA_HOSTS))
+]
+
+# Owner shards for stores and groceries. DB_SHARDS lists extra shards as
+# comma separated host/name pairs; 'default' is always shard 0 and keeps
+# users and everything else. Without any, a shard_1 database next to the
+# primary is defined for local testing but no user is placed on it.
+SHARD_DATABASES = [
+    shard.split('/') for shard in os.environ.get('DB_SHARDS', '').split(',')
+    if shard
+]
+for number, (host, name) in enumerate(SHARD_DATABASES or [
+    (DATABASES['default']['HOST'], '%s_shard_1' % DATABASES['default']['NAME'])
+]):
+    DATABASES['shard_%d' % (number + 1)] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'NAME': name,
+    }
+
+DATABASE_SHARDS = ['default'] + [
+    'shard_%d' % (number + 1) for number in range(len(SHARD_DATABASES))
+]
+
+DATABASE_ROUTERS = [
+    'core.sharding.ShardRouter',
+    'core.replicas.PrimaryReplicaRouter',
+]
+
+# Seconds a user keeps reading from the primary after a write
+REPLICA_PIN_SECONDS = 10
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/3.2/topics/auth/passwords/
+# The first hasher is used for new hashes. Passwords stored with another
+# hasher or other parameters are rehashed on the next successful login.
+
+PASSWORD_HASHERS = [
+    'core.hashers.TunedArgon2PasswordHasher',
+    'core.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+# Overrides of core.hashers.DEFAULTS from the environment:
+# ARGON2_TIME_COST, ARGON2_MEMORY_COST, ARGON2_PARALLELISM,
+# PBKDF2_ITERATIONS and POOL_SIZE, the threads hashing passwords
+# (0 hashes in the request thread) from PASSWORD_HASHING_POOL_SIZE.
+PASSWORD_HASHING = {
+    name: int(os.environ[variable])
+    for name, variable in [
+        ('ARGON2_TIME_COST', 'ARGON2_TIME_COST'),
+        ('ARGON2_MEMORY_COST', 'ARGON2_MEMORY_COST'),
+        ('ARGON2_PARALLELISM', 'ARGON2_PARALLELISM'),
+        ('PBKDF2_ITERATIONS', 'PBKDF2_ITERATIONS'),
+        ('POOL_SIZE', 'PASSWORD_HASHING_POOL_SIZE'),
+    ]
+    if variable in os.environ
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -144,6 +230,10 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# Uploaded and generated files, e.g. the data export archives
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', BASE_DIR / 'media')
+MEDIA_URL = '/media/'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -155,6 +245,46 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    # JSON stays the default, mobile clients can ask for MessagePack
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'core.renderers.MessagePackRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        'core.renderers.MessagePackParser',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'user_search': '60/min',
+        'data_export': '3/day',
+        # Token buckets for the auth endpoints, '<throttle_scope>_<kind>'
+        'login_ip': '30/min',
+        'login_email': '10/min',
+        'register_ip': '20/hour',
+        'register_email': '5/hour',
+        'verify_email_ip': '30/min',
+        'password_reset_ip': '10/hour',
+        'password_reset_email': '3/hour',
+    },
+    # Reverse proxies in front of the app. Client IPs for the throttles
+    # come from X-Forwarded-For only that many hops deep, from
+    # REMOTE_ADDR when 0, so clients cannot pick their own IP.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+}
+
+# Throttle buckets live in the cache. Use a shared backend (e.g. Redis or
+# Memcached) in production so every worker sees the same buckets.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
 }
 
 EMAIL_USE_TLS = True
@@ -167,6 +297,50 @@ SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
 
+# Completed stores older than this are moved to the archive tables
+STORE_ARCHIVE_AFTER_DAYS = int(os.environ.get('STORE_ARCHIVE_AFTER_DAYS', 30))
+
+# Accounts still unverified this many days after sign up are deleted
+UNVERIFIED_ACCOUNT_DAYS = int(os.environ.get('UNVERIFIED_ACCOUNT_DAYS', 7))
+
+# Data export archives are deleted this many days after they were asked for
+DATA_EXPORT_DAYS = int(os.environ.get('DATA_EXPORT_DAYS', 7))
+
+GROCERY_SUGGESTIONS = {
+    # Users whose name index is kept in memory, least recently used first out
+    'CACHE_SIZE': 1000,
+    # Seconds before an index is rebuilt to pick up other workers' writes
+    'TTL': 300,
+}
+
+IDEMPOTENCY = {
+    # Seconds a POST response is replayed for retries with the same key
+    'TTL': 24 * 60 * 60,
+    # Seconds before a crashed request stops blocking its duplicates
+    'LOCK_TIMEOUT': 60,
+}
+
+TASKS = {
+    # Calls of a failing task before it is kept as failed
+    'MAX_ATTEMPTS': 3,
+    # Seconds a worker may run a task before another worker takes it over
+    'VISIBILITY_TIMEOUT': 300,
+    # Seconds before the first retry, doubled for each later one
+    'RETRY_DELAY': 30,
+    # Seconds an idle worker waits before polling the queue again
+    'POLL_INTERVAL': 1,
+    # Task name: seconds between runs, enqueued by the run_worker workers
+    'PERIODIC': {
+        'core.tasks.purge_deleted': 60 * 60,
+        'core.tasks.archive_stores': 24 * 60 * 60,
+        'core.tasks.run_recurring_stores': 5 * 60,
+        'core.tasks.rollup_analytics': 5 * 60,
+        'core.tasks.rebalance_positions': 24 * 60 * 60,
+        'core.tasks.purge_unverified': 60 * 60,
+        'core.tasks.purge_exports': 60 * 60,
+    },
+}
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': datetime.timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': datetime.timedelta(days=3)
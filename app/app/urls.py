@@ -30,4 +30,5 @@ urlpatterns = [
     ),
     path('api/user/', include('user.urls')),
     path('api/stores/', include('groceries_list.urls')),
+    path('api/profile/', include('myProfile.urls')),
 ]
@@ -0,0 +1,124 @@
+"""
+Account deletion in bounded batches.
+
+Deleting a User through the ORM collects every related row in memory and
+deletes them in one transaction. request_deletion instead deactivates
+the user at once, so they can no longer sign in, and queues
+delete_account, which removes their rows on every shard one batch at a
+time, recording progress in AccountDeletion, then deletes the user row.
+Every batch commits on its own and reruns of the task carry on where a
+previous one stopped. A deletion whose task failed for good is FAILED
+and is queued again by retry_deletion, from the admin or a new request.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import (
+    AccountDeletion,
+    ArchivedGrocery,
+    ArchivedStore,
+    DataExport,
+    Grocery,
+    ItemStats,
+    MyProfile,
+    Store,
+    WeeklyStats,
+)
+from core.sharding import shard_aliases
+
+
+def request_deletion(user):
+    """Deactivate the user and queue the deletion of their rows. Return
+    the AccountDeletion tracking it, the unfinished one if already
+    asked, queued again if it failed."""
+    from core.tasks import delete_account
+    with transaction.atomic():
+        # Serializes concurrent requests of the user
+        get_user_model().objects.select_for_update().filter(
+            id=user.id).exists()
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        deletion = AccountDeletion.objects.filter(
+            user_id=user.id).exclude(status=AccountDeletion.DONE).first()
+        if deletion is None:
+            deletion = AccountDeletion.objects.create(user_id=user.id)
+            delete_account.delay(str(deletion.id))
+        elif deletion.status == AccountDeletion.FAILED:
+            retry_deletion(deletion)
+    return deletion
+
+
+def retry_deletion(deletion):
+    """Queue a failed deletion again, it carries on where it stopped"""
+    from core.tasks import delete_account
+    deletion.status = AccountDeletion.PENDING
+    deletion.finished_at = None
+    deletion.save(update_fields=['status', 'finished_at'])
+    delete_account.delay(str(deletion.id))
+
+
+def fail_deletion(deletion_id):
+    """Mark an unfinished deletion FAILED, its task gave up"""
+    AccountDeletion.objects.filter(
+        id=deletion_id,
+        status__in=[AccountDeletion.PENDING, AccountDeletion.RUNNING],
+    ).update(status=AccountDeletion.FAILED, finished_at=timezone.now())
+
+
+def batches(queryset, batch_size):
+    """Delete the rows of queryset one batch at a time, yielding the
+    number deleted by each batch"""
+    manager = queryset.model._base_manager.db_manager(queryset.db)
+    while True:
+        ids = list(queryset.order_by().values_list(
+            'pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        manager.filter(pk__in=ids).delete()
+        yield len(ids)
+
+
+def delete_account(deletion_id, batch_size=500):
+    """Delete the rows of the user of an AccountDeletion, then the user"""
+    deletion = AccountDeletion.objects.get(id=deletion_id)
+    if deletion.status == AccountDeletion.DONE:
+        return
+    deletion.status = AccountDeletion.RUNNING
+    deletion.save(update_fields=['status'])
+    user_id = deletion.user_id
+
+    def purge(kind, queryset):
+        for count in batches(queryset, batch_size):
+            deletion.deleted[kind] = deletion.deleted.get(kind, 0) + count
+            deletion.save(update_fields=['deleted'])
+
+    for alias in shard_aliases():
+        stores = Store.all_objects.using(alias).filter(owner_id=user_id)
+        purge('groceries', Grocery.all_objects.using(alias).filter(
+            Q(owner_id=user_id) | Q(store_id__in=stores.values('id'))))
+        purge('stores', stores)
+        purge('shares', Store.shares.through.objects.using(alias).filter(
+            user_id=user_id))
+        archived = ArchivedStore.objects.using(alias).filter(
+            owner_id=user_id)
+        purge('archived_groceries', ArchivedGrocery.objects.using(
+            alias).filter(Q(owner_id=user_id) | Q(store__in=archived)))
+        purge('archived_stores', archived)
+        for model in (WeeklyStats, ItemStats):
+            purge('analytics', model.objects.using(alias).filter(
+                owner_id=user_id))
+
+    purge('friends', MyProfile.friends.through.objects.filter(
+        Q(user_id=user_id) | Q(myprofile__owner_id=user_id)))
+    purge('profiles', MyProfile.objects.filter(owner_id=user_id))
+    # Rows go with the user, their archives would be left behind
+    for export in DataExport.objects.filter(owner_id=user_id):
+        export.file.delete(save=False)
+    # Only small rows are left for the collector, e.g. the shard assignment
+    get_user_model().objects.filter(id=user_id).delete()
+
+    deletion.status = AccountDeletion.DONE
+    deletion.finished_at = timezone.now()
+    deletion.save(update_fields=['status', 'finished_at'])
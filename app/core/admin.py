@@ -1,17 +1,53 @@
 """
-Django admin customization.
+Django admin customization. The Store and Grocery admins are registered
+by groceries_list.admin.
 """
+import json
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
 from core import models
+from core.accounts import retry_deletion
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator trusting the planner's row estimate for large results,
+    so changelists of huge tables skip the exact COUNT(*)"""
+    exact_below = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        sql, params = queryset.query.sql_with_params()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = plan[0]['Plan']['Plan Rows']
+        if estimate < self.exact_below:
+            return super().count
+        return estimate
 
 
-class UserAdmin(BaseUserAdmin):
+class ScalableAdmin(admin.ModelAdmin):
+    """Admin defaults for tables with millions of rows"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+class UserAdmin(ScalableAdmin, BaseUserAdmin):
     """Define the admin pages for users."""
     ordering = ['id']
     list_display = ['email', 'username']
+    # Prefix searches use the UPPER(...) text_pattern_ops indexes
+    search_fields = ['^email', '^username']
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
         (_('Personal Info'), {'fields': ('username',)}),
@@ -31,7 +67,49 @@ class UserAdmin(BaseUserAdmin):
     readonly_fields = ['last_login']
 
 
+class MyProfileAdmin(ScalableAdmin):
+    list_display = ['id', 'owner']
+    list_select_related = ['owner']
+    ordering = ['-id']
+    search_fields = ['^owner__email', '^owner__username']
+    raw_id_fields = ['owner', 'friends']
+
+
+class TaskAdmin(ScalableAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'run_at']
+    list_filter = ['status']
+    ordering = ['-id']
+    readonly_fields = ['attempts', 'last_error', 'created_at']
+
+
+class AccountDeletionAdmin(ScalableAdmin):
+    list_display = ['id', 'user_id', 'status', 'created_at', 'finished_at']
+    list_filter = ['status']
+    ordering = ['-created_at']
+    readonly_fields = ['deleted', 'created_at', 'finished_at']
+    actions = ['retry']
+
+    @admin.action(description=_('Retry selected failed deletions'))
+    def retry(self, request, queryset):
+        failed = queryset.filter(status=models.AccountDeletion.FAILED)
+        count = 0
+        for deletion in failed:
+            retry_deletion(deletion)
+            count += 1
+        self.message_user(request, _('%d queued again.') % count)
+
+
+class DataExportAdmin(ScalableAdmin):
+    list_display = ['id', 'owner', 'status', 'size', 'created_at']
+    list_filter = ['status']
+    list_select_related = ['owner']
+    ordering = ['-created_at']
+    raw_id_fields = ['owner']
+    readonly_fields = ['file', 'size', 'created_at', 'finished_at']
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Store)
-admin.site.register(models.Grocery)
-admin.site.register(models.MyProfile)
+admin.site.register(models.MyProfile, MyProfileAdmin)
+admin.site.register(models.Task, TaskAdmin)
+admin.site.register(models.AccountDeletion, AccountDeletionAdmin)
+admin.site.register(models.DataExport, DataExportAdmin)
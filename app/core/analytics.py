@@ -0,0 +1,188 @@
+"""
+Per-user shopping analytics kept in rollup tables.
+
+WeeklyStats and ItemStats summarise a user's live and archived groceries
+so the analytics endpoint never reads Grocery rows. Each grocery keeps in
+`counted` what it adds to the rollups: [owner id, item key, week added,
+week completed, completed], or null while it is deleted. The
+rollup_analytics command walks the stores and groceries of each shard in
+(updated_at, id) order from a RollupCursor, and for every changed grocery
+and every grocery of a changed store subtracts the counted contribution
+from the rollups and adds the current one. A run so reads the changed
+rows only, however long the users' history. Archiving folds a store's
+groceries first and copies `counted` with them, restoring copies it
+back, so archived rows need no further rollup. purge_deleted folds the
+rows it deletes. Rows updated in the
+last few seconds are left for the next run so late committing
+transactions are not skipped.
+"""
+from django.db import transaction
+from django.db.models import DateField, Exists, F, Func, OuterRef, Q, Value
+from django.db.models.functions import Greatest, Lower, Trim, TruncWeek
+
+from core.models import (
+    Grocery,
+    ItemStats,
+    RollupCursor,
+    Store,
+    WeeklyStats,
+)
+
+
+def normalized_name():
+    """Item key of a grocery name: case and whitespace folded, the SQL
+    twin of groceries_list.suggestions.normalize"""
+    return Lower(Trim(Func(
+        'name', Value(r'\s+'), Value(' '), Value('g'),
+        function='REGEXP_REPLACE',
+    )))
+
+
+def changed_ids(alias, model, until, batch_size):
+    """Ids of up to batch_size rows of model changed after the shard's
+    cursor and before until. The cursor is moved past them and saved
+    with the caller's transaction."""
+    cursor, _ = RollupCursor.objects.using(alias).select_for_update(
+        ).get_or_create(table=model._meta.db_table)
+    rows = model._base_manager.using(alias).filter(updated_at__lt=until)
+    if cursor.updated_at is not None:
+        rows = rows.filter(updated_at__gte=cursor.updated_at).exclude(
+            updated_at=cursor.updated_at, id__lte=cursor.last_id)
+    batch = list(rows.order_by('updated_at', 'id').values_list(
+        'updated_at', 'id')[:batch_size])
+    if batch:
+        cursor.updated_at, cursor.last_id = batch[-1]
+        cursor.save(using=alias)
+    return [row_id for _, row_id in batch]
+
+
+def contribution(owner_id, key, added_week, completed_week, is_completed):
+    """The `counted` value of a live grocery"""
+    return [
+        owner_id,
+        key,
+        added_week and added_week.isoformat(),
+        completed_week and completed_week.isoformat(),
+        is_completed,
+    ]
+
+
+class Deltas:
+    """Changes to the rollups of a batch, by (owner, week) and
+    (owner, key)"""
+
+    def __init__(self):
+        self.weekly = {}
+        self.items = {}
+
+    def add(self, counted, sign, name=None, completed_at=None):
+        """Add (sign 1) or remove (sign -1) a counted contribution"""
+        owner_id, key, added_week, completed_week, is_completed = counted
+        for week, column in ((added_week, 0), (completed_week, 1)):
+            if week is not None:
+                weekly = self.weekly.setdefault((owner_id, week), [0, 0])
+                weekly[column] += sign
+        item = self.items.setdefault((owner_id, key), [0, 0, None, None])
+        item[0] += sign
+        if is_completed:
+            item[1] += sign
+        if sign > 0:
+            item[2] = name
+            if completed_at is not None and (
+                    item[3] is None or completed_at > item[3]):
+                item[3] = completed_at
+
+    def apply(self, alias):
+        """Write the changes to the shard's rollups"""
+        for (owner_id, week), (added, completed) in self.weekly.items():
+            if not added and not completed:
+                continue
+            rows = WeeklyStats.objects.using(alias).filter(
+                owner_id=owner_id, week=week)
+            if not rows.update(added=F('added') + added,
+                               completed=F('completed') + completed):
+                WeeklyStats.objects.using(alias).create(
+                    owner_id=owner_id, week=week,
+                    added=added, completed=completed)
+
+        for (owner_id, key), (added, completed, name, last_completed_at) \
+                in self.items.items():
+            changes = {
+                'added': F('added') + added,
+                'completed': F('completed') + completed,
+            }
+            if name is not None:
+                changes['name'] = name
+            if last_completed_at is not None:
+                changes['last_completed_at'] = Greatest(
+                    'last_completed_at', last_completed_at)
+            rows = ItemStats.objects.using(alias).filter(
+                owner_id=owner_id, key=key)
+            if not rows.update(**changes):
+                ItemStats.objects.using(alias).create(
+                    owner_id=owner_id, key=key, name=name or key,
+                    added=added, completed=completed,
+                    last_completed_at=last_completed_at)
+
+        owners = {owner_id for owner_id, _ in self.items}
+        WeeklyStats.objects.using(alias).filter(
+            owner_id__in=owners, added=0, completed=0).delete()
+        ItemStats.objects.using(alias).filter(
+            owner_id__in=owners, added=0).delete()
+
+
+def unfolded(alias):
+    """Q of the groceries of a shard the rollups may not have folded:
+    those at or past the cursor, and those counted for nothing"""
+    cursor = RollupCursor.objects.using(alias).filter(
+        table=Grocery._meta.db_table).first()
+    if cursor is None or cursor.updated_at is None:
+        return Q()
+    return Q(updated_at__gte=cursor.updated_at) | Q(counted__isnull=True)
+
+
+def fold(alias, lookup):
+    """Bring the rollups up to date with the groceries of a shard
+    matching lookup, with the caller's transaction. The rows are locked
+    so concurrent folds (rollup, archive, purge) count them once."""
+    deleted_store = Store.all_objects.filter(
+        id=OuterRef('store_id'), deleted_at__isnull=False)
+    rows = Grocery._base_manager.using(alias).filter(lookup).order_by(
+        ).select_for_update(of=('self',)).annotate(
+            key=normalized_name(),
+            added_week=TruncWeek('created_at', output_field=DateField()),
+            completed_week=TruncWeek(
+                'completed_at', output_field=DateField()),
+            store_deleted=Exists(deleted_store),
+        ).values_list(
+            'id', 'counted', 'deleted_at', 'store_deleted', 'owner_id',
+            'key', 'added_week', 'completed_week', 'is_completed', 'name',
+            'completed_at')
+
+    deltas, changed = Deltas(), []
+    for row in rows:
+        grocery_id, counted, deleted_at, store_deleted = row[:4]
+        current = None
+        if deleted_at is None and not store_deleted:
+            current = contribution(*row[4:9])
+        if current == counted:
+            continue
+        if counted is not None:
+            deltas.add(counted, -1)
+        if current is not None:
+            deltas.add(current, 1, name=row[9], completed_at=row[10])
+        changed.append(Grocery(id=grocery_id, counted=current))
+
+    deltas.apply(alias)
+    Grocery._base_manager.using(alias).bulk_update(
+        changed, ['counted'], batch_size=500)
+
+
+def rollup_batch(alias, until, batch_size):
+    """Fold up to batch_size changed stores and groceries of a shard into
+    the rollups. Return the number of changed rows read."""
+    with transaction.atomic(using=alias):
+        grocery_ids = changed_ids(alias, Grocery, until, batch_size)
+        store_ids = changed_ids(alias, Store, until, batch_size)
+        fold(alias, Q(id__in=grocery_ids) | Q(store_id__in=store_ids))
+    return len(grocery_ids) + len(store_ids)
@@ -0,0 +1,160 @@
+"""
+Archiving of completed stores out of the hot Store and Grocery tables.
+
+Stores completed for longer than STORE_ARCHIVE_AFTER_DAYS are copied
+with their groceries into ArchivedStore and ArchivedGrocery on the same
+shard, keeping their ids and versions, then removed from the hot tables.
+Restoring copies them back. Rows are copied with INSERT ... SELECT built
+from the models' _meta, like core.cloning, so no grocery is loaded into
+Python. The groceries are folded into the analytics rollups before they
+are archived and keep what they count for.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from core import analytics
+from core.models import (
+    ArchivedGrocery,
+    ArchivedStore,
+    Grocery,
+    RecurringStore,
+    Store,
+)
+
+
+def archive_cutoff():
+    return timezone.now() - timedelta(days=settings.STORE_ARCHIVE_AFTER_DAYS)
+
+
+def copy_columns(connection, source, target, values):
+    """Columns of target and the SELECT list filling them from the same
+    columns of source. values maps field names to (sql, params) to use
+    instead; target columns missing from source are left to be null."""
+    qn = connection.ops.quote_name
+    source_columns = {field.column for field in source._meta.concrete_fields}
+    columns, selects, params = [], [], []
+    for field in target._meta.concrete_fields:
+        if field.name in values:
+            sql, field_params = values[field.name]
+        elif field.column in source_columns:
+            sql, field_params = qn(field.column), []
+        else:
+            continue
+        columns.append(qn(field.column))
+        selects.append(sql)
+        params.extend(field_params)
+    return ', '.join(columns), ', '.join(selects), params
+
+
+def archive_batch(alias, cutoff, batch_size):
+    """Archive up to batch_size stores on a shard completed before cutoff.
+    Templates of recurring lists stay, locked stores are skipped so
+    concurrent runs share the work. The stores and their groceries stay
+    locked until they are gone, groceries are only added to a store
+    holding its lock (see GroceryCreateAPIView), so none is lost.
+    Return the number of stores archived."""
+    recurring = RecurringStore.objects.filter(store_id=OuterRef('id'))
+    connection = connections[alias]
+    qn = connection.ops.quote_name
+    groceries = qn(Grocery._meta.db_table)
+    with transaction.atomic(using=alias), connection.cursor() as cursor:
+        ids = list(
+            Store.objects.using(alias).filter(
+                ~Exists(recurring),
+                is_completed=True,
+                completed_at__lte=cutoff,
+            ).select_for_update(skip_locked=True).values_list(
+                'id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        cursor.execute(
+            'SELECT COUNT(*) FROM (SELECT 1 FROM {} WHERE store_id = ANY(%s) '
+            'FOR UPDATE) AS locked'.format(groceries), [ids])
+        analytics.fold(alias, Q(store_id__in=ids) & analytics.unfolded(alias))
+
+        shares = Store.shares.through
+        columns, selects, params = copy_columns(
+            connection, Store, ArchivedStore, {
+                'archived_at': ('%s', [timezone.now()]),
+                'shares': (
+                    'ARRAY(SELECT user_id FROM {} WHERE store_id = {}.id '
+                    'ORDER BY user_id)'.format(
+                        qn(shares._meta.db_table),
+                        qn(Store._meta.db_table)),
+                    []),
+            })
+        cursor.execute(
+            'INSERT INTO {} ({}) SELECT {} FROM {} WHERE id = ANY(%s)'.format(
+                qn(ArchivedStore._meta.db_table), columns, selects,
+                qn(Store._meta.db_table)),
+            params + [ids])
+
+        through = Store.groceries.through
+        through.objects.using(alias).filter(
+            Q(store_id__in=ids) |
+            Q(grocery_id__in=Grocery.all_objects.filter(
+                store_id__in=ids).values('id'))
+        ).delete()
+        shares.objects.using(alias).filter(store_id__in=ids).delete()
+        # Copies exactly the deleted rows, soft deleted ones are dropped
+        columns, selects, params = copy_columns(
+            connection, Grocery, ArchivedGrocery, {})
+        cursor.execute(
+            'WITH moved AS (DELETE FROM {} WHERE store_id = ANY(%s) '
+            'RETURNING *) INSERT INTO {} ({}) SELECT {} FROM moved '
+            'WHERE deleted_at IS NULL'.format(
+                groceries, qn(ArchivedGrocery._meta.db_table), columns,
+                selects),
+            [ids] + params)
+        Store.all_objects.using(alias).filter(id__in=ids).delete()
+    return len(ids)
+
+
+def restore(archived):
+    """Move an archived store with its groceries back to the hot tables.
+    The store counts as completed now, so it is not archived again
+    before STORE_ARCHIVE_AFTER_DAYS.
+    Raise ArchivedStore.DoesNotExist if it was restored concurrently."""
+    alias = archived._state.db
+    connection = connections[alias]
+    qn = connection.ops.quote_name
+    through = Store.groceries.through
+    field = Store.groceries.field
+    with transaction.atomic(using=alias), connection.cursor() as cursor:
+        archived = ArchivedStore.objects.using(alias).select_for_update(
+            ).get(pk=archived.pk)
+        store = Store(
+            id=archived.id,
+            owner_id=archived.owner_id,
+            name=archived.name,
+            is_completed=archived.is_completed,
+            version=archived.version,
+        )
+        store.save(using=alias, force_insert=True)
+
+        columns, selects, params = copy_columns(
+            connection, ArchivedGrocery, Grocery,
+            {'updated_at': ('%s', [timezone.now()])})
+        cursor.execute(
+            'INSERT INTO {} ({}) SELECT {} FROM {} WHERE store_id = %s'.format(
+                qn(Grocery._meta.db_table), columns, selects,
+                qn(ArchivedGrocery._meta.db_table)),
+            params + [store.id])
+        cursor.execute(
+            'INSERT INTO {through} ({store}, {grocery}) '
+            'SELECT %s, id FROM {groceries} WHERE store_id = %s'.format(
+                through=qn(through._meta.db_table),
+                store=qn(field.m2m_column_name()),
+                grocery=qn(field.m2m_reverse_name()),
+                groceries=qn(Grocery._meta.db_table),
+            ),
+            [store.id, store.id]
+        )
+        store.shares.add(*archived.shares)
+        archived.delete()
+    return store
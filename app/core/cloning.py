@@ -0,0 +1,111 @@
+"""
+Server-side copies of stores with their groceries.
+
+Each table is copied with a single INSERT ... SELECT whose column list is
+built from the model's _meta, so cloning costs the same few round trips
+whatever the size of the list. RecurringStore schedules copy a template
+store every few days, see the run_recurring_stores command.
+"""
+from datetime import timedelta
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from core.models import Grocery, RecurringStore, Store
+
+
+def copy_sql(connection, model, overrides, where, where_params, returning):
+    """INSERT ... SELECT copying the model's rows matching where into its
+    own table, replacing the columns named in overrides"""
+    qn = connection.ops.quote_name
+    columns, values, params = [], [], []
+    for field in model._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        columns.append(qn(field.column))
+        if field.name in overrides:
+            values.append('%s')
+            params.append(field.get_db_prep_save(
+                overrides[field.name], connection))
+        else:
+            values.append(qn(field.column))
+    sql = 'INSERT INTO {table} ({columns}) SELECT {values} FROM {table} ' \
+          'WHERE {where} RETURNING {returning}'.format(
+              table=qn(model._meta.db_table),
+              columns=', '.join(columns),
+              values=', '.join(values),
+              where=where,
+              returning=', '.join(qn(column) for column in returning),
+          )
+    return sql, params + list(where_params)
+
+
+def clone_store(store, name=None):
+    """Copy a store with its live groceries, reset to incomplete, in one
+    transaction on the store's shard. Return the new store and its
+    groceries (with only id and name loaded)."""
+    alias = store._state.db or 'default'
+    connection = connections[alias]
+    now = timezone.now()
+    reset = {
+        'is_completed': False,
+        'created_at': now,
+        'completed_at': None,
+        'deleted_at': None,
+        'updated_at': now,
+        'version': 1,
+        'counted': None,
+    }
+    through = Store.groceries.through
+    field = Store.groceries.field
+    qn = connection.ops.quote_name
+
+    with transaction.atomic(using=alias), connection.cursor() as cursor:
+        overrides = dict(reset, name=name) if name else reset
+        cursor.execute(*copy_sql(
+            connection, Store, overrides, 'id = %s', [store.id], ['id']))
+        store_id = cursor.fetchone()[0]
+
+        cursor.execute(*copy_sql(
+            connection, Grocery, dict(reset, store_id=store_id),
+            'store_id = %s AND deleted_at IS NULL ORDER BY id', [store.id],
+            ['id', 'name']
+        ))
+        groceries = [
+            Grocery(id=grocery_id, name=grocery_name)
+            for grocery_id, grocery_name in cursor.fetchall()
+        ]
+
+        cursor.execute(
+            'INSERT INTO {through} ({store}, {grocery}) '
+            'SELECT %s, id FROM {groceries} WHERE store_id = %s'.format(
+                through=qn(through._meta.db_table),
+                store=qn(field.m2m_column_name()),
+                grocery=qn(field.m2m_reverse_name()),
+                groceries=qn(Grocery._meta.db_table),
+            ),
+            [store_id, store_id]
+        )
+
+    return Store.objects.using(alias).get(id=store_id), groceries
+
+
+def run_recurring(alias, now, batch_size):
+    """Copy up to batch_size due templates on a shard and schedule their
+    next copy, in the same transaction. Return the number of copies."""
+    with transaction.atomic(using=alias):
+        due = list(
+            RecurringStore.objects.using(alias).filter(
+                next_run_at__lte=now,
+                store__deleted_at__isnull=True,
+            ).select_related('store').select_for_update(
+                skip_locked=True, of=('self',)
+            )[:batch_size]
+        )
+        for recurrence in due:
+            clone_store(recurrence.store)
+            interval = timedelta(days=recurrence.interval_days)
+            while recurrence.next_run_at <= now:
+                recurrence.next_run_at += interval
+            recurrence.save(update_fields=['next_run_at'])
+    return len(due)
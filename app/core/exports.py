@@ -0,0 +1,171 @@
+"""
+Personal data export archives.
+
+write_archive streams a user's profile, stores, groceries, shares and
+friends into a zip of JSON Lines files. Every table is read with
+QuerySet.iterator(), a server side cursor on PostgreSQL, and each row is
+compressed as it is written, so memory stays flat however large the
+account. request_export queues build_export, which writes the archive
+to a temporary file and keeps it in the default storage until
+DATA_EXPORT_DAYS have passed. An export whose task failed for good is
+FAILED and the user may ask again.
+"""
+import json
+import tempfile
+from datetime import timedelta
+from itertools import chain
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import (
+    ArchivedGrocery,
+    ArchivedStore,
+    DataExport,
+    Grocery,
+    Store,
+)
+from core.sharding import shard_aliases
+
+
+def write_lines(archive, name, rows):
+    """Write rows as JSON Lines to the archive member name. Return the
+    number of rows."""
+    count = 0
+    with archive.open(name, 'w', force_zip64=True) as member:
+        for row in rows:
+            member.write(json.dumps(row, cls=DjangoJSONEncoder).encode())
+            member.write(b'\n')
+            count += 1
+    return count
+
+
+def sharded_rows(queryset_for, fields, chunk_size):
+    """Stream the values of the queryset queryset_for(alias) builds on
+    every shard, one shard after the other"""
+    return chain.from_iterable(
+        queryset_for(alias).values(*fields).iterator(chunk_size=chunk_size)
+        for alias in shard_aliases()
+    )
+
+
+def write_archive(user, fileobj, chunk_size=2000):
+    """Write the zip archive of the user's data to fileobj. Return the
+    number of rows written by member."""
+    def owned_stores(alias):
+        return Store.objects.using(alias).filter(owner_id=user.id)
+
+    members = {
+        'stores.jsonl': sharded_rows(
+            owned_stores,
+            ['id', 'name', 'is_completed', 'completed_at', 'updated_at'],
+            chunk_size),
+        'groceries.jsonl': sharded_rows(
+            lambda alias: Grocery.objects.using(alias).filter(
+                Q(owner_id=user.id) |
+                Q(store_id__in=owned_stores(alias).values('id'))
+            ).order_by('store_id', 'position', 'id'),
+            ['id', 'store_id', 'name', 'qty', 'is_completed',
+             'created_at', 'completed_at'],
+            chunk_size),
+        'shares.jsonl': sharded_rows(
+            lambda alias: Store.shares.through.objects.using(alias).filter(
+                Q(store__owner_id=user.id) | Q(user_id=user.id),
+                store__deleted_at__isnull=True,
+            ).order_by('id'),
+            ['store_id', 'user_id'],
+            chunk_size),
+        'archived_stores.jsonl': sharded_rows(
+            lambda alias: ArchivedStore.objects.using(alias).filter(
+                owner_id=user.id).order_by('id'),
+            ['id', 'name', 'completed_at', 'archived_at', 'shares'],
+            chunk_size),
+        'archived_groceries.jsonl': sharded_rows(
+            lambda alias: ArchivedGrocery.objects.using(alias).filter(
+                Q(owner_id=user.id) | Q(store__owner_id=user.id)
+            ).order_by('store_id', 'position', 'id'),
+            ['id', 'store_id', 'name', 'qty', 'is_completed',
+             'created_at', 'completed_at'],
+            chunk_size),
+        'friends.jsonl': get_user_model().objects.filter(
+            friends__owner_id=user.id
+        ).order_by('id').values('id', 'username').iterator(
+            chunk_size=chunk_size),
+    }
+
+    counts = {}
+    with ZipFile(fileobj, 'w', compression=ZIP_DEFLATED) as archive:
+        archive.writestr('profile.json', json.dumps({
+            'id': user.id,
+            'email': user.email,
+            'username': user.username,
+            'is_verified': user.is_verified,
+            'created_at': user.created_at,
+        }, cls=DjangoJSONEncoder, indent=2))
+        for name, rows in members.items():
+            counts[name] = write_lines(archive, name, rows)
+    return counts
+
+
+def request_export(user):
+    """Queue an export of the user's data. Return the DataExport
+    tracking it, the unfinished one if already asked."""
+    from core.tasks import export_data
+    with transaction.atomic():
+        # Serializes concurrent requests of the user
+        get_user_model().objects.select_for_update().filter(
+            id=user.id).exists()
+        export = DataExport.objects.filter(
+            owner=user,
+            status__in=[DataExport.PENDING, DataExport.RUNNING],
+        ).first()
+        if export is None:
+            export = DataExport.objects.create(owner=user)
+            export_data.delay(str(export.id))
+    return export
+
+
+def build_export(export_id, chunk_size=2000):
+    """Build the archive of a DataExport and store it"""
+    export = DataExport.objects.select_related('owner').get(id=export_id)
+    if export.status == DataExport.DONE:
+        return
+    export.status = DataExport.RUNNING
+    export.save(update_fields=['status'])
+
+    with tempfile.TemporaryFile() as archive:
+        write_archive(export.owner, archive, chunk_size)
+        export.size = archive.tell()
+        archive.seek(0)
+        export.file.save('%s.zip' % export.id, File(archive), save=False)
+
+    export.status = DataExport.DONE
+    export.finished_at = timezone.now()
+    export.save(update_fields=['file', 'size', 'status', 'finished_at'])
+
+
+def fail_export(export_id):
+    """Mark an unfinished export FAILED, its task gave up"""
+    DataExport.objects.filter(
+        id=export_id,
+        status__in=[DataExport.PENDING, DataExport.RUNNING],
+    ).update(status=DataExport.FAILED, finished_at=timezone.now())
+
+
+def purge_expired(now):
+    """Delete the exports asked for more than DATA_EXPORT_DAYS before
+    now, and their archives. Return how many."""
+    cutoff = now - timedelta(days=settings.DATA_EXPORT_DAYS)
+    purged = 0
+    for export in DataExport.objects.filter(
+            created_at__lt=cutoff).iterator():
+        export.file.delete(save=False)
+        export.delete()
+        purged += 1
+    return purged
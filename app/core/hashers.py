@@ -0,0 +1,129 @@
+"""
+Password hashing strategy and a bounded pool to run hashes in.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+)
+
+# The costs used unless settings.PASSWORD_HASHING overrides them
+DEFAULTS = {
+    'ARGON2_TIME_COST': 2,
+    'ARGON2_MEMORY_COST': 65536,
+    'ARGON2_PARALLELISM': 2,
+    'PBKDF2_ITERATIONS': 260000,
+    'POOL_SIZE': 0,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'PASSWORD_HASHING', {}).get(
+        name, DEFAULTS[name])
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2 with cost parameters from settings.PASSWORD_HASHING.
+    Hashes made with other parameters are upgraded on the next login."""
+
+    @property
+    def time_cost(self):
+        return get_setting('ARGON2_TIME_COST')
+
+    @property
+    def memory_cost(self):
+        return get_setting('ARGON2_MEMORY_COST')
+
+    @property
+    def parallelism(self):
+        return get_setting('ARGON2_PARALLELISM')
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with the iteration count from settings"""
+
+    @property
+    def iterations(self):
+        return get_setting('PBKDF2_ITERATIONS')
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the shared hashing pool, None when hashing runs inline.
+    hashlib and argon2-cffi release the GIL, so threads hash in parallel
+    while the pool size caps how many cores password hashing can take.
+    Logins and sign ups reach it through User.check_password and
+    User.set_password, async code through amake_password and
+    acheck_password."""
+    global _pool
+    size = get_setting('POOL_SIZE')
+    if not size:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=size,
+                thread_name_prefix='password-hash',
+            )
+    return _pool
+
+
+def run(func, *args):
+    pool = get_pool()
+    if pool is None:
+        return func(*args)
+    return pool.submit(func, *args).result()
+
+
+def verify(password, encoded):
+    """Return (is_correct, must_update), see hashers.check_password"""
+    if password is None or not hashers.is_password_usable(encoded):
+        return False, False
+
+    preferred = hashers.get_hasher('default')
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        return False, False
+
+    hasher_changed = hasher.algorithm != preferred.algorithm
+    must_update = hasher_changed or preferred.must_update(encoded)
+    is_correct = hasher.verify(password, encoded)
+    if not is_correct and not hasher_changed and must_update:
+        hasher.harden_runtime(password, encoded)
+    return is_correct, must_update
+
+
+def make_password(password):
+    """Hash a password in the pool"""
+    return run(hashers.make_password, password)
+
+
+def check_password(password, encoded, setter=None):
+    """Check a password in the pool. The setter, which usually saves
+    an upgraded hash, runs in the calling thread and its DB connection."""
+    is_correct, must_update = run(verify, password, encoded)
+    if setter and is_correct and must_update:
+        setter(password)
+    return is_correct
+
+
+async def amake_password(password):
+    """make_password that awaits the pool instead of blocking the loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_pool(), hashers.make_password, password)
+
+
+async def acheck_password(password, encoded):
+    """Return (is_correct, must_update) without blocking the loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(), verify, password, encoded)
@@ -0,0 +1,140 @@
+"""
+Idempotency-Key support for POST requests.
+
+The first response to an authenticated POST carrying an Idempotency-Key
+header is kept in the cache for IDEMPOTENCY['TTL'] seconds and replayed
+for retries with the same key instead of running the view again. Only
+successes and validation errors are kept: a throttled, conflicting or
+otherwise transient failure must not be replayed to the retries meant
+to get past it. Keys are scoped to the user, and a key reused with
+another body is rejected. Use a shared cache (CACHE_BACKEND) when
+running several processes. The middleware sits below CorsMiddleware so
+replayed responses get their CORS headers too.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+DEFAULTS = {
+    'TTL': 24 * 60 * 60,
+    'LOCK_TIMEOUT': 60,
+}
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+KEPT_HEADERS = ('Content-Type', 'ETag', 'Location')
+MAX_KEY_LENGTH = 255
+# Client errors that a retry of the same request would get again
+STORED_CLIENT_ERRORS = (400, 422)
+
+
+def get_setting(name):
+    return getattr(settings, 'IDEMPOTENCY', {}).get(name, DEFAULTS[name])
+
+
+def request_user_id(request):
+    """Id of the user the request authenticates as, read from the
+    session or the JWT claims without a database query"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.pk
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = header and auth.get_raw_token(header)
+    if not raw_token:
+        return None
+    try:
+        token = auth.get_validated_token(raw_token)
+    except InvalidToken:
+        return None
+    return token.get(jwt_settings.USER_ID_CLAIM)
+
+
+def cache_key(user_id, request, key):
+    digest = hashlib.sha256(
+        ('%s %s %s' % (request.method, request.path, key)).encode()
+    ).hexdigest()
+    return 'idempotency:%s:%s' % (user_id, digest)
+
+
+def is_stored(response):
+    if response.streaming:
+        return False
+    status = response.status_code
+    return 200 <= status < 300 or status in STORED_CLIENT_ERRORS
+
+
+def replay(stored):
+    response = HttpResponse(stored['content'], status=stored['status'])
+    for name, value in stored['headers']:
+        response[name] = value
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+class IdempotencyMiddleware:
+    """Replay stored responses for retried POSTs"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = request.headers.get(HEADER)
+        if request.method != 'POST' or not key:
+            return self.get_response(request)
+        if len(key) > MAX_KEY_LENGTH:
+            return JsonResponse(
+                {'error': ['Idempotency-Key is too long.']}, status=400)
+        user_id = request_user_id(request)
+        if user_id is None:
+            return self.get_response(request)
+
+        response_key = cache_key(user_id, request, key)
+        fingerprint = hashlib.sha256(request.body).hexdigest()
+        stored = cache.get(response_key)
+        if stored is not None:
+            return self.replay_or_reject(stored, fingerprint)
+
+        lock_key = response_key + ':lock'
+        if not cache.add(lock_key, True, get_setting('LOCK_TIMEOUT')):
+            response = JsonResponse(
+                {'error': ['A request with this Idempotency-Key is '
+                           'in progress.']},
+                status=409,
+            )
+            response['Retry-After'] = '1'
+            return response
+        try:
+            # A duplicate may have finished between the get and the add
+            stored = cache.get(response_key)
+            if stored is not None:
+                return self.replay_or_reject(stored, fingerprint)
+            response = self.get_response(request)
+            if is_stored(response):
+                cache.set(response_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'content': response.content,
+                    'headers': [
+                        (name, response[name])
+                        for name in KEPT_HEADERS if response.has_header(name)
+                    ],
+                }, get_setting('TTL'))
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    def replay_or_reject(self, stored, fingerprint):
+        if stored['fingerprint'] != fingerprint:
+            return JsonResponse(
+                {'error': ['Idempotency-Key was used with another '
+                           'request body.']},
+                status=422,
+            )
+        return replay(stored)
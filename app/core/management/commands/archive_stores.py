@@ -0,0 +1,39 @@
+"""
+Django command to move long completed stores to the archive tables.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import archive
+from core.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    """Django command to archive completed stores in batches."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            help='Archive stores completed this many days ago, '
+                 'STORE_ARCHIVE_AFTER_DAYS by default')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options['days'] is None:
+            cutoff = archive.archive_cutoff()
+        else:
+            cutoff = timezone.now() - timedelta(days=options['days'])
+        archived = 0
+        for alias in shard_aliases():
+            while True:
+                count = archive.archive_batch(
+                    alias, cutoff, options['batch_size'])
+                if not count:
+                    break
+                archived += count
+
+        self.stdout.write(self.style.SUCCESS(
+            'Archived %d stores' % archived))
@@ -0,0 +1,31 @@
+"""
+Django command to write the data export archive of a user to a file.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.exports import write_archive
+
+
+class Command(BaseCommand):
+    """Django command to export a user's data without the task queue."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('email')
+        parser.add_argument(
+            '--output',
+            help='Archive path, <username>.zip by default')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError('No user with email %s' % options['email'])
+        path = options['output'] or '%s.zip' % user.username
+        with open(path, 'wb') as archive:
+            counts = write_archive(user, archive, options['chunk_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            'Exported %d rows to %s' % (sum(counts.values()), path)))
@@ -0,0 +1,22 @@
+"""
+Django command to migrate every shard database.
+"""
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Django command to run migrate on 'default' and all shards."""
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        for alias in settings.DATABASE_SHARDS:
+            self.stdout.write('Migrating %s...' % alias)
+            call_command(
+                'migrate',
+                database=alias,
+                interactive=False,
+                verbosity=options['verbosity'],
+            )
+        self.stdout.write(self.style.SUCCESS('Shards migrated!'))
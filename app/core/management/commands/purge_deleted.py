@@ -0,0 +1,78 @@
+"""
+Django command to hard delete soft deleted stores and groceries.
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core import analytics
+from core.models import Grocery, Store
+from core.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    """Django command to purge tombstoned rows in bounded batches."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--grace', type=int, default=60 * 60,
+            help='Only purge rows deleted at least this many seconds ago, '
+                 'an hour by default so rollup_analytics saw them first')
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help='Seconds to pause between batches')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        self.batch_size = options['batch_size']
+        self.pause = options['sleep']
+        cutoff = timezone.now() - timedelta(seconds=options['grace'])
+        stores = groceries = 0
+        for alias in shard_aliases():
+            groceries += self.purge_groceries(
+                Grocery.all_objects.using(alias).filter(
+                    deleted_at__lte=cutoff))
+            deleted_stores = Store.all_objects.using(alias).filter(
+                deleted_at__lte=cutoff)
+            while True:
+                store_ids = list(deleted_stores.values_list(
+                    'id', flat=True)[:self.batch_size])
+                if not store_ids:
+                    break
+                for store_id in store_ids:
+                    groceries += self.purge_groceries(
+                        Grocery.all_objects.using(alias).filter(
+                            store_id=store_id))
+                Store.all_objects.using(alias).filter(
+                    id__in=store_ids).delete()
+                stores += len(store_ids)
+                self.throttle()
+
+        self.stdout.write(self.style.SUCCESS(
+            'Purged %d stores and %d groceries' % (stores, groceries)))
+
+    def purge_groceries(self, queryset):
+        """Delete the groceries of a queryset one batch at a time. What
+        they still count for in the analytics is taken out first, they
+        may have been deleted since the last rollup."""
+        alias = queryset.db
+        purged = 0
+        while True:
+            ids = list(queryset.order_by().values_list(
+                'id', flat=True)[:self.batch_size])
+            if not ids:
+                return purged
+            with transaction.atomic(using=alias):
+                analytics.fold(alias, Q(id__in=ids, counted__isnull=False))
+                queryset.filter(id__in=ids).delete()
+            purged += len(ids)
+            self.throttle()
+
+    def throttle(self):
+        if self.pause:
+            time.sleep(self.pause)
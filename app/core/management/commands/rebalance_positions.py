@@ -0,0 +1,42 @@
+"""
+Django command to shorten the grocery ordering keys of stores.
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, Max, Q
+from django.db.models.functions import Length
+
+from core.models import Grocery
+from core.positions import MAX_LENGTH, rebalance_store
+from core.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    """Django command to respace long or duplicate grocery positions."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-length', type=int, default=MAX_LENGTH,
+            help='Rebalance stores with a position longer than this')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        stores = 0
+        for alias in shard_aliases():
+            store_ids = list(
+                Grocery.all_objects.using(alias).order_by().values(
+                    'store_id'
+                ).annotate(
+                    longest=Max(Length('position')),
+                    keys=Count('position', distinct=True),
+                    total=Count('id'),
+                ).filter(
+                    Q(longest__gt=options['max_length']) |
+                    Q(keys__lt=F('total'))
+                ).values_list('store_id', flat=True)
+            )
+            for store_id in store_ids:
+                rebalance_store(store_id, using=alias)
+            stores += len(store_ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Rebalanced %d stores' % stores))
@@ -0,0 +1,42 @@
+"""
+Django command to move users' stores between shards.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sharding
+
+
+class Command(BaseCommand):
+    """Django command to rebalance stores and groceries across shards."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Move only this user')
+        parser.add_argument('--to', help='Target shard for --user')
+        parser.add_argument('--max-moves', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options['user'] is not None:
+            if options['to'] not in settings.DATABASE_SHARDS:
+                raise CommandError('--to must be one of DATABASE_SHARDS')
+            moves = [(
+                options['user'],
+                sharding.shard_for_user(options['user']),
+                options['to'],
+            )]
+        else:
+            moves = sharding.plan_moves(
+                sharding.shard_loads(), options['max_moves'])
+
+        for owner_id, source, target in moves:
+            self.stdout.write(
+                'User %s: %s -> %s' % (owner_id, source, target))
+            if not options['dry_run']:
+                stores = sharding.move_user(
+                    owner_id, target, options['batch_size'])
+                self.stdout.write('  moved %d stores' % stores)
+
+        self.stdout.write(self.style.SUCCESS('%d moves' % len(moves)))
@@ -0,0 +1,36 @@
+"""
+Django command to fold changed stores and groceries into the analytics
+rollups.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.analytics import rollup_batch
+from core.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    """Django command to update the analytics rollups in batches."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--lag', type=int, default=60,
+            help='Leave rows updated in the last LAG seconds for the '
+                 'next run')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        until = timezone.now() - timedelta(seconds=options['lag'])
+        rows = 0
+        for alias in shard_aliases():
+            while True:
+                count = rollup_batch(alias, until, options['batch_size'])
+                if not count:
+                    break
+                rows += count
+
+        self.stdout.write(self.style.SUCCESS(
+            'Rolled up %d changed rows' % rows))
@@ -0,0 +1,28 @@
+"""
+Django command to copy the recurring stores that are due.
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.cloning import run_recurring
+from core.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    """Django command to copy due recurring store templates."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        now = timezone.now()
+        copies = 0
+        for alias in shard_aliases():
+            while True:
+                count = run_recurring(alias, now, options['batch_size'])
+                if not count:
+                    break
+                copies += count
+
+        self.stdout.write(self.style.SUCCESS('Copied %d stores' % copies))
@@ -0,0 +1,56 @@
+"""
+Django command to run background task workers.
+"""
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import taskqueue
+
+
+class Command(BaseCommand):
+    """Django command to process queued and periodic tasks."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Worker processes sharing the queue')
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once no task is due instead of waiting for more')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        taskqueue.sync_periodic()
+        stop = multiprocessing.Event()
+
+        def shutdown(signum, frame):
+            # Workers finish their current task, then exit
+            stop.set()
+        handlers = {
+            signum: signal.signal(signum, shutdown)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        try:
+            if options['processes'] == 1:
+                ran = taskqueue.work(stop, options['burst'])
+                self.stdout.write(self.style.SUCCESS('Ran %d tasks' % ran))
+                return
+
+            # Forked workers must not share the parent's connections
+            connections.close_all()
+            workers = [
+                multiprocessing.Process(
+                    target=taskqueue.work, args=(stop, options['burst']))
+                for _ in range(options['processes'])
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            self.stdout.write(self.style.SUCCESS('Workers stopped'))
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
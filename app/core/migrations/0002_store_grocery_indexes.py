@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:38
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='grocery',
+            index=models.Index(fields=['store_id'], name='grocery_store_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='grocery',
+            index=models.Index(condition=models.Q(('is_completed', False)), fields=['store_id'], name='grocery_store_incomplete_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='grocery',
+            index=models.Index(fields=['owner', 'is_completed'], name='grocery_owner_completed_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='store',
+            index=models.Index(fields=['owner', 'is_completed'], name='store_owner_completed_idx'),
+        ),
+    ]
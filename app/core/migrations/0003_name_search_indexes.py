@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:39
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0002_store_grocery_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='grocery',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('name', config='simple'), name='grocery_name_search_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='store',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('name', config='simple'), name='store_name_search_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-19 13:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Case-insensitive prefix indexes for username/email istartswith.
+    text_pattern_ops lets LIKE 'abc%' use the btree whatever the collation;
+    Django 3.2 cannot express an opclass on an expression index, hence SQL."""
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0003_name_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS user_username_prefix_idx '
+            'ON core_user (UPPER(username::text) text_pattern_ops);',
+            'DROP INDEX CONCURRENTLY IF EXISTS user_username_prefix_idx;',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS user_email_prefix_idx '
+            'ON core_user (UPPER(email::text) text_pattern_ops);',
+            'DROP INDEX CONCURRENTLY IF EXISTS user_email_prefix_idx;',
+        ),
+    ]
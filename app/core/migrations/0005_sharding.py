@@ -0,0 +1,78 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Copied from core.sharding so the migration does not change with it
+SHARD_ID_BITS = 40
+
+SHARDED_TABLES = [
+    'core_store',
+    'core_grocery',
+    'core_store_groceries',
+    'core_store_shares',
+]
+
+
+def id_offset(alias):
+    """First id of the sequences on a shard alias"""
+    if not alias.startswith('shard_'):
+        return 0
+    return int(alias[len('shard_'):]) << SHARD_ID_BITS
+
+
+def start_shard_sequences(apps, schema_editor):
+    """Give each shard its own id range so rows keep their ids when
+    moved between shards. 'default' keeps its sequences."""
+    offset = id_offset(schema_editor.connection.alias)
+    if not offset:
+        return
+    for table in SHARDED_TABLES:
+        schema_editor.execute(
+            "SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            "GREATEST(%s, (SELECT COALESCE(MAX(id), 0) + 1 FROM {table})), "
+            "false)".format(table=table),
+            [offset],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_user_prefix_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShardAssignment',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='core.user')),
+                ('shard', models.CharField(db_index=True, max_length=64)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='grocery',
+            name='owner',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='grocery',
+            name='store_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='store',
+            name='owner',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='store',
+            name='shares',
+            field=models.ManyToManyField(blank=True, db_constraint=False, related_name='shares', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(
+            start_shard_sequences,
+            migrations.RunPython.noop,
+        ),
+    ]
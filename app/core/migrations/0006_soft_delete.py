@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:56
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0005_sharding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='grocery',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        AddIndexConcurrently(
+            model_name='grocery',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='grocery_deleted_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='store',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='store_deleted_idx'),
+        ),
+    ]
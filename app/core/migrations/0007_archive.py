@@ -0,0 +1,83 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:58
+
+from django.conf import settings
+import django.contrib.postgres.fields
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def backfill_completed_at(apps, schema_editor):
+    """Start the archive age of already completed stores now, in
+    batches so no long lock is held on core_store"""
+    Store = apps.get_model('core', 'Store')
+    stores = Store.objects.using(schema_editor.connection.alias).filter(
+        is_completed=True, completed_at__isnull=True)
+    now = timezone.now()
+    while True:
+        ids = list(stores.values_list('id', flat=True)[:1000])
+        if not ids:
+            break
+        stores.filter(id__in=ids).update(completed_at=now)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0006_soft_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedGrocery',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('qty', models.IntegerField(default=1)),
+                ('is_completed', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedStore',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('is_completed', models.BooleanField(default=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('shares', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, size=None)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(
+            backfill_completed_at,
+            migrations.RunPython.noop,
+        ),
+        AddIndexConcurrently(
+            model_name='store',
+            index=models.Index(condition=models.Q(('is_completed', True)), fields=['completed_at'], name='store_completed_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedstore',
+            name='owner',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedgrocery',
+            name='owner',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedgrocery',
+            name='store',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='groceries', to='core.archivedstore'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-19 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='grocery',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
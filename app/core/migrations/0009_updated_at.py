@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-19 13:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_row_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='grocery',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
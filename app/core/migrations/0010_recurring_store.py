@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-19 13:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringStore',
+            fields=[
+                ('store', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recurrence', serialize=False, to='core.store')),
+                ('interval_days', models.PositiveIntegerField(default=7)),
+                ('next_run_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
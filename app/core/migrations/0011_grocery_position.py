@@ -0,0 +1,91 @@
+# Generated by Django 3.2.25 on 2026-10-19 13:15
+
+from django.contrib.postgres.operations import (
+    AddIndexConcurrently,
+    RemoveIndexConcurrently,
+)
+from django.db import migrations, models
+
+# Copied from core.positions so the migration does not change with it
+DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+
+
+def spread_keys(count):
+    """count evenly spaced keys in the lower half of the key space, the
+    upper half is left for appends"""
+    width = 1
+    while BASE ** width < 4 * (count + 1):
+        width += 1
+    step = BASE ** width // (2 * (count + 1))
+    keys = []
+    for i in range(1, count + 1):
+        value, digits = i * step, []
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits.append(DIGITS[digit])
+        keys.append(''.join(reversed(digits)).rstrip(DIGITS[0]))
+    return keys
+
+
+def backfill_positions(apps, schema_editor):
+    """Order existing groceries by id, a store at a time in batches of
+    stores so no long lock is held on core_grocery"""
+    Grocery = apps.get_model('core', 'Grocery')
+    groceries = Grocery.objects.using(schema_editor.connection.alias)
+    while True:
+        store_ids = list(
+            groceries.filter(position='').order_by().values_list(
+                'store_id', flat=True).distinct()[:100]
+        )
+        if not store_ids:
+            break
+        for store_id in store_ids:
+            rows = list(groceries.filter(store_id=store_id).order_by(
+                'position', 'id').only('id'))
+            for grocery, key in zip(rows, spread_keys(len(rows))):
+                grocery.position = key
+            groceries.bulk_update(rows, ['position'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0010_recurring_store'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='archivedgrocery',
+            options={'ordering': ['position', 'id']},
+        ),
+        migrations.AlterModelOptions(
+            name='grocery',
+            options={'ordering': ['position', 'id']},
+        ),
+        migrations.AddField(
+            model_name='archivedgrocery',
+            name='position',
+            field=models.CharField(blank=True, db_collation='C', default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='grocery',
+            name='position',
+            field=models.CharField(blank=True, db_collation='C', default='', max_length=255),
+        ),
+        AddIndexConcurrently(
+            model_name='grocery',
+            index=models.Index(fields=['store_id', 'position'], name='grocery_store_position_idx'),
+        ),
+        migrations.RunPython(
+            backfill_positions,
+            migrations.RunPython.noop,
+        ),
+        RemoveIndexConcurrently(
+            model_name='grocery',
+            name='grocery_store_idx',
+        ),
+    ]
@@ -0,0 +1,123 @@
+# Generated by Django 3.2.25 on 2026-10-19 13:21
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+from django.db.models import F
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_completed_at(apps, schema_editor):
+    """Date already completed groceries by their last update, in batches
+    so no long lock is held on core_grocery"""
+    Grocery = apps.get_model('core', 'Grocery')
+    groceries = Grocery.objects.using(schema_editor.connection.alias).filter(
+        is_completed=True, completed_at__isnull=True)
+    while True:
+        ids = list(groceries.order_by().values_list(
+            'id', flat=True)[:1000])
+        if not ids:
+            break
+        groceries.filter(id__in=ids).update(completed_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0011_grocery_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255)),
+                ('name', models.CharField(max_length=255)),
+                ('added', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('last_completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupCursor',
+            fields=[
+                ('table', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('updated_at', models.DateTimeField(null=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WeeklyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField()),
+                ('added', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='archivedgrocery',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedgrocery',
+            name='created_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='grocery',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        # Existing rows keep a null created_at, new rows default to now
+        migrations.AddField(
+            model_name='grocery',
+            name='created_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='grocery',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, null=True),
+        ),
+        migrations.RunPython(
+            backfill_completed_at,
+            migrations.RunPython.noop,
+        ),
+        AddIndexConcurrently(
+            model_name='grocery',
+            index=models.Index(fields=['updated_at', 'id'], name='grocery_updated_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='store',
+            index=models.Index(fields=['updated_at', 'id'], name='store_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='weeklystats',
+            name='owner',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='itemstats',
+            name='owner',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='weeklystats',
+            constraint=models.UniqueConstraint(fields=('owner', 'week'), name='weekly_stats_owner_week_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='itemstats',
+            index=models.Index(fields=['owner', '-completed'], name='item_stats_top_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='itemstats',
+            constraint=models.UniqueConstraint(fields=('owner', 'key'), name='item_stats_owner_key_uniq'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-19 13:27
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0013_task_queue'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_verified', False)), fields=['created_at'], name='user_unverified_idx'),
+        ),
+    ]
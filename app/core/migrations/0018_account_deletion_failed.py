@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 13:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_data_export_failed'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='accountdeletion',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=16),
+        ),
+    ]
@@ -0,0 +1,140 @@
+# Generated by Django 3.2.25 on 2026-10-19 13:56
+
+from django.db import migrations, models, transaction
+from django.db.models import (
+    BooleanField,
+    Case,
+    DateField,
+    Exists,
+    Func,
+    OuterRef,
+    Value,
+    When,
+)
+from django.db.models.functions import Lower, Trim, TruncWeek
+
+
+def normalized_name():
+    return Lower(Trim(Func(
+        'name', Value(r'\s+'), Value(' '), Value('g'),
+        function='REGEXP_REPLACE',
+    )))
+
+
+def contribution(owner_id, key, added_week, completed_week, is_completed):
+    return [
+        owner_id,
+        key,
+        added_week and added_week.isoformat(),
+        completed_week and completed_week.isoformat(),
+        is_completed,
+    ]
+
+
+def backfill_counted(model, live, alias):
+    """Record what every row adds to the rollups, 1000 rows at a time"""
+    rows = model.objects.using(alias).order_by()
+    last_id = 0
+    while True:
+        ids = list(rows.filter(id__gt=last_id).order_by('id').values_list(
+            'id', flat=True)[:1000])
+        if not ids:
+            break
+        last_id = ids[-1]
+        batch = rows.filter(id__in=ids).annotate(
+            key=normalized_name(),
+            added_week=TruncWeek('created_at', output_field=DateField()),
+            completed_week=TruncWeek(
+                'completed_at', output_field=DateField()),
+            live=live,
+        ).values_list('id', 'live', 'owner_id', 'key', 'added_week',
+                      'completed_week', 'is_completed')
+        model.objects.using(alias).bulk_update([
+            model(id=row[0], counted=contribution(*row[2:]) if row[1]
+                  else None)
+            for row in batch
+        ], ['counted'])
+
+
+ROLLUP_SQL = [
+    'DELETE FROM {weekly}',
+    'DELETE FROM {items}',
+    """
+    INSERT INTO {weekly} (owner_id, week, added, completed)
+    SELECT owner_id, week, SUM(added), SUM(completed) FROM (
+        SELECT (counted->>0)::bigint AS owner_id,
+               (counted->>2)::date AS week, 1 AS added, 0 AS completed
+        FROM {groceries} WHERE counted->>2 IS NOT NULL
+        UNION ALL
+        SELECT (counted->>0)::bigint, (counted->>3)::date, 0, 1
+        FROM {groceries} WHERE counted->>3 IS NOT NULL
+    ) AS counts GROUP BY owner_id, week
+    """,
+    """
+    INSERT INTO {items}
+        (owner_id, key, name, added, completed, last_completed_at)
+    SELECT (counted->>0)::bigint, counted->>1, MAX(name), COUNT(*),
+           COUNT(*) FILTER (WHERE (counted->>4)::boolean),
+           MAX(completed_at)
+    FROM {groceries} WHERE counted IS NOT NULL
+    GROUP BY 1, 2
+    """,
+]
+
+
+def backfill(apps, schema_editor):
+    """Fill counted, then rebuild the rollups from it so both agree"""
+    alias = schema_editor.connection.alias
+    Store = apps.get_model('core', 'Store')
+    Grocery = apps.get_model('core', 'Grocery')
+    ArchivedGrocery = apps.get_model('core', 'ArchivedGrocery')
+    WeeklyStats = apps.get_model('core', 'WeeklyStats')
+    ItemStats = apps.get_model('core', 'ItemStats')
+
+    deleted_store = Store.objects.filter(
+        id=OuterRef('store_id'), deleted_at__isnull=False)
+    live = Case(
+        When(deleted_at__isnull=False, then=Value(False)),
+        When(Exists(deleted_store), then=Value(False)),
+        default=Value(True),
+        output_field=BooleanField(),
+    )
+    backfill_counted(Grocery, live, alias)
+    backfill_counted(ArchivedGrocery, Value(True), alias)
+
+    qn = schema_editor.quote_name
+    groceries = '(SELECT counted, name, completed_at FROM {} UNION ALL ' \
+                'SELECT counted, name, completed_at FROM {}) AS groceries'
+    tables = {
+        'weekly': qn(WeeklyStats._meta.db_table),
+        'items': qn(ItemStats._meta.db_table),
+        'groceries': groceries.format(
+            qn(Grocery._meta.db_table), qn(ArchivedGrocery._meta.db_table)),
+    }
+    with transaction.atomic(using=alias):
+        for sql in ROLLUP_SQL:
+            schema_editor.execute(sql.format(**tables))
+
+
+class Migration(migrations.Migration):
+
+    # The backfill commits every batch, no long lock on core_grocery
+    atomic = False
+
+    dependencies = [
+        ('core', '0019_shard_assignment_moving'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedgrocery',
+            name='counted',
+            field=models.JSONField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='grocery',
+            name='counted',
+            field=models.JSONField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
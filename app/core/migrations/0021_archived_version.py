@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-19 14:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_grocery_counted'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedgrocery',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='archivedstore',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.2.25 on 2026-10-19 14:10
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def merge_duplicate_profiles(apps, schema_editor):
+    """Keep the oldest profile of each owner, with the friends of all"""
+    alias = schema_editor.connection.alias
+    MyProfile = apps.get_model('core', 'MyProfile')
+    Friends = MyProfile.friends.through
+    owners = MyProfile.objects.using(alias).order_by().values(
+        'owner_id').annotate(profiles=Count('id')).filter(
+            profiles__gt=1).values_list('owner_id', flat=True)
+    for owner_id in owners.iterator():
+        profiles = list(MyProfile.objects.using(alias).filter(
+            owner_id=owner_id).order_by('id').values_list('id', flat=True))
+        kept, duplicates = profiles[0], profiles[1:]
+        known = Friends.objects.using(alias).filter(myprofile_id=kept)
+        user_ids = Friends.objects.using(alias).filter(
+            myprofile_id__in=duplicates
+        ).exclude(
+            user_id__in=known.values('user_id')
+        ).order_by().values_list('user_id', flat=True).distinct()
+        Friends.objects.using(alias).bulk_create([
+            Friends(myprofile_id=kept, user_id=user_id)
+            for user_id in user_ids
+        ])
+        Friends.objects.using(alias).filter(
+            myprofile_id__in=duplicates).delete()
+        MyProfile.objects.using(alias).filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    # Merged in one transaction, apart from the concurrent index build
+    # of 0023 which cannot run in one
+    atomic = True
+
+    dependencies = [
+        ('core', '0021_archived_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_profiles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.25 on 2026-10-19 14:10
+
+from django.db import migrations, models
+
+
+def drop_invalid_index(apps, schema_editor):
+    """Drop the index left invalid by an interrupted or failed
+    CREATE INDEX CONCURRENTLY, IF NOT EXISTS would keep it"""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT NOT indisvalid FROM pg_index '
+            "WHERE indexrelid = to_regclass('my_profile_owner_uniq')")
+        row = cursor.fetchone()
+    if row is not None and row[0]:
+        schema_editor.execute(
+            'DROP INDEX CONCURRENTLY IF EXISTS my_profile_owner_uniq')
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0022_merge_duplicate_profiles'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_invalid_index, migrations.RunPython.noop),
+        # Built without blocking writes, then turned into the constraint
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='myprofile',
+                    constraint=models.UniqueConstraint(fields=('owner',), name='my_profile_owner_uniq'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS '
+                    'my_profile_owner_uniq ON core_myprofile (owner_id)',
+                    'DROP INDEX CONCURRENTLY IF EXISTS my_profile_owner_uniq',
+                ),
+                migrations.RunSQL(
+                    'ALTER TABLE core_myprofile ADD CONSTRAINT '
+                    'my_profile_owner_uniq UNIQUE USING INDEX '
+                    'my_profile_owner_uniq',
+                    'ALTER TABLE core_myprofile DROP CONSTRAINT '
+                    'my_profile_owner_uniq',
+                ),
+            ],
+        ),
+    ]
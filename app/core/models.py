@@ -1,5 +1,11 @@
+import uuid
+
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -8,6 +14,9 @@ from django.contrib.auth.models import (
 
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from core import hashers
+from core.sharding import assign_shard
+
 
 class UserManager(BaseUserManager):
 
@@ -23,6 +32,7 @@ class UserManager(BaseUserManager):
         user = self.model(username=username, email=self.normalize_email(email))
         user.set_password(password)
         user.save(using=self._db)
+        assign_shard(user)
 
         return user
 
@@ -55,9 +65,33 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     objects = UserManager()
 
+    class Meta:
+        indexes = [
+            # Stale unverified accounts, see purge_unverified
+            models.Index(
+                fields=['created_at'],
+                name='user_unverified_idx',
+                condition=models.Q(is_verified=False),
+            ),
+        ]
+
     def __str__(self):
         return self.email
 
+    def set_password(self, raw_password):
+        """Hash the password in the bounded hashing pool"""
+        self.password = hashers.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """Check the password, saving a rehash when the hasher or
+        its parameters changed since it was set"""
+        def setter(raw_password):
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=['password'])
+        return hashers.check_password(raw_password, self.password, setter)
+
     def tokens(self):
         """Return Tokens"""
         refresh = RefreshToken.for_user(self)
@@ -67,31 +101,186 @@ class User(AbstractBaseUser, PermissionsMixin):
         }
 
 
-class Store(models.Model):
-    """Store object."""
+class LiveManager(models.Manager):
+    """Manager hiding soft deleted rows"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class GroceryManager(LiveManager):
+    """Manager hiding soft deleted groceries and those of deleted stores"""
+
+    def get_queryset(self):
+        return super().get_queryset().exclude(
+            store_id__in=Store.all_objects.filter(
+                deleted_at__isnull=False).values('id')
+        )
+
+
+class SoftDeleteMixin:
+    """Delete by setting deleted_at, rows are purged later in batches"""
+
+    def soft_delete(self):
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['deleted_at', 'updated_at'])
+
+
+class CompletedAtMixin:
+    """Track when the row was completed, for archiving and analytics"""
+
+    def save(self, *args, **kwargs):
+        if not self.is_completed:
+            self.completed_at = None
+        elif self.completed_at is None:
+            self.completed_at = timezone.now()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'is_completed' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'completed_at'}
+        super().save(*args, **kwargs)
+
+
+class StoreQuerySet(models.QuerySet):
+
+    def visible_to(self, user):
+        """Stores owned by or shared with the user"""
+        shared = Store.shares.through.objects.filter(user=user)
+        return self.filter(
+            models.Q(owner=user) |
+            models.Q(id__in=shared.values('store_id'))
+        )
+
+
+class Store(SoftDeleteMixin, CompletedAtMixin, models.Model):
+    """Store object. Lives on its owner's shard, see core.sharding"""
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_constraint=False,
     )
     name = models.CharField(max_length=255)
     groceries = models.ManyToManyField('Grocery', blank=True)
     is_completed = models.BooleanField(default=False)
-    shares = models.ManyToManyField('User', related_name='shares', blank=True)
+    shares = models.ManyToManyField(
+                                    'User',
+                                    related_name='shares',
+                                    blank=True,
+                                    db_constraint=False
+                                )
+    completed_at = models.DateTimeField(null=True, blank=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    version = models.PositiveIntegerField(default=1)
+
+    objects = LiveManager.from_queryset(StoreQuerySet)()
+    all_objects = StoreQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['owner', 'is_completed'],
+                name='store_owner_completed_idx',
+            ),
+            models.Index(
+                fields=['deleted_at'],
+                name='store_deleted_idx',
+                condition=models.Q(deleted_at__isnull=False),
+            ),
+            models.Index(
+                fields=['completed_at'],
+                name='store_completed_at_idx',
+                condition=models.Q(is_completed=True),
+            ),
+            # Change cursor of the analytics rollups
+            models.Index(
+                fields=['updated_at', 'id'],
+                name='store_updated_idx',
+            ),
+            GinIndex(
+                SearchVector('name', config='simple'),
+                name='store_name_search_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Grocery(models.Model):
+class RecurringStore(models.Model):
+    """Schedule copying a template store every interval_days.
+    Lives on the store's shard, see core.cloning"""
+    store = models.OneToOneField(
+        Store,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='recurrence',
+    )
+    interval_days = models.PositiveIntegerField(default=7)
+    next_run_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return '%s every %d days' % (self.store_id, self.interval_days)
+
+
+class Grocery(SoftDeleteMixin, CompletedAtMixin, models.Model):
     """Grocery Item"""
     name = models.CharField(max_length=255)
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_constraint=False,
     )
     qty = models.IntegerField(default=1)
     is_completed = models.BooleanField(default=False)
-    store_id = models.IntegerField(default=0)
+    store_id = models.BigIntegerField(default=0)
+    # Fractional ordering key within the store, see core.positions
+    position = models.CharField(
+        max_length=255, default='', blank=True, db_collation='C')
+    # Null for groceries added before it was recorded. Not auto_now_add,
+    # which would overwrite it when rows are copied between tables
+    created_at = models.DateTimeField(
+        default=timezone.now, null=True, editable=False)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    version = models.PositiveIntegerField(default=1)
+    # What the row adds to the analytics rollups, see core.analytics
+    counted = models.JSONField(null=True, editable=False)
+
+    objects = GroceryManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        ordering = ['position', 'id']
+        indexes = [
+            # Also serves the lookups by store_id alone
+            models.Index(
+                fields=['store_id', 'position'],
+                name='grocery_store_position_idx',
+            ),
+            models.Index(
+                fields=['updated_at', 'id'],
+                name='grocery_updated_idx',
+            ),
+            models.Index(
+                fields=['deleted_at'],
+                name='grocery_deleted_idx',
+                condition=models.Q(deleted_at__isnull=False),
+            ),
+            models.Index(
+                fields=['store_id'],
+                name='grocery_store_incomplete_idx',
+                condition=models.Q(is_completed=False),
+            ),
+            models.Index(
+                fields=['owner', 'is_completed'],
+                name='grocery_owner_completed_idx',
+            ),
+            GinIndex(
+                SearchVector('name', config='simple'),
+                name='grocery_name_search_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -109,5 +298,246 @@ class MyProfile(models.Model):
                                     blank=True
                                 )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['owner'],
+                name='my_profile_owner_uniq',
+            ),
+        ]
+
     def __str__(self):
         return self.owner.username
+
+
+class ShardAssignment(models.Model):
+    """Shard holding a user's stores and groceries"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+    shard = models.CharField(max_length=64, db_index=True)
+    # Set by move_user, writes are refused until the move is over
+    moving = models.BooleanField(default=False)
+
+    def __str__(self):
+        return '%s: %s' % (self.user_id, self.shard)
+
+
+class ArchivedStore(models.Model):
+    """Completed store moved out of the hot tables, see core.archive"""
+    id = models.BigIntegerField(primary_key=True)
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+    )
+    name = models.CharField(max_length=255)
+    is_completed = models.BooleanField(default=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    shares = ArrayField(models.BigIntegerField(), default=list, blank=True)
+    # Kept for restoring, see groceries_list.concurrency
+    version = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        return self.name
+
+
+class ArchivedGrocery(models.Model):
+    """Grocery of an archived store"""
+    id = models.BigIntegerField(primary_key=True)
+    store = models.ForeignKey(
+        ArchivedStore,
+        on_delete=models.CASCADE,
+        related_name='groceries',
+    )
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+    )
+    name = models.CharField(max_length=255)
+    qty = models.IntegerField(default=1)
+    is_completed = models.BooleanField(default=False)
+    position = models.CharField(
+        max_length=255, default='', blank=True, db_collation='C')
+    created_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    counted = models.JSONField(null=True, editable=False)
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        ordering = ['position', 'id']
+
+    def __str__(self):
+        return self.name
+
+
+class WeeklyStats(models.Model):
+    """Groceries a user added and completed per week, see core.analytics"""
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+    )
+    week = models.DateField()
+    added = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['owner', 'week'],
+                name='weekly_stats_owner_week_uniq',
+            ),
+        ]
+
+
+class ItemStats(models.Model):
+    """How often a user added and completed a grocery name"""
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+    )
+    key = models.CharField(max_length=255)
+    name = models.CharField(max_length=255)
+    added = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    last_completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['owner', 'key'],
+                name='item_stats_owner_key_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['owner', '-completed'],
+                name='item_stats_top_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class RollupCursor(models.Model):
+    """Last (updated_at, id) of a table folded into the rollups of a
+    shard. Lives on every shard"""
+    table = models.CharField(max_length=64, primary_key=True)
+    updated_at = models.DateTimeField(null=True)
+    last_id = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return self.table
+
+
+class Task(models.Model):
+    """Queued call of a registered function, see core.taskqueue"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=255)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=1)
+    # When a queued task is due, or a running one's lease expires
+    run_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['run_at'],
+                name='task_due_idx',
+                condition=models.Q(status__in=['queued', 'running']),
+            ),
+            models.Index(fields=['name', 'status'], name='task_name_idx'),
+        ]
+
+    def __str__(self):
+        return '%s (%s)' % (self.name, self.status)
+
+
+class PeriodicTask(models.Model):
+    """Enqueue a registered task every interval seconds, kept in step
+    with TASKS['PERIODIC'] by the workers"""
+    name = models.CharField(max_length=255, primary_key=True)
+    interval = models.PositiveIntegerField()
+    next_run_at = models.DateTimeField()
+
+    def __str__(self):
+        return '%s every %ds' % (self.name, self.interval)
+
+
+class AccountDeletion(models.Model):
+    """Background deletion of a deactivated user's rows, see
+    core.accounts. Its id is the unguessable key of the progress URL."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Not a foreign key, the user row is deleted last
+    user_id = models.BigIntegerField(db_index=True)
+    status = models.CharField(
+        max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    # Rows deleted so far, by kind
+    deleted = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return '%s (%s)' % (self.user_id, self.status)
+
+
+class DataExport(models.Model):
+    """Archive of a user's data, built in the background, see
+    core.exports"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    status = models.CharField(
+        max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    file = models.FileField(upload_to='exports/', blank=True)
+    size = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return '%s (%s)' % (self.owner_id, self.status)
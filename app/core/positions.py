@@ -0,0 +1,155 @@
+"""
+Fractional ordering keys for the groceries of a store.
+
+Grocery.position holds a base 62 string compared byte by byte (the
+column uses the C collation). A key can always be made between two
+others, so moving a grocery rewrites its own row only. Keys never end
+with the lowest digit, which keeps room below every key. Moves between
+close neighbours lengthen the keys; rebalance_store rewrites a store's
+keys evenly spaced again, see the rebalance_positions command. A key
+that would not fit the column is never written, the store is rebalanced
+first.
+"""
+from django.db import transaction
+from django.db.models import Q
+
+DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+
+# Keys longer than this are shortened by rebalance_positions
+MAX_LENGTH = 16
+
+
+def midpoint(low, high):
+    """Key between low and high (None for no upper bound), low < high"""
+    if high is not None:
+        n = 0
+        while n < len(high) and (low[n] if n < len(low) else '0') == high[n]:
+            n += 1
+        if n:
+            return high[:n] + midpoint(low[n:], high[n:])
+    low_digit = DIGITS.index(low[0]) if low else 0
+    high_digit = DIGITS.index(high[0]) if high else BASE
+    if high_digit - low_digit > 1:
+        return DIGITS[(low_digit + high_digit) // 2]
+    if high is not None and len(high) > 1:
+        return high[:1]
+    return DIGITS[low_digit] + midpoint(low[1:], None)
+
+
+def increment(key):
+    """Smallest key of the same length after key, longer on overflow"""
+    i = len(key) - 1
+    while i >= 0 and key[i] == DIGITS[-1]:
+        i -= 1
+    if i < 0:
+        return key + DIGITS[BASE // 2]
+    return key[:i] + DIGITS[DIGITS.index(key[i]) + 1]
+
+
+def key_between(before, after):
+    """Key sorting after before and before after, either may be None.
+    Raise ValueError if no key fits (before >= after)."""
+    if after is not None and (before or '') >= after:
+        raise ValueError('No key between %r and %r' % (before, after))
+    if after is None and before:
+        # Appending is the common case, increment to keep keys short
+        return increment(before)
+    return midpoint(before or '', after)
+
+
+def keys_after(before, count):
+    """count increasing keys after before (None for an empty store)"""
+    keys = []
+    for _ in range(count):
+        before = key_between(before, None)
+        keys.append(before)
+    return keys
+
+
+def spread_keys(count):
+    """count evenly spaced keys in the lower half of the key space, the
+    upper half is left for appends"""
+    width = 1
+    while BASE ** width < 4 * (count + 1):
+        width += 1
+    step = BASE ** width // (2 * (count + 1))
+    keys = []
+    for i in range(1, count + 1):
+        value, digits = i * step, []
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits.append(DIGITS[digit])
+        keys.append(''.join(reversed(digits)).rstrip(DIGITS[0]))
+    return keys
+
+
+def column_length():
+    """Longest key Grocery.position holds"""
+    from core.models import Grocery
+    return Grocery._meta.get_field('position').max_length
+
+
+def next_positions(store_id, count, using=None):
+    """Keys for count groceries appended to a store, rebalanced first
+    if the keys would not fit the column"""
+    from core.models import Grocery
+    for _ in range(2):
+        last = Grocery.all_objects.db_manager(using).filter(
+            store_id=store_id).order_by('-position').values_list(
+                'position', flat=True).first()
+        keys = keys_after(last, count)
+        if not keys or len(keys[-1]) <= column_length():
+            return keys
+        rebalance_store(store_id, using=using)
+    raise ValueError('Store %s could not be rebalanced' % store_id)
+
+
+def position_after(grocery, after, using=None):
+    """Key moving grocery right after the grocery after of the same
+    store, to the top if after is None. The store is rebalanced first
+    when its keys leave no room, e.g. after concurrent appends, or the
+    key would not fit the column.
+    Raise ValueError if there is still no room after rebalancing."""
+    from core.models import Grocery
+    siblings = Grocery.objects.db_manager(using).filter(
+        store_id=grocery.store_id).exclude(id=grocery.id)
+    for _ in range(2):
+        if after is None:
+            before = None
+            following = siblings.first()
+        else:
+            before = after.position
+            following = siblings.filter(
+                Q(position__gt=after.position) |
+                Q(position=after.position, id__gt=after.id)
+            ).first()
+        try:
+            key = key_between(
+                before, following.position if following else None)
+        except ValueError:
+            key = None
+        if key is not None and len(key) <= column_length():
+            return key
+        rebalance_store(grocery.store_id, using=using)
+        if after is not None:
+            after.refresh_from_db(fields=['position'])
+    raise ValueError('Store %s could not be rebalanced' % grocery.store_id)
+
+
+def rebalance_store(store_id, using=None):
+    """Rewrite the positions of a store's groceries evenly spaced,
+    keeping their order. Return the number of groceries updated."""
+    from core.models import Grocery
+    with transaction.atomic(using=using):
+        groceries = list(
+            Grocery.all_objects.db_manager(using).filter(
+                store_id=store_id
+            ).order_by('position', 'id').select_for_update().only(
+                'id', 'position')
+        )
+        for grocery, key in zip(groceries, spread_keys(len(groceries))):
+            grocery.position = key
+        Grocery.all_objects.db_manager(using).bulk_update(
+            groceries, ['position'], batch_size=500)
+    return len(groceries)
@@ -0,0 +1,44 @@
+"""
+MessagePack renderer and parser, a compact binary alternative to JSON
+selected with the Accept and Content-Type headers.
+"""
+import msgpack
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+MEDIA_TYPE = 'application/msgpack'
+
+_encoder = JSONEncoder()
+
+
+def encode_default(obj):
+    """Encode types msgpack does not know (dates, decimals, lazy strings)
+    the same way the JSON renderer does"""
+    return _encoder.default(obj)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Render response data as MessagePack"""
+    media_type = MEDIA_TYPE
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    """Parse MessagePack request bodies"""
+    media_type = MEDIA_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError) as exc:
+            raise ParseError('MessagePack parse error - %s' % exc)
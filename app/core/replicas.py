@@ -0,0 +1,85 @@
+"""
+Read replica routing with read-your-writes pinning.
+
+Views opt in with ReplicaReadMixin: their safe requests read from a
+replica unless the user wrote something within REPLICA_PIN_SECONDS.
+PrimaryPinMiddleware pins users after any successful unsafe request.
+Pins live in the cache, use a shared cache (CACHE_BACKEND) when running
+several processes or a user's next read may miss their write.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+
+from rest_framework.permissions import SAFE_METHODS
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+
+
+def pin_key(user_id):
+    return 'db-primary-pin:%s' % user_id
+
+
+def pin_to_primary(user):
+    """Read from the primary for a while after this user writes"""
+    cache.set(pin_key(user.id), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user):
+    return user.is_authenticated and cache.get(pin_key(user.id), False)
+
+
+class PrimaryReplicaRouter:
+    """Send reads to a random replica while a replica-read view runs"""
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas receive the schema through replication
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaReadMixin:
+    """Serve GET/HEAD/OPTIONS from replicas for users not pinned. The
+    choice is undone when dispatch returns, whatever happened."""
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _use_replica.set(_use_replica.get())
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and not is_pinned(request.user):
+            _use_replica.set(True)
+
+
+class PrimaryPinMiddleware:
+    """Pin the user to the primary after a successful write.
+    DRF copies the authenticated user onto the Django request, so the
+    JWT user is visible here once the view has run."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        user = getattr(request, 'user', None)
+        if request.method not in SAFE_METHODS and \
+                response.status_code < 400 and \
+                user is not None and user.is_authenticated:
+            pin_to_primary(user)
+        return response
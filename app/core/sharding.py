@@ -0,0 +1,308 @@
+"""
+Owner based sharding of stores and groceries.
+
+Every shard holds the full schema but a user's stores, their groceries
+and the Store through tables live on one shard only, recorded in
+ShardAssignment on 'default'. Users without an assignment, which is
+everyone while only 'default' is configured, stay on 'default'. The
+assignment is read from 'default' for every request rather than cached
+in the process, since any process may move a user.
+Shard ids come from disjoint ranges (see SHARD_ID_BITS) so rows keep
+their ids when a user is moved to another shard.
+"""
+import contextlib
+import contextvars
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+
+# Ids on shard_N start at N << SHARD_ID_BITS
+SHARD_ID_BITS = 40
+
+SHARDED_MODELS = {
+    'core.store',
+    'core.grocery',
+    'core.store_groceries',
+    'core.store_shares',
+    'core.archivedstore',
+    'core.archivedgrocery',
+    'core.recurringstore',
+    'core.weeklystats',
+    'core.itemstats',
+    'core.rollupcursor',
+}
+
+_current_shard = contextvars.ContextVar('current_shard', default=None)
+
+
+def shard_aliases():
+    return settings.DATABASE_SHARDS
+
+
+def is_sharded(model):
+    return model._meta.label_lower in SHARDED_MODELS
+
+
+def id_offset(alias):
+    """First id of the sequences on a shard alias"""
+    if not alias.startswith('shard_'):
+        return 0
+    return int(alias[len('shard_'):]) << SHARD_ID_BITS
+
+
+def shard_state(user_id):
+    """(alias of the shard holding the user's stores, whether they are
+    being moved)"""
+    if len(shard_aliases()) == 1:
+        return 'default', False
+    from core.models import ShardAssignment
+    state = ShardAssignment.objects.filter(
+        user_id=user_id).values_list('shard', 'moving').first()
+    return state or ('default', False)
+
+
+def shard_for_user(user_id):
+    """Alias of the shard holding the user's stores"""
+    return shard_state(user_id)[0]
+
+
+def shard_of_store(store_id, user):
+    """(alias, owner id) of a store owned by or shared with the user,
+    None if there is none. Shared stores live on their owner's shard,
+    the user's own shard is tried first."""
+    from core.models import Store
+    own = shard_for_user(user.id)
+    for alias in [own] + [a for a in shard_aliases() if a != own]:
+        owner_id = Store.objects.using(alias).visible_to(user).filter(
+            id=store_id).values_list('owner_id', flat=True).first()
+        if owner_id is not None:
+            return alias, owner_id
+    return None
+
+
+def assign_shard(user):
+    """Place a new user on a shard, spreading users by id"""
+    aliases = shard_aliases()
+    if len(aliases) == 1:
+        return
+    from core.models import ShardAssignment
+    ShardAssignment.objects.create(
+        user=user,
+        shard=aliases[user.id % len(aliases)]
+    )
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def copy_rows(model, source, target, lookup, batch_size):
+    rows = list(model._base_manager.using(source).filter(lookup))
+    model._base_manager.using(target).bulk_create(rows, batch_size=batch_size)
+
+
+def move_user(user_id, target, batch_size=500):
+    """Move a user's stores with their groceries, through rows,
+    schedules, archive and analytics to target, keeping ids. Writes are
+    refused (ShardMoving) while the user is being moved; rows are copied
+    in one transaction on the target, the assignment is switched, then
+    the source rows are deleted.
+    Return the number of stores moved."""
+    from core.models import (
+        ArchivedGrocery,
+        ArchivedStore,
+        Grocery,
+        ItemStats,
+        RecurringStore,
+        ShardAssignment,
+        Store,
+        WeeklyStats,
+    )
+    source = shard_for_user(user_id)
+    if source == target:
+        return 0
+
+    groceries_through = Store.groceries.through
+    shares_through = Store.shares.through
+    ShardAssignment.objects.update_or_create(
+        user_id=user_id, defaults={'shard': source, 'moving': True})
+    try:
+        store_ids = list(
+            Store._base_manager.using(source).filter(
+                owner_id=user_id).values_list('id', flat=True)
+        )
+        archived_ids = list(
+            ArchivedStore._base_manager.using(source).filter(
+                owner_id=user_id).values_list('id', flat=True)
+        )
+        with transaction.atomic(using=target):
+            for chunk in chunked(store_ids, batch_size):
+                linked = groceries_through.objects.using(source).filter(
+                    store_id__in=chunk).values('grocery_id')
+                copy_rows(Store, source, target, Q(id__in=chunk), batch_size)
+                copy_rows(
+                    Grocery, source, target,
+                    Q(store_id__in=chunk) | Q(id__in=linked),
+                    batch_size
+                )
+                for model in (
+                        groceries_through, shares_through, RecurringStore):
+                    copy_rows(
+                        model, source, target,
+                        Q(store_id__in=chunk), batch_size
+                    )
+            for chunk in chunked(archived_ids, batch_size):
+                copy_rows(ArchivedStore, source, target,
+                          Q(id__in=chunk), batch_size)
+                copy_rows(ArchivedGrocery, source, target,
+                          Q(store_id__in=chunk), batch_size)
+            # Rollup ids are not sharded, the target numbers its own
+            for model in (WeeklyStats, ItemStats):
+                rows = list(model.objects.using(source).filter(
+                    owner_id=user_id))
+                for row in rows:
+                    row.id = None
+                model.objects.using(target).bulk_create(
+                    rows, batch_size=batch_size)
+
+        ShardAssignment.objects.filter(user_id=user_id).update(
+            shard=target)
+
+        with transaction.atomic(using=source):
+            for chunk in chunked(store_ids, batch_size):
+                linked = list(groceries_through.objects.using(source).filter(
+                    store_id__in=chunk).values_list('grocery_id', flat=True))
+                for through in (groceries_through, shares_through):
+                    through.objects.using(source).filter(
+                        store_id__in=chunk).delete()
+                Grocery._base_manager.using(source).filter(
+                    Q(store_id__in=chunk) | Q(id__in=linked)).delete()
+                Store._base_manager.using(source).filter(
+                    id__in=chunk).delete()
+            for chunk in chunked(archived_ids, batch_size):
+                ArchivedStore._base_manager.using(source).filter(
+                    id__in=chunk).delete()
+            for model in (WeeklyStats, ItemStats):
+                model.objects.using(source).filter(owner_id=user_id).delete()
+    finally:
+        ShardAssignment.objects.filter(user_id=user_id).update(moving=False)
+    return len(store_ids)
+
+
+def shard_loads():
+    """Return {alias: {owner_id: store count}} over all shards"""
+    from core.models import Store
+    return {
+        alias: dict(
+            Store._base_manager.using(alias).values('owner_id').annotate(
+                stores=Count('id')).values_list('owner_id', 'stores')
+        )
+        for alias in shard_aliases()
+    }
+
+
+def plan_moves(loads, max_moves):
+    """Greedily pick (owner_id, source, target) moves from the most to
+    the least loaded shard while a move narrows the gap between them"""
+    loads = {alias: dict(owners) for alias, owners in loads.items()}
+    moves = []
+    while len(moves) < max_moves:
+        totals = {alias: sum(owners.values())
+                  for alias, owners in loads.items()}
+        source = max(totals, key=totals.get)
+        target = min(totals, key=totals.get)
+        gap = totals[source] - totals[target]
+        candidates = [
+            (abs(gap - 2 * stores), stores, owner_id)
+            for owner_id, stores in loads[source].items()
+            if stores < gap
+        ]
+        if not candidates:
+            break
+        # Closest to halving the gap, the smaller move on ties
+        _, stores, owner_id = min(candidates)
+        loads[target][owner_id] = loads[source].pop(owner_id)
+        moves.append((owner_id, source, target))
+    return moves
+
+
+@contextlib.contextmanager
+def use_shard(alias):
+    """Route sharded models without an instance hint to alias"""
+    token = _current_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _current_shard.reset(token)
+
+
+class ShardRouter:
+    """Route sharded models to the instance's or the current shard"""
+
+    def shard_for_hints(self, model, hints):
+        instance = hints.get('instance')
+        if instance is not None:
+            if instance._state.db:
+                return instance._state.db
+            owner_id = getattr(instance, 'owner_id', None)
+            if _current_shard.get() is None and owner_id is not None:
+                return shard_for_user(owner_id)
+        return _current_shard.get()
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower == 'core.shardassignment':
+            return 'default'
+        if is_sharded(model):
+            alias = self.shard_for_hints(model, hints)
+            # 'default' reads are left to the replica router
+            return None if alias == 'default' else alias
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db != 'default' and \
+                instance._state.db in shard_aliases():
+            # e.g. store.owner, users only exist on 'default'
+            return 'default'
+        return None
+
+    def db_for_write(self, model, **hints):
+        if is_sharded(model):
+            return self.shard_for_hints(model, hints) or 'default'
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+class ShardMoving(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Your lists are being moved, try again shortly.'
+    default_code = 'shard_moving'
+
+
+class ShardMixin:
+    """Run the view on the requesting user's shard. The shard is set
+    once the user is authenticated and unset when dispatch returns."""
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _current_shard.set(_current_shard.get())
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _current_shard.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if not request.user.is_authenticated:
+            return
+        alias, moving = shard_state(request.user.id)
+        if moving and request.method not in SAFE_METHODS:
+            raise ShardMoving()
+        _current_shard.set(alias)
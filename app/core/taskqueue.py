@@ -0,0 +1,231 @@
+"""
+Database backed background tasks.
+
+Apps register functions with @task in their tasks.py module, found when
+the core app is ready, and queue calls with func.delay(...) or enqueue().
+A queued call is a Task row on 'default', written in the caller's
+transaction, so it only runs once the request commits.
+
+Workers (the run_worker command) claim due tasks with SELECT ... FOR
+UPDATE SKIP LOCKED, so any number of them share the queue without
+handing a task to two workers at once. A claimed task is leased for its
+visibility timeout: run_at moves to the end of the lease and a task whose
+worker died is claimed again once it expires. Failed calls are retried
+with an exponential backoff until max_attempts, then kept as FAILED.
+A task whose last attempt's lease expired is FAILED too, so a task that
+kills its worker is not run forever.
+Tasks run at least once, so they should be safe to repeat.
+
+Workers also enqueue the TASKS['PERIODIC'] tasks when they are due,
+unless the previous run is still queued or running.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import PeriodicTask, Task
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MAX_ATTEMPTS': 3,
+    'VISIBILITY_TIMEOUT': 300,
+    'RETRY_DELAY': 30,
+    'POLL_INTERVAL': 1,
+    'PERIODIC': {},
+}
+
+registry = {}
+
+
+def get_setting(name):
+    return getattr(settings, 'TASKS', {}).get(name, DEFAULTS[name])
+
+
+def task(name=None, max_attempts=None, timeout=None, on_failure=None):
+    """Register a function as a task named name, by default
+    '<module>.<function>'. timeout overrides VISIBILITY_TIMEOUT, the
+    seconds a worker may run it before it is handed to another one.
+    on_failure is called with the task's arguments once it is FAILED."""
+    def register(func):
+        task_name = name or '%s.%s' % (func.__module__, func.__name__)
+        registry[task_name] = (func, {
+            'max_attempts': max_attempts,
+            'timeout': timeout,
+            'on_failure': on_failure,
+        })
+
+        def delay(*args, **kwargs):
+            return enqueue(task_name, args, kwargs)
+        func.task_name = task_name
+        func.delay = delay
+        return func
+    return register
+
+
+def enqueue(name, args=(), kwargs=None, run_at=None):
+    """Queue a call of the registered task name. args and kwargs must be
+    JSON serializable."""
+    if name not in registry:
+        raise KeyError('Unknown task %r' % name)
+    options = registry[name][1]
+    return Task.objects.create(
+        name=name,
+        args=list(args),
+        kwargs=kwargs or {},
+        max_attempts=options['max_attempts'] or get_setting('MAX_ATTEMPTS'),
+        run_at=run_at or timezone.now(),
+    )
+
+
+def lease(name):
+    timeout = registry.get(name, (None, {}))[1].get('timeout')
+    return timedelta(seconds=timeout or get_setting('VISIBILITY_TIMEOUT'))
+
+
+def failed(failed_task):
+    """Run the on_failure hook of a task that is now FAILED"""
+    hook = registry.get(failed_task.name, (None, {}))[1].get('on_failure')
+    if hook is None:
+        return
+    try:
+        hook(*failed_task.args, **failed_task.kwargs)
+    except Exception:
+        logger.exception('on_failure of task %s %s failed',
+                         failed_task.id, failed_task.name)
+
+
+def fail_abandoned(now):
+    """Mark FAILED the running tasks whose last attempt's lease expired,
+    their worker died or overran. Return them."""
+    abandoned = list(Task.objects.filter(
+        status=Task.RUNNING,
+        run_at__lte=now,
+        attempts__gte=F('max_attempts'),
+    ).select_for_update(skip_locked=True))
+    for abandoned_task in abandoned:
+        logger.warning('Task %s %s abandoned after %d attempts',
+                       abandoned_task.id, abandoned_task.name,
+                       abandoned_task.attempts)
+        abandoned_task.status = Task.FAILED
+        abandoned_task.last_error = 'The lease of the last attempt ' \
+            'expired, its worker died or overran the timeout.'
+        abandoned_task.save(update_fields=['status', 'last_error'])
+        failed(abandoned_task)
+    return abandoned
+
+
+def claim(now):
+    """Lease the next due task to this worker, None if there is none"""
+    with transaction.atomic():
+        fail_abandoned(now)
+        claimed = Task.objects.filter(
+            status__in=[Task.QUEUED, Task.RUNNING],
+            run_at__lte=now,
+        ).exclude(
+            status=Task.RUNNING,
+            attempts__gte=F('max_attempts'),
+        ).order_by('run_at').select_for_update(skip_locked=True).first()
+        if claimed is None:
+            return None
+        claimed.status = Task.RUNNING
+        claimed.attempts += 1
+        claimed.run_at = now + lease(claimed.name)
+        claimed.save(update_fields=['status', 'attempts', 'run_at'])
+    return claimed
+
+
+def execute(claimed):
+    """Run a claimed task. Only the worker holding the current lease
+    (same attempt) records the outcome."""
+    current = Task.objects.filter(
+        id=claimed.id, status=Task.RUNNING, attempts=claimed.attempts)
+    try:
+        if claimed.name not in registry:
+            raise KeyError('Unknown task %r' % claimed.name)
+        func = registry[claimed.name][0]
+        func(*claimed.args, **claimed.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Task %s %s failed:\n%s',
+                       claimed.id, claimed.name, error)
+        if claimed.attempts < claimed.max_attempts:
+            delay = get_setting('RETRY_DELAY') * 2 ** (claimed.attempts - 1)
+            current.update(
+                status=Task.QUEUED,
+                run_at=timezone.now() + timedelta(seconds=delay),
+                last_error=error,
+            )
+        elif current.update(status=Task.FAILED, last_error=error):
+            failed(claimed)
+        return False
+    current.delete()
+    return True
+
+
+def sync_periodic():
+    """Make PeriodicTask rows match TASKS['PERIODIC']"""
+    periodic = get_setting('PERIODIC')
+    unknown = set(periodic) - set(registry)
+    if unknown:
+        raise ImproperlyConfigured(
+            'Unknown periodic tasks: %s' % ', '.join(sorted(unknown)))
+    now = timezone.now()
+    for name, interval in periodic.items():
+        schedule, created = PeriodicTask.objects.get_or_create(
+            name=name, defaults={'interval': interval, 'next_run_at': now})
+        if not created and schedule.interval != interval:
+            schedule.interval = interval
+            schedule.save(update_fields=['interval'])
+    PeriodicTask.objects.exclude(name__in=list(periodic)).delete()
+
+
+def schedule_due(now):
+    """Enqueue the periodic tasks that are due. Return how many."""
+    with transaction.atomic():
+        due = list(
+            PeriodicTask.objects.filter(
+                next_run_at__lte=now
+            ).select_for_update(skip_locked=True)
+        )
+        queued = 0
+        for schedule in due:
+            pending = Task.objects.filter(
+                name=schedule.name,
+                status__in=[Task.QUEUED, Task.RUNNING],
+            ).exists()
+            if not pending:
+                enqueue(schedule.name)
+                queued += 1
+            interval = timedelta(seconds=schedule.interval)
+            while schedule.next_run_at <= now:
+                schedule.next_run_at += interval
+            schedule.save(update_fields=['next_run_at'])
+    return queued
+
+
+def work(stop, burst=False):
+    """Run tasks until stop (an Event) is set, or until no task is due
+    when burst. Return the number of tasks run."""
+    ran = 0
+    while not stop.is_set():
+        if not transaction.get_connection().in_atomic_block:
+            # Drop connections broken or past CONN_MAX_AGE between tasks
+            close_old_connections()
+        now = timezone.now()
+        schedule_due(now)
+        claimed = claim(now)
+        if claimed is None:
+            if burst:
+                break
+            stop.wait(get_setting('POLL_INTERVAL'))
+            continue
+        execute(claimed)
+        ran += 1
+    return ran
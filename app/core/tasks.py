@@ -0,0 +1,53 @@
+"""
+Background tasks of the core app, most run periodically by the workers.
+"""
+from django.core.management import call_command
+from django.utils import timezone
+
+from core import accounts, exports
+from core.taskqueue import task
+
+
+@task()
+def purge_deleted():
+    call_command('purge_deleted')
+
+
+@task()
+def archive_stores():
+    call_command('archive_stores')
+
+
+@task()
+def run_recurring_stores():
+    call_command('run_recurring_stores')
+
+
+@task()
+def rollup_analytics():
+    call_command('rollup_analytics')
+
+
+@task()
+def rebalance_positions():
+    call_command('rebalance_positions')
+
+
+@task()
+def purge_unverified():
+    call_command('purge_unverified')
+
+
+@task(timeout=3600, on_failure=accounts.fail_deletion)
+def delete_account(deletion_id):
+    accounts.delete_account(deletion_id)
+
+
+@task(timeout=3600, on_failure=exports.fail_export)
+def export_data(export_id):
+    exports.build_export(export_id)
+
+
+@task()
+def purge_exports():
+    exports.purge_expired(timezone.now())
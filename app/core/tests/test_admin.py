@@ -1,11 +1,18 @@
 """
 Test for the Django admin modifications.
 """
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import Client
 
+from core.admin import EstimatedCountPaginator
+from core.models import Grocery, ItemStats, Store
+
 
 class AdminSiteTests(TestCase):
     """Tests for Django admin."""
@@ -37,3 +44,128 @@ class AdminSiteTests(TestCase):
         url = reverse('admin:core_user_change', args=[self.user.id])
         res = self.client.get(url)
         self.assertEqual(res.status_code, 200)
+
+
+class ScalableAdminTests(TestCase):
+    """Tests for the store and grocery admin pages."""
+
+    def setUp(self):
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@example.com',
+            password='testpass123',
+            username='Test Admin'
+        )
+        self.client.force_login(self.admin_user)
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+            username='Test User'
+        )
+        self.stores = [
+            Store.objects.create(owner=self.user, name='Store %d' % i)
+            for i in range(3)
+        ]
+        for store, names in zip(self.stores, [['Milk', 'Eggs'], ['Milk'],
+                                              ['Bread']]):
+            for name in names:
+                Grocery.objects.create(
+                    owner=self.user, store_id=store.id, name=name)
+        self.changelist_url = reverse('admin:core_store_changelist')
+
+    def run_action(self, action, **data):
+        return self.client.post(self.changelist_url, {
+            'action': action,
+            '_selected_action': [store.id for store in self.stores[:2]],
+            **data
+        })
+
+    def test_changelists_render(self):
+        """Test the changelists load with owners joined in."""
+        for name in ('store', 'grocery', 'myprofile'):
+            res = self.client.get(reverse('admin:core_%s_changelist' % name))
+            self.assertEqual(res.status_code, 200)
+        res = self.client.get(self.changelist_url)
+        self.assertContains(res, 'Store 2')
+
+    def test_name_search_uses_full_text(self):
+        """Test store search matches name prefixes."""
+        res = self.client.get(self.changelist_url, {'q': 'stor'})
+        self.assertEqual(res.context['cl'].result_count, 3)
+        res = self.client.get(self.changelist_url, {'q': 'shop'})
+        self.assertEqual(res.context['cl'].result_count, 0)
+
+    def test_estimated_count(self):
+        """Test large results use the planner estimate."""
+        stores = Store.objects.order_by('id')
+        with patch.object(EstimatedCountPaginator, 'exact_below', 0):
+            paginator = EstimatedCountPaginator(stores, 10)
+            self.assertIsInstance(paginator.count, int)
+        paginator = EstimatedCountPaginator(stores, 10)
+        self.assertEqual(paginator.count, 3)
+
+    def test_mark_completed_action(self):
+        """Test marking stores completed in one update."""
+        self.run_action('mark_completed')
+
+        completed = Store.objects.filter(is_completed=True)
+        self.assertEqual(completed.count(), 2)
+        self.assertFalse(completed.filter(completed_at__isnull=True).exists())
+        self.assertFalse(Grocery.objects.filter(
+            store_id=self.stores[0].id, is_completed=False).exists())
+        self.assertFalse(Grocery.objects.get(
+            store_id=self.stores[2].id).is_completed)
+
+    def test_mark_groceries_completed_completes_store(self):
+        """Test completing a store's last groceries completes it."""
+        self.client.post(reverse('admin:core_grocery_changelist'), {
+            'action': 'mark_completed',
+            '_selected_action': list(Grocery.objects.filter(
+                store_id=self.stores[0].id).values_list('id', flat=True)),
+        })
+
+        self.stores[0].refresh_from_db()
+        self.assertTrue(self.stores[0].is_completed)
+        self.assertIsNotNone(self.stores[0].completed_at)
+
+    def test_delete_last_open_grocery_completes_store(self):
+        """Test deleting a store's last open grocery completes it."""
+        groceries = Grocery.objects.filter(store_id=self.stores[0].id)
+        groceries.filter(name='Milk').update(is_completed=True)
+        self.client.post(reverse('admin:core_grocery_changelist'), {
+            'action': 'soft_delete',
+            '_selected_action': list(groceries.filter(
+                name='Eggs').values_list('id', flat=True)),
+        })
+
+        self.stores[0].refresh_from_db()
+        self.assertTrue(self.stores[0].is_completed)
+        self.assertEqual(groceries.count(), 1)
+
+    def test_reassign_owner_action(self):
+        """Test reassigning stores to another owner."""
+        call_command('rollup_analytics', lag=0, stdout=StringIO())
+        self.run_action('reassign_owner', owner_id=self.admin_user.id)
+        call_command('rollup_analytics', lag=0, stdout=StringIO())
+
+        self.assertEqual(
+            Store.objects.filter(owner=self.admin_user).count(), 2)
+        self.assertEqual(
+            Grocery.objects.filter(owner=self.admin_user).count(), 3)
+        self.assertEqual(
+            ItemStats.objects.get(owner=self.admin_user, key='milk').added, 2)
+        self.assertFalse(
+            ItemStats.objects.filter(owner=self.user, key='milk').exists())
+        self.assertEqual(
+            ItemStats.objects.get(owner=self.user, key='bread').added, 1)
+
+    def test_delete_action_is_soft(self):
+        """Test the delete action tombstones instead of cascading."""
+        res = self.client.get(self.changelist_url)
+        actions = dict(res.context['action_form'].fields['action'].choices)
+        self.assertNotIn('delete_selected', actions)
+
+        self.run_action('soft_delete')
+
+        self.assertEqual(Store.objects.count(), 1)
+        self.assertEqual(Store.all_objects.count(), 3)
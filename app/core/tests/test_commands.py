@@ -1,13 +1,26 @@
 """
 Test custom Django management commands.
 """
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch
+from zipfile import ZipFile
 
 from psycopg2 import OperationalError as Psycopg2OpError
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.models import Grocery, ItemStats, Store, WeeklyStats
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -32,3 +45,139 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class PurgeDeletedCommandTests(TestCase):
+    """Test purging soft deleted rows."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+            username='user',
+        )
+
+    def create_store(self, groceries):
+        store = Store.objects.create(owner=self.user, name='Target')
+        for i in range(groceries):
+            store.groceries.create(
+                owner=self.user, name='Item %d' % i, store_id=store.id)
+        return store
+
+    def test_purge_deleted(self):
+        """Test tombstoned stores and groceries are removed in batches."""
+        kept = self.create_store(groceries=2)
+        kept.groceries.first().soft_delete()
+        self.create_store(groceries=5).soft_delete()
+
+        out = StringIO()
+        call_command('purge_deleted', batch_size=2, grace=0, stdout=out)
+
+        self.assertIn('Purged 1 stores and 6 groceries', out.getvalue())
+        self.assertEqual(list(Store.all_objects.all()), [kept])
+        self.assertEqual(Grocery.all_objects.count(), 1)
+        self.assertEqual(Store.groceries.through.objects.count(), 1)
+
+    def test_purge_subtracts_from_rollups(self):
+        """Test a grocery counted in the rollups, then deleted and purged
+        before the next rollup, leaves them."""
+        store = self.create_store(groceries=0)
+        milk = store.groceries.create(
+            owner=self.user, name='Milk', store_id=store.id)
+        call_command('rollup_analytics', lag=0, stdout=StringIO())
+        milk.soft_delete()
+
+        call_command('purge_deleted', grace=0, stdout=StringIO())
+        call_command('rollup_analytics', lag=0, stdout=StringIO())
+
+        self.assertFalse(ItemStats.objects.filter(owner=self.user).exists())
+        self.assertFalse(WeeklyStats.objects.filter(owner=self.user).exists())
+
+    def test_purge_respects_grace(self):
+        """Test recently deleted rows are kept during the grace period."""
+        self.create_store(groceries=1).soft_delete()
+
+        out = StringIO()
+        call_command('purge_deleted', stdout=out)
+
+        self.assertIn('Purged 0 stores and 0 groceries', out.getvalue())
+        self.assertEqual(Store.all_objects.count(), 1)
+        self.assertEqual(Grocery.all_objects.count(), 1)
+
+
+class PurgeUnverifiedCommandTests(TestCase):
+    """Test purging stale unverified accounts."""
+
+    def create_user(self, name, days_ago, is_verified=False):
+        user = get_user_model().objects.create_user(
+            email='%s@example.com' % name,
+            password='testpass123',
+            username=name,
+        )
+        get_user_model().objects.filter(id=user.id).update(
+            is_verified=is_verified,
+            created_at=timezone.now() - timedelta(days=days_ago),
+        )
+        return user
+
+    def test_purge_unverified(self):
+        """Test only stale unverified accounts without lists go."""
+        stale = [self.create_user('stale%d' % i, 30) for i in range(3)]
+        self.create_user('recent', 1)
+        self.create_user('verified', 30, is_verified=True)
+        owner = self.create_user('owner', 30)
+        store = Store.objects.create(owner=owner, name='Target')
+        store.shares.add(stale[0])
+
+        out = StringIO()
+        call_command('purge_unverified', days=7, batch_size=2, stdout=out)
+
+        self.assertIn('Purged 3 unverified users', out.getvalue())
+        self.assertEqual(
+            set(get_user_model().objects.values_list(
+                'username', flat=True)),
+            {'recent', 'verified', 'owner'}
+        )
+        self.assertFalse(store.shares.exists())
+
+    def test_purge_batch_locked(self):
+        """Test a batch is locked and checked again before its DELETE, so
+        a user verifying meanwhile waits instead of being deleted"""
+        self.create_user('stale', 30)
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('purge_unverified', days=7, stdout=StringIO())
+
+        sql = [query['sql'] for query in ctx.captured_queries]
+        locked = next(i for i, query in enumerate(sql)
+                      if 'FOR UPDATE' in query)
+        self.assertIn('NOT "core_user"."is_verified"', sql[locked])
+        self.assertTrue(any(query.startswith('DELETE FROM "core_user"')
+                            for query in sql[locked:]))
+
+
+class ExportUserDataCommandTests(TestCase):
+    """Test exporting a user's data to a file."""
+
+    databases = '__all__'
+
+    def test_export_user_data(self):
+        """Test the archive is written to the output path."""
+        user = get_user_model().objects.create_user(
+            email='export@example.com', username='export', password='pass')
+        Store.objects.create(owner=user, name='Target')
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.zip')
+            out = StringIO()
+            call_command('export_user_data', user.email, output=path,
+                         stdout=out)
+
+            self.assertIn('Exported 1 rows to %s' % path, out.getvalue())
+            with ZipFile(path) as archive:
+                stores = archive.read('stores.jsonl').splitlines()
+        self.assertEqual(json.loads(stores[0])['name'], 'Target')
+
+    def test_unknown_user(self):
+        """Test an unknown email is an error."""
+        with self.assertRaises(CommandError):
+            call_command('export_user_data', 'nobody@example.com')
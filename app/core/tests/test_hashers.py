@@ -0,0 +1,91 @@
+"""
+Tests for password hashing.
+"""
+import threading
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase, override_settings
+
+from core import hashers
+
+
+class HasherTests(TestCase):
+    """Test the hashing strategy and pool."""
+
+    def create_user(self):
+        return get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+            username='test1123',
+        )
+
+    def test_new_passwords_use_tuned_argon2(self):
+        """Test new passwords use the tuned Argon2 parameters."""
+        user = self.create_user()
+        hasher = hashers.TunedArgon2PasswordHasher()
+        self.assertTrue(user.password.startswith('argon2$argon2id$'))
+        self.assertIn(
+            'm=%d,t=%d,p=%d' % (
+                hasher.memory_cost, hasher.time_cost, hasher.parallelism),
+            user.password
+        )
+
+    def test_costs_follow_settings(self):
+        """Test changed costs apply without a restart and upgrade the
+        hashes made with the old ones."""
+        user = self.create_user()
+        with self.settings(PASSWORD_HASHING={
+                'ARGON2_TIME_COST': 3, 'PBKDF2_ITERATIONS': 1000}):
+            self.assertEqual(
+                hashers.TunedPBKDF2PasswordHasher().iterations, 1000)
+            self.assertIsNotNone(authenticate(
+                username='test@example.com', password='testpass123'))
+            user.refresh_from_db()
+            self.assertIn(',t=3,', user.password)
+
+    def test_login_upgrades_old_hash(self):
+        """Test a successful login rehashes a legacy hash."""
+        user = self.create_user()
+        legacy = make_password('testpass123', hasher='pbkdf2_sha1')
+        get_user_model().objects.filter(id=user.id).update(password=legacy)
+
+        self.assertIsNone(authenticate(
+            username='test@example.com', password='wrongpass'))
+        user.refresh_from_db()
+        self.assertEqual(user.password, legacy)
+
+        self.assertIsNotNone(authenticate(
+            username='test@example.com', password='testpass123'))
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('argon2$'))
+        self.assertTrue(user.check_password('testpass123'))
+
+    @override_settings(PASSWORD_HASHING={'POOL_SIZE': 2})
+    @patch.object(hashers, '_pool', None)
+    def test_hashes_run_in_pool(self):
+        """Test hashes run on pool threads when a pool is configured."""
+        threads = []
+        verify = hashers.verify
+
+        def record_thread(*args):
+            threads.append(threading.current_thread().name)
+            return verify(*args)
+
+        with patch.object(hashers, 'verify', side_effect=record_thread):
+            self.create_user()
+            self.assertIsNotNone(authenticate(
+                username='test@example.com', password='testpass123'))
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('password-hash'))
+
+    def test_async_helpers(self):
+        """Test the awaitable helpers hash and verify."""
+        encoded = async_to_sync(hashers.amake_password)('testpass123')
+        is_correct, must_update = async_to_sync(hashers.acheck_password)(
+            'testpass123', encoded)
+        self.assertTrue(is_correct)
+        self.assertFalse(must_update)
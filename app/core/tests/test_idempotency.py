@@ -0,0 +1,140 @@
+"""
+Tests for Idempotency-Key handling on POST requests.
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from core import idempotency
+from core.models import Store
+
+
+class IdempotencyTests(TestCase):
+    """Test retried POSTs replay the first response."""
+
+    def setUp(self):
+        cache.clear()
+        self.stores_url = reverse('groceries_list:stores')
+        self.user = self.create_user('user@example.com')
+        self.client = self.client_for(self.user)
+
+    def create_user(self, email):
+        return get_user_model().objects.create_user(
+            email=email,
+            password='testpass123',
+            username=email.split('@')[0],
+        )
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + user.tokens()['access'])
+        return client
+
+    def post_store(self, client, name='Target', key='key-1'):
+        return client.post(
+            self.stores_url,
+            {'name': name},
+            format='json',
+            HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_replays_response(self):
+        """Test a retry returns the stored response without a new store"""
+        first = self.post_store(self.client)
+        retry = self.post_store(self.client)
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry[idempotency.REPLAYED_HEADER], 'true')
+        self.assertEqual(Store.objects.count(), 1)
+
+    def test_new_key_executes(self):
+        """Test other keys and requests without a key are not replayed"""
+        self.post_store(self.client)
+        self.post_store(self.client, key='key-2')
+        self.client.post(self.stores_url, {'name': 'Target'}, format='json')
+
+        self.assertEqual(Store.objects.count(), 3)
+
+    def test_keys_scoped_to_user(self):
+        """Test two users can use the same key"""
+        other = self.client_for(self.create_user('other@example.com'))
+        self.post_store(self.client)
+        res = self.post_store(other)
+
+        self.assertNotIn(idempotency.REPLAYED_HEADER, res)
+        self.assertEqual(Store.objects.count(), 2)
+
+    def test_reused_key_with_other_body(self):
+        """Test a key reused for another request body is rejected"""
+        self.post_store(self.client)
+        res = self.post_store(self.client, name='Costco')
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Store.objects.count(), 1)
+
+    def test_concurrent_duplicate_rejected(self):
+        """Test a duplicate of an in-flight request gets 409"""
+        request = self.client.post(
+            self.stores_url, format='json').wsgi_request
+        lock_key = idempotency.cache_key(
+            self.user.id, request, 'key-1') + ':lock'
+        cache.add(lock_key, True)
+
+        res = self.post_store(self.client)
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res['Retry-After'], '1')
+        self.assertEqual(Store.objects.count(), 0)
+
+    def test_anonymous_requests_not_stored(self):
+        """Test unauthenticated POSTs are never replayed"""
+        self.post_store(APIClient())
+        res = self.post_store(APIClient())
+
+        self.assertNotIn(idempotency.REPLAYED_HEADER, res)
+
+    def test_transient_failures_not_stored(self):
+        """Test a retry after a throttled or conflicting POST runs again"""
+        for code in (404, 409, 412, 429):
+            with patch('groceries_list.views.StoreListAPIView.create',
+                       return_value=Response(status=code)):
+                res = self.post_store(self.client, key='key-%d' % code)
+            self.assertEqual(res.status_code, code)
+
+            res = self.post_store(self.client, key='key-%d' % code)
+
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            self.assertNotIn(idempotency.REPLAYED_HEADER, res)
+
+    def test_validation_errors_stored(self):
+        """Test a rejected body is replayed to its retries"""
+        self.client.post(self.stores_url, {}, format='json',
+                         HTTP_IDEMPOTENCY_KEY='key-1')
+        res = self.client.post(self.stores_url, {}, format='json',
+                               HTTP_IDEMPOTENCY_KEY='key-1')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res[idempotency.REPLAYED_HEADER], 'true')
+
+    def test_replay_has_cors_headers(self):
+        """Test replayed responses reach browsers with CORS headers"""
+        origin = 'http://localhost:8080'
+        self.client.post(self.stores_url, {'name': 'Target'}, format='json',
+                         HTTP_IDEMPOTENCY_KEY='key-1', HTTP_ORIGIN=origin)
+        res = self.client.post(self.stores_url, {'name': 'Target'},
+                               format='json', HTTP_IDEMPOTENCY_KEY='key-1',
+                               HTTP_ORIGIN=origin)
+
+        self.assertEqual(res[idempotency.REPLAYED_HEADER], 'true')
+        self.assertEqual(res['Access-Control-Allow-Origin'], origin)
@@ -0,0 +1,45 @@
+"""
+Tests for fractional ordering keys.
+"""
+import random
+
+from django.test import SimpleTestCase
+
+from core.positions import key_between, keys_after, spread_keys
+
+
+class PositionKeyTests(SimpleTestCase):
+
+    def test_key_between_random_inserts(self):
+        """Test keys always fit between their neighbours"""
+        rng = random.Random(0)
+        keys = []
+        for _ in range(2000):
+            i = rng.randint(0, len(keys))
+            before = keys[i - 1] if i else None
+            after = keys[i] if i < len(keys) else None
+            key = key_between(before, after)
+            self.assertTrue(before is None or before < key)
+            self.assertTrue(after is None or key < after)
+            self.assertFalse(key.endswith('0'))
+            keys.insert(i, key)
+
+    def test_no_key_between(self):
+        """Test equal or reversed bounds are refused"""
+        with self.assertRaises(ValueError):
+            key_between('V', 'V')
+        with self.assertRaises(ValueError):
+            key_between(None, '')
+
+    def test_appends_stay_short(self):
+        """Test appending grows keys slowly"""
+        keys = keys_after(None, 300)
+        self.assertEqual(keys, sorted(keys))
+        self.assertLessEqual(max(len(key) for key in keys), 11)
+
+    def test_spread_keys(self):
+        """Test rebalanced keys are sorted, unique and short"""
+        keys = spread_keys(10000)
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(set(keys)), 10000)
+        self.assertLessEqual(max(len(key) for key in keys), 4)
@@ -0,0 +1,104 @@
+"""
+Tests for the MessagePack renderer and parser.
+"""
+from io import StringIO
+
+import msgpack
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Store
+from core.renderers import MEDIA_TYPE
+
+
+class MessagePackTests(TestCase):
+    """Test clients can negotiate MessagePack."""
+    databases = {'default', 'shard_1'}
+
+    def setUp(self):
+        self.stores_url = reverse('groceries_list:stores')
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+            username='user',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        store = Store.objects.create(owner=self.user, name='Target')
+        store.groceries.create(
+            owner=self.user, name='Milk', store_id=store.id)
+
+    def test_render_same_structure_as_json(self):
+        """Test Accept selects MessagePack with the JSON structure"""
+        json_res = self.client.get(self.stores_url)
+        res = self.client.get(self.stores_url, HTTP_ACCEPT=MEDIA_TYPE)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], MEDIA_TYPE)
+        self.assertEqual(msgpack.unpackb(res.content), json_res.json())
+        self.assertLess(len(res.content), len(json_res.content))
+
+    def test_json_stays_default(self):
+        """Test clients without Accept still get JSON"""
+        res = self.client.get(self.stores_url)
+        self.assertEqual(res['Content-Type'], 'application/json')
+
+    def test_parse_request_body(self):
+        """Test MessagePack request bodies create stores"""
+        res = self.client.post(
+            self.stores_url,
+            msgpack.packb({'name': 'Costco', 'groceries': [
+                {'name': 'Eggs', 'qty': 2, 'store_id': 0}
+            ]}),
+            content_type=MEDIA_TYPE,
+            HTTP_ACCEPT=MEDIA_TYPE
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        data = msgpack.unpackb(res.content)
+        self.assertEqual(data['name'], 'Costco')
+        self.assertEqual(data['groceries'][0]['qty'], 2)
+
+    def test_invalid_body_rejected(self):
+        """Test malformed MessagePack gets 400"""
+        res = self.client.post(
+            self.stores_url, b'\xc1', content_type=MEDIA_TYPE)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_benchmark_command(self):
+        """Test the benchmark reports both formats and leaves no data"""
+        out = StringIO()
+        call_command('benchmark_renderers', stores=2, groceries=2,
+                     repeat=1, stdout=out)
+
+        self.assertIn('json', out.getvalue())
+        self.assertIn('msgpack', out.getvalue())
+        self.assertEqual(Store.objects.count(), 1)
+
+    @override_settings(DATABASE_SHARDS=['default', 'shard_1'])
+    def test_benchmark_command_sharded(self):
+        """Test the benchmark seeds its users' shards and rolls them back"""
+        with CaptureQueriesContext(connections['shard_1']) as shard_1:
+            # Consecutive users, one of them lives on shard_1
+            for _ in range(2):
+                out = StringIO()
+                call_command('benchmark_renderers', stores=2, groceries=2,
+                             repeat=1, stdout=out)
+
+                json_bytes = int(out.getvalue().splitlines()[1].split()[1])
+                self.assertGreater(json_bytes, 100)
+
+        self.assertTrue(any(
+            query['sql'].startswith('INSERT INTO "core_store"')
+            for query in shard_1.captured_queries))
+        for alias in ('default', 'shard_1'):
+            self.assertFalse(Store.objects.using(alias).exclude(
+                owner=self.user).exists())
@@ -0,0 +1,76 @@
+"""
+Tests for read replica routing.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Store
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Test safe reads go to replicas and writers are pinned."""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+            username='test1123',
+        )
+        self.store = Store.objects.create(owner=self.user, name='Target')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.stores_url = reverse('groceries_list:stores')
+        self.store_url = reverse('groceries_list:store', args=[self.store.id])
+
+    def get(self, url):
+        """GET url, return (response, primary queries, replica queries)"""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica_1']) as replica:
+            res = self.client.get(url)
+        return res, primary.captured_queries, replica.captured_queries
+
+    def test_safe_reads_use_replica(self):
+        """Test list and detail reads are served by the replica."""
+        for url in [self.stores_url, self.store_url]:
+            res, primary, replica = self.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(primary, [])
+            self.assertTrue(replica)
+
+    def test_writer_pinned_to_primary(self):
+        """Test a GET right after a PATCH reads from the primary."""
+        res = self.client.patch(
+            self.store_url, {'name': 'Costco'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+
+        res, primary, replica = self.get(self.store_url)
+        self.assertEqual(res.data['name'], 'Costco')
+        self.assertTrue(primary)
+        self.assertEqual(replica, [])
+
+    def test_failed_write_does_not_pin(self):
+        """Test rejected writes keep the user on replicas."""
+        self.client.patch(
+            reverse('groceries_list:store', args=[self.store.id + 1]),
+            {'name': 'Costco'},
+            format='json'
+        )
+        _, primary, replica = self.get(self.store_url)
+        self.assertEqual(primary, [])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_configured(self):
+        """Test everything reads from the primary without replicas."""
+        _, primary, replica = self.get(self.stores_url)
+        self.assertTrue(primary)
+        self.assertEqual(replica, [])
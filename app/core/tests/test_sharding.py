@@ -0,0 +1,194 @@
+"""
+Tests for owner based sharding.
+"""
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import replicas, sharding
+from core.models import ArchivedStore, Grocery, ShardAssignment, Store
+
+
+@override_settings(DATABASE_SHARDS=['default', 'shard_1'])
+class ShardingTests(TestCase):
+    """Test stores and groceries follow their owner's shard."""
+    databases = {'default', 'shard_1'}
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.stores_url = reverse('groceries_list:stores')
+
+    def create_user(self, email, shard):
+        user = get_user_model().objects.create_user(
+            email=email,
+            password='testpass123',
+            username=email.split('@')[0],
+        )
+        ShardAssignment.objects.update_or_create(
+            user=user, defaults={'shard': shard})
+        return user
+
+    def test_new_users_spread_over_shards(self):
+        """Test create_user records a shard for new users."""
+        users = [
+            get_user_model().objects.create_user(
+                email='user%d@example.com' % i,
+                password='testpass123',
+                username='user%d' % i,
+            )
+            for i in range(2)
+        ]
+        self.assertEqual(
+            {sharding.shard_for_user(user.id) for user in users},
+            {'default', 'shard_1'}
+        )
+
+    def test_api_uses_owner_shard(self):
+        """Test stores created through the API live on the shard."""
+        user = self.create_user('sharded@example.com', 'shard_1')
+        self.client.force_authenticate(user=user)
+        res = self.client.post(
+            self.stores_url,
+            {'name': 'Target', 'groceries': [
+                {'name': 'Milk', 'qty': 1, 'store_id': 0}
+            ]},
+            format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        store_id = res.data['id']
+        self.assertGreaterEqual(store_id, sharding.id_offset('shard_1'))
+        self.assertFalse(Store.objects.using('default').exists())
+        store = Store.objects.using('shard_1').get(id=store_id)
+        self.assertEqual(store.groceries.get().name, 'Milk')
+
+        res = self.client.get(self.stores_url)
+        self.assertEqual([s['id'] for s in res.data], [store_id])
+        grocery_id = res.data[0]['groceries'][0]['id']
+        res = self.client.patch(
+            reverse('groceries_list:grocery', args=[grocery_id]),
+            {'is_completed': True},
+            format='json'
+        )
+        self.assertTrue(res.data['is_store_completed'])
+
+    def test_shared_store_found_across_shards(self):
+        """Test sharees on another shard can search shared stores."""
+        owner = self.create_user('owner@example.com', 'shard_1')
+        sharee = self.create_user('sharee@example.com', 'default')
+        with sharding.use_shard('shard_1'):
+            store = Store.objects.create(owner=owner, name='Costco')
+            store.groceries.create(owner=owner, name='Milk',
+                                   store_id=store.id)
+            store.shares.add(sharee)
+
+        self.client.force_authenticate(user=sharee)
+        res = self.client.get(
+            reverse('groceries_list:search'), {'q': 'milk'})
+        self.assertEqual([g['name'] for g in res.data['groceries']],
+                         ['Milk'])
+
+    def test_sharee_adds_grocery_on_owner_shard(self):
+        """Test a sharee on another shard adds groceries to a shared
+        store, and other users cannot."""
+        owner = self.create_user('owner@example.com', 'shard_1')
+        sharee = self.create_user('sharee@example.com', 'default')
+        stranger = self.create_user('stranger@example.com', 'shard_1')
+        with sharding.use_shard('shard_1'):
+            store = Store.objects.create(owner=owner, name='Costco')
+            store.shares.add(sharee)
+        url = reverse('groceries_list:add_grocery')
+
+        self.client.force_authenticate(user=sharee)
+        res = self.client.post(
+            url, {'name': 'Milk', 'store_id': store.id}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        grocery = Grocery.objects.using('shard_1').get(id=res.data['id'])
+        self.assertEqual(grocery.owner_id, sharee.id)
+        self.assertEqual(list(store.groceries.all()), [grocery])
+
+        self.client.force_authenticate(user=stranger)
+        res = self.client.post(
+            url, {'name': 'Eggs', 'store_id': store.id}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rebalance_moves_user(self):
+        """Test the rebalance command moves rows and keeps ids."""
+        user = self.create_user('mover@example.com', 'default')
+        store = Store.objects.create(owner=user, name='Target')
+        grocery = store.groceries.create(owner=user, name='Milk',
+                                         store_id=store.id)
+        store.shares.add(self.create_user('friend@example.com', 'default'))
+        ArchivedStore.objects.create(
+            id=store.id + 1, owner=user, name='Old list')
+
+        out = StringIO()
+        call_command('rebalance_shards', user=user.id, to='shard_1',
+                     stdout=out)
+
+        self.assertIn('moved 1 stores', out.getvalue())
+        self.assertEqual(sharding.shard_for_user(user.id), 'shard_1')
+        self.assertEqual(
+            ArchivedStore.objects.using('shard_1').get().owner_id, user.id)
+        self.assertFalse(ArchivedStore.objects.using('default').exists())
+        self.assertFalse(Store.objects.using('default').exists())
+        self.assertFalse(Grocery.objects.using('default').exists())
+        moved = Store.objects.using('shard_1').get(id=store.id)
+        self.assertEqual(list(moved.groceries.all()), [grocery])
+        self.assertEqual(
+            Store.shares.through.objects.using('shard_1').filter(
+                store_id=store.id).count(),
+            1
+        )
+
+        self.client.force_authenticate(user=user)
+        res = self.client.get(
+            reverse('groceries_list:store', args=[store.id]))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_assignment_not_cached(self):
+        """Test a move made by another process is seen at once."""
+        user = self.create_user('mover@example.com', 'default')
+        self.assertEqual(sharding.shard_for_user(user.id), 'default')
+
+        ShardAssignment.objects.filter(user=user).update(shard='shard_1')
+
+        self.assertEqual(sharding.shard_for_user(user.id), 'shard_1')
+
+    def test_writes_refused_while_moving(self):
+        """Test writes get 503 while the user is being moved."""
+        user = self.create_user('mover@example.com', 'default')
+        ShardAssignment.objects.filter(user=user).update(moving=True)
+        self.client.force_authenticate(user=user)
+        res = self.client.post(self.stores_url, {'name': 'Target'})
+        self.assertEqual(res.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_shard_unset_when_view_raises(self):
+        """Test a view failing unhandled does not leave its shard or
+        replica choice to the next request of the thread."""
+        user = self.create_user('crash@example.com', 'shard_1')
+        self.client.force_authenticate(user=user)
+        with patch('groceries_list.views.StoreListAPIView.get_queryset',
+                   side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            self.client.get(self.stores_url)
+
+        self.assertIsNone(sharding._current_shard.get())
+        self.assertFalse(replicas._use_replica.get())
+
+    def test_plan_moves(self):
+        """Test moves narrow the gap between shards."""
+        loads = {'default': {1: 10, 2: 4, 3: 1}, 'shard_1': {4: 1}}
+        self.assertEqual(
+            sharding.plan_moves(loads, 10),
+            [(2, 'default', 'shard_1'), (3, 'default', 'shard_1')]
+        )
@@ -0,0 +1,162 @@
+"""
+Tests for the database backed task queue.
+"""
+from datetime import timedelta
+from io import StringIO
+from threading import Event
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import taskqueue
+from core.models import PeriodicTask, Task
+
+calls = []
+
+
+@taskqueue.task(name='tests.record')
+def record(value):
+    calls.append(value)
+
+
+@taskqueue.task(name='tests.tick')
+def tick():
+    calls.append('tick')
+
+
+@taskqueue.task(name='tests.fail', max_attempts=2)
+def fail():
+    raise RuntimeError('boom')
+
+
+@taskqueue.task(name='tests.hooked', max_attempts=1,
+                on_failure=lambda value: calls.append(('failed', value)))
+def hooked(value):
+    raise RuntimeError('boom')
+
+
+def run_tasks():
+    return taskqueue.work(Event(), burst=True)
+
+
+class TaskQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_run_task(self):
+        """Test a queued call runs once and is removed"""
+        record.delay('milk')
+        self.assertEqual(run_tasks(), 1)
+        self.assertEqual(calls, ['milk'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_delayed_task(self):
+        """Test a task does not run before run_at"""
+        taskqueue.enqueue(
+            'tests.record', ['later'],
+            run_at=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(run_tasks(), 0)
+        self.assertEqual(calls, [])
+
+    def test_unknown_task(self):
+        """Test only registered tasks can be queued"""
+        with self.assertRaises(KeyError):
+            taskqueue.enqueue('tests.missing')
+
+    def test_retry_then_fail(self):
+        """Test a failing task is retried later, then kept as failed"""
+        fail.delay()
+        with self.assertLogs('core.taskqueue', 'WARNING') as logs:
+            run_tasks()
+        self.assertIn('tests.fail failed', logs.output[0])
+        self.assertIn('RuntimeError: boom', logs.output[0])
+        task = Task.objects.get()
+        self.assertEqual(task.status, Task.QUEUED)
+        self.assertEqual(task.attempts, 1)
+        self.assertGreater(task.run_at, timezone.now())
+        self.assertIn('boom', task.last_error)
+
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.taskqueue', 'WARNING') as logs:
+            run_tasks()
+        self.assertIn('RuntimeError: boom', logs.output[0])
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertEqual(task.attempts, 2)
+
+    def test_expired_lease(self):
+        """Test a task whose worker stalled is handed to another worker,
+        and the stalled worker cannot record an outcome"""
+        record.delay('eggs')
+        stalled = taskqueue.claim(timezone.now())
+        self.assertIsNone(taskqueue.claim(timezone.now()))
+
+        later = timezone.now() + timedelta(
+            seconds=taskqueue.get_setting('VISIBILITY_TIMEOUT') + 1)
+        claimed = taskqueue.claim(later)
+        self.assertEqual(claimed.id, stalled.id)
+        self.assertEqual(claimed.attempts, 2)
+
+        taskqueue.execute(stalled)
+        self.assertTrue(Task.objects.filter(id=claimed.id).exists())
+        taskqueue.execute(claimed)
+        self.assertFalse(Task.objects.exists())
+
+    def test_abandoned_last_attempt_fails(self):
+        """Test a task whose worker dies on every attempt ends failed"""
+        fail.delay()
+        timeout = taskqueue.get_setting('VISIBILITY_TIMEOUT') + 1
+        now = timezone.now()
+        for attempt in range(2):
+            now += timedelta(seconds=timeout)
+            self.assertIsNotNone(taskqueue.claim(now))
+
+        now += timedelta(seconds=timeout)
+        with self.assertLogs('core.taskqueue', 'WARNING') as logs:
+            self.assertIsNone(taskqueue.claim(now))
+        self.assertIn('tests.fail abandoned after 2 attempts',
+                      logs.output[0])
+        task = Task.objects.get()
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertEqual(task.attempts, 2)
+        self.assertIn('lease', task.last_error)
+
+    def test_on_failure_hook(self):
+        """Test on_failure runs once a task is failed, however it failed"""
+        hooked.delay('raised')
+        with self.assertLogs('core.taskqueue', 'WARNING') as logs:
+            run_tasks()
+        self.assertIn('tests.hooked failed', logs.output[0])
+        hooked.delay('abandoned')
+        later = timezone.now() + timedelta(
+            seconds=taskqueue.get_setting('VISIBILITY_TIMEOUT') + 1)
+        taskqueue.claim(timezone.now())
+        with self.assertLogs('core.taskqueue', 'WARNING') as logs:
+            taskqueue.claim(later)
+        self.assertIn('tests.hooked abandoned after 1 attempts',
+                      logs.output[0])
+
+        self.assertEqual(
+            calls, [('failed', 'raised'), ('failed', 'abandoned')])
+
+    @override_settings(TASKS={'PERIODIC': {'tests.tick': 60}})
+    def test_periodic_task(self):
+        """Test periodic tasks are queued when due"""
+        PeriodicTask.objects.create(
+            name='tests.gone', interval=60, next_run_at=timezone.now())
+        call_command('run_worker', burst=True, stdout=StringIO())
+        call_command('run_worker', burst=True, stdout=StringIO())
+
+        self.assertEqual(calls, ['tick'])
+        schedule = PeriodicTask.objects.get()
+        self.assertEqual(schedule.name, 'tests.tick')
+        self.assertGreater(schedule.next_run_at, timezone.now())
+
+    @override_settings(TASKS={'PERIODIC': {'tests.missing': 60}})
+    def test_unknown_periodic_task(self):
+        """Test periodic tasks must be registered"""
+        with self.assertRaises(ImproperlyConfigured):
+            call_command('run_worker', burst=True, stdout=StringIO())
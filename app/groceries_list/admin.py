@@ -0,0 +1,155 @@
+"""
+Admin pages of stores and groceries.
+"""
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from core import models
+from core.admin import ScalableAdmin
+from core.sharding import shard_for_user, use_shard
+
+from .concurrency import completion_changes, refresh_store_completion
+from .search import rank_by_name, search_terms
+
+
+class NameSearchAdmin(ScalableAdmin):
+    """Search names with the full-text GIN index instead of icontains"""
+
+    def get_search_results(self, request, queryset, search_term):
+        terms = search_terms(search_term)
+        if not terms:
+            return queryset, False
+        if search_term.strip().isdigit():
+            return queryset.filter(id=int(search_term)), False
+        return rank_by_name(queryset, terms), False
+
+
+class OwnerActionForm(ActionForm):
+    owner_id = forms.IntegerField(
+        required=False,
+        label=_('New owner id'),
+    )
+
+
+class OwnedListAdmin(NameSearchAdmin):
+    """Set-based bulk actions for stores and groceries"""
+    action_form = OwnerActionForm
+    actions = ['mark_completed', 'reassign_owner', 'soft_delete']
+
+    def get_actions(self, request):
+        # delete_selected loads and cascades row by row
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    @admin.action(description=_('Mark selected as completed'))
+    def mark_completed(self, request, queryset):
+        """Complete the rows the way the API does: a store completes its
+        groceries, a grocery may complete its store"""
+        db = queryset.db
+        now = timezone.now()
+        changes = {
+            **completion_changes(True),
+            'version': F('version') + 1,
+            'updated_at': now,
+        }
+        with transaction.atomic(using=db), use_shard(db):
+            selected = queryset.filter(is_completed=False)
+            if self.model is models.Store:
+                models.Grocery.objects.using(db).filter(
+                    store_id__in=selected.values('id'),
+                    is_completed=False,
+                ).update(**changes)
+                count = selected.update(**changes)
+            else:
+                store_ids = set(selected.order_by().values_list(
+                    'store_id', flat=True).distinct())
+                count = selected.update(**changes)
+                for store_id in store_ids:
+                    refresh_store_completion(store_id)
+        self.message_user(request, _('%d marked completed.') % count)
+
+    @admin.action(description=_('Reassign selected to owner id'))
+    def reassign_owner(self, request, queryset):
+        """Give the rows to another owner, a store with its groceries.
+        The analytics follow on the next rollup, the rows are updated"""
+        owner = models.User.objects.filter(
+            id=request.POST.get('owner_id') or None).first()
+        if owner is None:
+            self.message_user(
+                request, _('Enter an existing owner id.'), messages.ERROR)
+            return
+        db = queryset.db
+        if shard_for_user(owner.id) != db:
+            self.message_user(
+                request,
+                _('The new owner lives on another shard, '
+                  'use rebalance_shards to move lists between shards.'),
+                messages.ERROR
+            )
+            return
+        now = timezone.now()
+        changes = {
+            'owner': owner,
+            'version': F('version') + 1,
+            'updated_at': now,
+        }
+        with transaction.atomic(using=db):
+            if self.model is models.Store:
+                models.Grocery.all_objects.using(db).filter(
+                    store_id__in=queryset.values('id')).update(**changes)
+            count = queryset.update(**changes)
+        self.message_user(request, _('%d reassigned.') % count)
+
+    @admin.action(description=_('Delete selected (purged later)'))
+    def soft_delete(self, request, queryset):
+        """Tombstone the rows, a grocery's store is completed again from
+        its remaining groceries like the API does"""
+        db = queryset.db
+        now = timezone.now()
+        with transaction.atomic(using=db), use_shard(db):
+            store_ids = set()
+            if self.model is models.Grocery:
+                store_ids = set(queryset.order_by().values_list(
+                    'store_id', flat=True).distinct())
+            count = queryset.update(
+                deleted_at=now,
+                version=F('version') + 1,
+                updated_at=now,
+            )
+            for store_id in store_ids:
+                refresh_store_completion(store_id)
+        self.message_user(request, _('%d deleted.') % count)
+
+
+class StoreAdmin(OwnedListAdmin):
+    list_display = ['id', 'name', 'owner', 'is_completed', 'updated_at']
+    list_select_related = ['owner']
+    list_filter = ['is_completed']
+    ordering = ['-id']
+    raw_id_fields = ['owner', 'groceries', 'shares']
+    readonly_fields = ['completed_at', 'updated_at', 'version']
+    exclude = ['deleted_at']
+
+
+class GroceryAdmin(OwnedListAdmin):
+    list_display = [
+        'id', 'name', 'owner', 'store_id', 'qty', 'is_completed',
+    ]
+    list_select_related = ['owner']
+    list_filter = ['is_completed']
+    ordering = ['-id']
+    raw_id_fields = ['owner']
+    readonly_fields = [
+        'position', 'created_at', 'completed_at', 'updated_at', 'version',
+    ]
+    exclude = ['deleted_at']
+
+
+admin.site.register(models.Store, StoreAdmin)
+admin.site.register(models.Grocery, GroceryAdmin)
@@ -0,0 +1,125 @@
+"""
+Optimistic concurrency for stores and groceries.
+
+Every Store and Grocery row carries a version bumped by each update.
+Clients send the version they last read, as an If-Match ETag or a
+`version` field, and updates are single conditional UPDATE statements
+that fail with 412 when the row changed in between. No row lock is held
+across the request.
+"""
+from django.db.models import Case, Exists, F, OuterRef, Value, When
+from django.db.models.functions import Coalesce
+from django.http import Http404
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from core.models import Grocery, Store
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The item was changed by someone else, reload it.'
+    default_code = 'precondition_failed'
+
+
+class PositionConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The list was reordered meanwhile, try again.'
+    default_code = 'position_conflict'
+
+
+def etag(version):
+    return '"%d"' % version
+
+
+def expected_version(request):
+    """Version the client last read, None when it did not send one"""
+    header = request.headers.get('If-Match', '').strip()
+    if header and header != '*':
+        value = header[2:] if header.startswith('W/') else header
+        value = value.strip('"')
+    else:
+        value = request.data.get('version')
+        if value is None:
+            return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({'version': ['A valid integer is required.']})
+
+
+def versioned_update(queryset, pk, expected, changes):
+    """Update only the changed columns of one row, bump its version and
+    updated_at, if it is still at the expected version"""
+    rows = queryset.filter(pk=pk)
+    if expected is not None:
+        rows = rows.filter(version=expected)
+    if changes:
+        updated = rows.update(
+            version=F('version') + 1,
+            updated_at=timezone.now(),
+            **changes
+        )
+    else:
+        updated = rows.exists()
+    if not updated:
+        if expected is not None and queryset.filter(pk=pk).exists():
+            raise PreconditionFailed()
+        raise Http404
+
+
+def validated_changes(serializer, data, names):
+    """Values of the fields names sent in data, validated and converted
+    by the serializer's fields, e.g. 'false' in a form to False"""
+    values, errors = {}, {}
+    for name in names:
+        if name not in data:
+            continue
+        try:
+            values[name] = serializer.fields[name].run_validation(data[name])
+        except ValidationError as exc:
+            errors[name] = exc.detail
+    if errors:
+        raise ValidationError(errors)
+    return values
+
+
+def completion_changes(is_completed):
+    """Columns to update when the completion of a store or grocery is
+    set, see CompletedAtMixin"""
+    if not is_completed:
+        return {'is_completed': False, 'completed_at': None}
+    return {
+        'is_completed': True,
+        'completed_at': Coalesce(F('completed_at'), Value(timezone.now())),
+    }
+
+
+def refresh_store_completion(store_id):
+    """Recompute a store's completion from its groceries in one UPDATE.
+    The version is only bumped when the completion changes.
+    Return whether the store is completed."""
+    groceries = Grocery.objects.filter(store_id=OuterRef('id'))
+    completed = Case(
+        When(
+            Exists(groceries),
+            then=~Exists(groceries.filter(is_completed=False)),
+        ),
+        default=Value(False),
+    )
+    Store.objects.filter(pk=store_id).exclude(
+        is_completed=completed
+    ).update(
+        is_completed=completed,
+        # Only flipped rows are updated, so it was open if now completed
+        completed_at=Case(
+            When(is_completed=False, then=Value(timezone.now())),
+            default=Value(None),
+        ),
+        version=F('version') + 1,
+        updated_at=timezone.now(),
+    )
+    return Store.objects.filter(pk=store_id).values_list(
+        'is_completed', flat=True).first()
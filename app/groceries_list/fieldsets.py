@@ -0,0 +1,76 @@
+"""
+Sparse fieldsets for the store endpoints.
+
+`?fields=id,name` limits the serialized fields and the selected columns,
+`?expand=groceries` embeds the groceries. Without `fields` every field
+is returned, groceries included, as before.
+"""
+from django.db.models import Prefetch
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+from core.models import Grocery
+
+EXPANDABLE = {'groceries'}
+
+# Columns always loaded: the permission check and the ETag use them
+REQUIRED_COLUMNS = ('id', 'owner', 'version')
+
+GROCERY_COLUMNS = (
+    'id', 'name', 'qty', 'store_id', 'is_completed', 'position', 'version',
+)
+
+
+def parse_list(request, param):
+    value = request.query_params.get(param)
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsMixin:
+    """Apply ?fields= and ?expand= to a store view's GET requests"""
+
+    def requested_fields(self):
+        """Serializer fields to return, None for all of them"""
+        if self.request.method not in SAFE_METHODS:
+            return None
+        if not hasattr(self, '_requested_fields'):
+            self._requested_fields = self.parse_fields()
+        return self._requested_fields
+
+    def parse_fields(self):
+        fields = parse_list(self.request, 'fields')
+        expand = parse_list(self.request, 'expand') or set()
+        available = set(self.serializer_class.Meta.fields)
+        invalid = (fields or set()) - available
+        if invalid:
+            raise ValidationError({'fields': [
+                'Unknown fields: %s' % ', '.join(sorted(invalid))
+            ]})
+        if expand - EXPANDABLE:
+            raise ValidationError(
+                {'expand': ['Only groceries can be expanded.']})
+        if fields is None:
+            return None
+        return fields | expand
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        fields = self.requested_fields()
+        if fields is not None:
+            columns = fields - EXPANDABLE
+            queryset = queryset.only(*REQUIRED_COLUMNS, *columns)
+        if fields is None or 'groceries' in fields:
+            queryset = queryset.prefetch_related(Prefetch(
+                'groceries',
+                queryset=Grocery.objects.only(*GROCERY_COLUMNS),
+            ))
+        return queryset
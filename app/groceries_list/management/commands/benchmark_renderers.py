@@ -0,0 +1,86 @@
+"""
+Django command to compare JSON and MessagePack store list payloads.
+"""
+import contextlib
+import io
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.crypto import get_random_string
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Grocery, Store
+from core.renderers import MessagePackParser, MessagePackRenderer
+from core.sharding import shard_aliases, shard_for_user, use_shard
+from groceries_list.serializers import StoresListSerializer
+
+
+class Command(BaseCommand):
+    """Django command to time renderers on seeded, rolled back stores."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stores', type=int, default=100)
+        parser.add_argument('--groceries', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        # The user is written to 'default', their stores to their shard
+        aliases = list(dict.fromkeys(['default'] + shard_aliases()))
+        with contextlib.ExitStack() as stack:
+            for alias in aliases:
+                stack.enter_context(transaction.atomic(using=alias))
+            data = self.seed(options['stores'], options['groceries'])
+            for alias in aliases:
+                transaction.set_rollback(True, using=alias)
+
+        self.stdout.write('%-8s %10s %10s %10s' % (
+            'format', 'bytes', 'encode ms', 'decode ms'))
+        for renderer, parser in (
+                (JSONRenderer(), JSONParser()),
+                (MessagePackRenderer(), MessagePackParser())):
+            body = renderer.render(data)
+            encode = self.time(lambda: renderer.render(data),
+                               options['repeat'])
+            decode = self.time(lambda: parser.parse(io.BytesIO(body)),
+                               options['repeat'])
+            self.stdout.write('%-8s %10d %10.2f %10.2f' % (
+                renderer.format, len(body), encode, decode))
+
+    def seed(self, stores, groceries):
+        """Create stores with groceries and return the serialized list"""
+        user = get_user_model().objects.create_user(
+            email='benchmark@example.com',
+            username='benchmark',
+            password=get_random_string(32),
+        )
+        with use_shard(shard_for_user(user.id)):
+            for i in range(stores):
+                store = Store.objects.create(owner=user, name='Store %d' % i)
+                items = Grocery.objects.bulk_create([
+                    Grocery(
+                        owner=user,
+                        name='Grocery item %d' % j,
+                        qty=j % 5 + 1,
+                        store_id=store.id,
+                        is_completed=j % 3 == 0,
+                    )
+                    for j in range(groceries)
+                ])
+                store.groceries.add(*items)
+            return StoresListSerializer(
+                Store.objects.filter(owner=user).prefetch_related(
+                    'groceries'),
+                many=True
+            ).data
+
+    def time(self, func, repeat):
+        """Average milliseconds per call"""
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) * 1000 / repeat
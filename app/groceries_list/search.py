@@ -0,0 +1,68 @@
+"""
+Search over the store and grocery names visible to a user
+"""
+import re
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+
+from core.models import (
+    Store,
+    Grocery
+)
+from core.sharding import shard_aliases
+
+SEARCH_CONFIG = 'simple'
+
+TERM_RE = re.compile(r'\w+')
+
+
+def search_terms(text):
+    """Split user input into plain search terms"""
+    return TERM_RE.findall(text.lower())
+
+
+def prefix_query(terms):
+    """Build a tsquery matching every term as a prefix (autocomplete)"""
+    raw = ' & '.join('%s:*' % term for term in terms)
+    return SearchQuery(raw, config=SEARCH_CONFIG, search_type='raw')
+
+
+def rank_by_name(queryset, terms):
+    """Filter and rank a queryset on its name field with the GIN
+    full-text index"""
+    vector = SearchVector('name', config=SEARCH_CONFIG)
+    query = prefix_query(terms)
+    return queryset.annotate(
+        search=vector,
+        rank=SearchRank(vector, query),
+    ).filter(search=query).order_by('-rank', '-id')
+
+
+def search(user, text, limit):
+    """Return (stores, groceries) matching the text for the user.
+    Stores shared with the user may live on any shard, so every shard
+    is searched and the ranked results merged."""
+    terms = search_terms(text)
+    if not terms:
+        return [], []
+
+    stores, groceries = [], []
+    for alias in shard_aliases():
+        visible = Store.objects.using(alias).visible_to(user)
+        stores += rank_by_name(visible, terms)[:limit]
+        groceries += rank_by_name(
+            Grocery.objects.using(alias).filter(
+                store_id__in=visible.values('id')),
+            terms
+        )[:limit]
+
+    def by_rank(obj):
+        return obj.rank, obj.id
+    return (
+        sorted(stores, key=by_rank, reverse=True)[:limit],
+        sorted(groceries, key=by_rank, reverse=True)[:limit],
+    )
@@ -4,10 +4,19 @@ Serializers for groceries APIs
 from rest_framework import serializers
 
 from core.models import (
+    ArchivedGrocery,
+    ArchivedStore,
+    ItemStats,
+    RecurringStore,
     Store,
-    Grocery
+    Grocery,
+    WeeklyStats
 )
 
+from core.positions import keys_after
+
+from .suggestions import record_groceries
+
 
 class GrocerySerializer(serializers.ModelSerializer):
     """Serializer for Grocery"""
@@ -15,28 +24,46 @@ class GrocerySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Grocery
-        fields = ['id', 'name', 'qty', 'store_id', 'is_completed']
-        read_only_fields = ['id']
+        fields = [
+            'id', 'name', 'qty', 'store_id', 'is_completed', 'position',
+            'version',
+        ]
+        read_only_fields = ['id', 'position', 'version']
+
+
+class MoveGrocerySerializer(serializers.Serializer):
+    """Serializer for moving a Grocery after another one."""
+    after = serializers.IntegerField(allow_null=True)
+
 
+class SparseFieldsSerializer(serializers.ModelSerializer):
+    """Serializer returning only the fields passed as `fields`"""
 
-class StoreDetailSerializer(serializers.ModelSerializer):
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class StoreDetailSerializer(SparseFieldsSerializer):
     """Serializer for Store."""
     groceries = GrocerySerializer(many=True, required=False)
 
     class Meta:
         model = Store
-        fields = ['id', 'name', 'groceries', 'is_completed']
-        read_only_fields = ['id']
+        fields = ['id', 'name', 'groceries', 'is_completed', 'version']
+        read_only_fields = ['id', 'version']
 
 
-class StoresListSerializer(serializers.ModelSerializer):
+class StoresListSerializer(SparseFieldsSerializer):
     """Serializer for Stores List."""
     groceries = GrocerySerializer(many=True, required=False)
 
     class Meta:
         model = Store
-        fields = ['id', 'name', 'groceries', 'is_completed']
-        read_only_fields = ['id']
+        fields = ['id', 'name', 'groceries', 'is_completed', 'version']
+        read_only_fields = ['id', 'version']
 
     def create(self, validated_data):
         user = self.context['request'].user
@@ -46,9 +73,101 @@ class StoresListSerializer(serializers.ModelSerializer):
             groceries_data = validated_data.pop('groceries')
 
         store = Store.objects.create(**validated_data)
-        for grocery_data in groceries_data:
+        groceries = []
+        positions = keys_after(None, len(groceries_data))
+        for grocery_data, position in zip(groceries_data, positions):
             grocery_data['store_id'] = store.id
-            grocery = Grocery.objects.create(owner=user, **grocery_data)
+            grocery = Grocery.objects.create(
+                owner=user, position=position, **grocery_data)
             store.groceries.add(grocery)
+            groceries.append(grocery)
+        record_groceries(user, groceries)
 
         return store
+
+
+class StoreSearchSerializer(serializers.ModelSerializer):
+    """Serializer for Store search results."""
+
+    class Meta:
+        model = Store
+        fields = ['id', 'name', 'is_completed']
+        read_only_fields = ['id', 'name', 'is_completed']
+
+
+class ArchivedGrocerySerializer(serializers.ModelSerializer):
+    """Serializer for a Grocery of an archived Store."""
+
+    class Meta:
+        model = ArchivedGrocery
+        fields = [
+            'id', 'name', 'qty', 'store_id', 'is_completed', 'position',
+        ]
+        read_only_fields = fields
+
+
+class ArchivedStoreSerializer(serializers.ModelSerializer):
+    """Serializer for archived Stores."""
+    groceries = ArchivedGrocerySerializer(many=True, read_only=True)
+
+    class Meta:
+        model = ArchivedStore
+        fields = [
+            'id', 'name', 'groceries', 'is_completed',
+            'completed_at', 'archived_at',
+        ]
+        read_only_fields = fields
+
+
+class StoreSummarySerializer(serializers.Serializer):
+    """Serializer for store summary rows with grocery counts."""
+    id = serializers.IntegerField(read_only=True)
+    name = serializers.CharField(read_only=True)
+    is_completed = serializers.BooleanField(read_only=True)
+    total = serializers.IntegerField(read_only=True)
+    completed = serializers.IntegerField(read_only=True)
+    updated_at = serializers.DateTimeField(
+        source='last_modified', read_only=True)
+
+
+class ShoppingListItemSerializer(serializers.Serializer):
+    """Serializer for groceries merged across stores by name."""
+    name = serializers.CharField(read_only=True)
+    qty = serializers.IntegerField(read_only=True)
+    items = serializers.IntegerField(read_only=True)
+    store_ids = serializers.ListField(
+        child=serializers.IntegerField(), read_only=True)
+
+
+class WeeklyStatsSerializer(serializers.ModelSerializer):
+    """Serializer for groceries added and completed in a week."""
+
+    class Meta:
+        model = WeeklyStats
+        fields = ['week', 'added', 'completed']
+        read_only_fields = fields
+
+
+class ItemStatsSerializer(serializers.ModelSerializer):
+    """Serializer for how often a grocery name was added and completed."""
+
+    class Meta:
+        model = ItemStats
+        fields = ['name', 'added', 'completed', 'last_completed_at']
+        read_only_fields = fields
+
+
+class DuplicateStoreSerializer(serializers.Serializer):
+    """Serializer for copying a Store."""
+    name = serializers.CharField(max_length=255, required=False)
+
+
+class RecurringStoreSerializer(serializers.ModelSerializer):
+    """Serializer for a Store's recurring copy schedule."""
+    interval_days = serializers.IntegerField(min_value=1, max_value=365)
+    next_run_at = serializers.DateTimeField(required=False)
+
+    class Meta:
+        model = RecurringStore
+        fields = ['store_id', 'interval_days', 'next_run_at']
+        read_only_fields = ['store_id']
@@ -0,0 +1,54 @@
+"""
+Consolidated shopping list over the stores visible to a user
+"""
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import Collate
+
+from core.analytics import normalized_name
+from core.models import Grocery, Store
+from core.sharding import shard_aliases
+
+
+def shopping_list(user, limit, after=None):
+    """Return the first limit incomplete groceries of the user's
+    incomplete stores, owned and shared, merged by normalized name as
+    dicts of key, name, qty, items and store_ids sorted by key, those
+    after the key after only. Each shard groups its first limit keys in
+    one query, the per shard groups are merged here."""
+    merged = {}
+    for alias in shard_aliases():
+        stores = Store.objects.using(alias).visible_to(user).filter(
+            is_completed=False)
+        rows = Grocery.objects.using(alias).filter(
+            store_id__in=stores.values('id'),
+            is_completed=False,
+        ).order_by().annotate(
+            # Byte order, as the keys are sorted when merged
+            key=Collate(normalized_name(), 'C')
+        )
+        if after is not None:
+            rows = rows.filter(key__gt=after)
+        rows = rows.values('key').annotate(
+            display=Max('name'),
+            qty=Sum('qty'),
+            items=Count('id'),
+            store_ids=ArrayAgg('store_id', distinct=True, ordering='store_id'),
+        ).order_by('key').values_list(
+            'key', 'display', 'qty', 'items', 'store_ids')[:limit]
+
+        for key, display, qty, items, store_ids in rows:
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = {
+                    'key': key,
+                    'name': display,
+                    'qty': qty,
+                    'items': items,
+                    'store_ids': store_ids,
+                }
+            else:
+                entry['qty'] += qty
+                entry['items'] += items
+                entry['store_ids'] = sorted(entry['store_ids'] + store_ids)
+    return [merged[key] for key in sorted(merged)[:limit]]
@@ -0,0 +1,142 @@
+"""
+Per-user grocery name suggestions from purchase history
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.db.models.functions import Lower
+
+from core.models import Grocery
+from core.sharding import shard_for_user
+
+DEFAULTS = {
+    'CACHE_SIZE': 1000,
+    'TTL': 300,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'GROCERY_SUGGESTIONS', {}).get(
+        name, DEFAULTS[name])
+
+
+def normalize(name):
+    """Case and whitespace insensitive key for a grocery name"""
+    return ' '.join(name.split()).lower()
+
+
+class PrefixIndex:
+    """Sorted grocery names of one user with their use counts.
+    Names sharing a prefix are contiguous, so a lookup is a binary
+    search plus a scan of the matching range."""
+
+    def __init__(self, entries=()):
+        self.keys = []
+        self.stats = {}
+        for name, count, last_used in entries:
+            key = normalize(name)
+            if key not in self.stats:
+                self.keys.append(key)
+                self.stats[key] = [name, 0, 0]
+            stat = self.stats[key]
+            stat[1] += count
+            stat[2] = max(stat[2], last_used)
+        self.keys.sort()
+
+    def add(self, name, used):
+        """Record one more use of a name"""
+        key = normalize(name)
+        if not key:
+            return
+        stat = self.stats.get(key)
+        if stat is None:
+            insort(self.keys, key)
+            self.stats[key] = [name, 1, used]
+        else:
+            stat[0] = name
+            stat[1] += 1
+            stat[2] = max(stat[2], used)
+
+    def suggest(self, prefix, limit):
+        """Return the most used, then most recent, names for a prefix"""
+        prefix = normalize(prefix)
+        start = bisect_left(self.keys, prefix)
+        end = start
+        while end < len(self.keys) and self.keys[end].startswith(prefix):
+            end += 1
+        best = heapq.nlargest(
+            limit,
+            (self.stats[key] for key in self.keys[start:end]),
+            key=lambda stat: (stat[1], stat[2])
+        )
+        return [stat[0] for stat in best]
+
+
+class SuggestionCache:
+    """LRU cache of prefix indexes keyed by user id"""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get(self, user_id):
+        """Return the user's index, building it from history on a miss"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(user_id)
+                return entry[1]
+
+        index = self.build(user_id)
+        with self.lock:
+            self.entries[user_id] = (now + get_setting('TTL'), index)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > get_setting('CACHE_SIZE'):
+                self.entries.popitem(last=False)
+        return index
+
+    def build(self, user_id):
+        """Group the user's grocery history by name in one query"""
+        rows = Grocery.objects.using(shard_for_user(user_id)).filter(
+            owner_id=user_id
+        ).order_by().annotate(
+            key=Lower('name')
+        ).values('key').annotate(
+            display=Max('name'),
+            count=Count('id'),
+            last_used=Max('id'),
+        ).values_list('display', 'count', 'last_used')
+        return PrefixIndex(rows)
+
+    def record(self, user_id, groceries):
+        """Add new groceries to a cached index. Uncached users are
+        skipped, their index is built from the database when needed."""
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return
+            for grocery in groceries:
+                entry[1].add(grocery.name, grocery.id)
+
+
+cache = SuggestionCache()
+
+
+def record_groceries(user, groceries):
+    cache.record(user.id, groceries)
+
+
+def suggest(user, prefix, limit):
+    index = cache.get(user.id)
+    with cache.lock:
+        return index.suggest(prefix, limit)
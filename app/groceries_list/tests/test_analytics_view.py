@@ -0,0 +1,119 @@
+"""
+Tests for the shopping analytics API and its rollups.
+"""
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+
+from core import archive
+from core.models import ItemStats, Store, WeeklyStats
+
+from .test_groceries_list_setup import GroceriesListAPITestSetup
+
+ANALYTICS_URL = reverse('groceries_list:analytics')
+
+
+def rollup():
+    out = StringIO()
+    call_command('rollup_analytics', lag=0, stdout=out)
+    return out.getvalue()
+
+
+class AnalyticsAPITests(GroceriesListAPITestSetup):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        self.store = self.create_store(owner=self.user, name='Target')
+        for name, is_completed in (
+                ('Milk', True), ('milk ', True), ('Eggs', True),
+                ('Bread', False)):
+            self.store.groceries.create(
+                owner=self.user,
+                name=name,
+                store_id=self.store.id,
+                is_completed=is_completed
+            )
+
+    def test_auth_required(self):
+        """Test auth is required to get analytics."""
+        self.client.force_authenticate(user=None)
+        res = self.client.get(ANALYTICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_analytics_from_rollups(self):
+        """Test the endpoint reads the rollups only"""
+        rollup()
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(ANALYTICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(any('core_grocery' in q['sql']
+                             for q in ctx.captured_queries))
+        self.assertEqual(res.data['added'], 4)
+        self.assertEqual(res.data['completed'], 3)
+        self.assertEqual(res.data['completion_rate'], 0.75)
+        self.assertEqual(len(res.data['weekly']), 1)
+        self.assertEqual(res.data['weekly'][0]['added'], 4)
+        self.assertEqual(res.data['weekly'][0]['completed'], 3)
+        self.assertEqual(
+            [(item['name'].strip().lower(), item['completed'])
+             for item in res.data['top_items']],
+            [('milk', 2), ('eggs', 1)]
+        )
+
+    def test_rollups_follow_changes(self):
+        """Test only changed rows are read and rollups follow them"""
+        self.assertIn('Rolled up 5 changed rows', rollup())
+        self.assertIn('Rolled up 0 changed rows', rollup())
+
+        res = self.client.patch(
+            self.grocery_detail_url(
+                self.store.groceries.get(name='Bread').id),
+            {'is_completed': True},
+            format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        rollup()
+
+        bread = ItemStats.objects.get(owner=self.user, key='bread')
+        self.assertEqual(bread.completed, 1)
+        self.assertIsNotNone(bread.last_completed_at)
+
+    def test_deletes_subtracted(self):
+        """Test deleted groceries and stores leave the rollups, reading
+        the changed rows only"""
+        rollup()
+        self.store.groceries.get(name='Eggs').soft_delete()
+        self.assertIn('Rolled up 1 changed rows', rollup())
+
+        self.assertFalse(
+            ItemStats.objects.filter(owner=self.user, key='eggs').exists())
+        self.assertEqual(
+            ItemStats.objects.get(owner=self.user, key='milk').added, 2)
+
+        self.store.soft_delete()
+        rollup()
+        self.assertFalse(ItemStats.objects.filter(owner=self.user).exists())
+        self.assertFalse(WeeklyStats.objects.filter(owner=self.user).exists())
+
+    def test_archived_groceries_counted(self):
+        """Test archived groceries stay in the rollups, also when archived
+        before a rollup ran"""
+        self.store.is_completed = True
+        self.store.save()
+        archive.archive_batch('default', timezone.now(), 10)
+        self.assertFalse(Store.objects.exists())
+        self.create_store(owner=self.user, name='Costco').groceries.create(
+            owner=self.user, name='Milk', store_id=0)
+        rollup()
+
+        res = self.client.get(ANALYTICS_URL)
+        self.assertEqual(res.data['added'], 5)
+        self.assertEqual(res.data['completed'], 3)
@@ -0,0 +1,134 @@
+"""
+Tests for archiving completed stores.
+"""
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from rest_framework import status
+
+from core.models import ArchivedStore, Grocery, Store
+
+from .test_groceries_list_setup import GroceriesListAPITestSetup
+
+
+def archived_store_url(store_id):
+    return reverse('groceries_list:archived_store', args=[store_id])
+
+
+def restore_url(store_id):
+    return reverse('groceries_list:restore_store', args=[store_id])
+
+
+class ArchiveAPITests(GroceriesListAPITestSetup):
+
+    def setUp(self):
+        super().setUp()
+        self.archived_url = reverse('groceries_list:archived_stores')
+        self.friend = self.create_user(
+            email='friend@example.com',
+            username='friend',
+        )
+        self.user = self.create_user()
+        self.store = self.create_store(owner=self.user, name='Target')
+        self.store.groceries.create(
+            owner=self.user, name='Milk', store_id=self.store.id)
+        self.store.shares.add(self.friend)
+
+    def archive(self, days=0):
+        out = StringIO()
+        call_command('archive_stores', days=days, stdout=out)
+        return out.getvalue()
+
+    def complete_store(self):
+        res = self.client.patch(
+            self.store_detail_url(self.store.id),
+            {'is_completed': True},
+            format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+
+    def test_completed_at_tracked(self):
+        """Test completing and reopening a store sets completed_at"""
+        self.complete_store()
+        self.store.refresh_from_db()
+        self.assertIsNotNone(self.store.completed_at)
+
+        self.store.is_completed = False
+        self.store.save(update_fields=['is_completed'])
+        self.store.refresh_from_db()
+        self.assertIsNone(self.store.completed_at)
+
+    def test_archive_completed_stores(self):
+        """Test old completed stores leave the list for the archive"""
+        open_store = self.create_store(owner=self.user, name='Costco')
+        self.complete_store()
+
+        self.assertIn('Archived 1 stores', self.archive())
+
+        res = self.client.get(self.stores_url)
+        self.assertEqual([s['id'] for s in res.data], [open_store.id])
+        self.assertFalse(Grocery.all_objects.filter(
+            store_id=self.store.id).exists())
+        res = self.client.get(self.archived_url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+        archived = res.data['results'][0]
+        self.assertEqual(archived['id'], self.store.id)
+        self.assertEqual([g['name'] for g in archived['groceries']],
+                         ['Milk'])
+
+    def test_recently_completed_not_archived(self):
+        """Test stores are kept until they are old enough"""
+        self.complete_store()
+
+        self.assertIn('Archived 0 stores', self.archive(days=30))
+
+        self.assertTrue(Store.objects.filter(id=self.store.id).exists())
+        self.assertFalse(ArchivedStore.objects.exists())
+
+    def test_restore_store(self):
+        """Test restoring brings the store back with the same ids"""
+        grocery = self.store.groceries.get()
+        self.complete_store()
+        self.archive()
+
+        res = self.client.post(restore_url(self.store.id))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['id'], self.store.id)
+        self.assertEqual(res.data['groceries'][0]['id'], grocery.id)
+        self.assertFalse(ArchivedStore.objects.exists())
+        store = Store.objects.get(id=self.store.id)
+        self.assertEqual(list(store.shares.all()), [self.friend])
+        res = self.client.get(self.store_detail_url(self.store.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_restore_keeps_versions(self):
+        """Test clients holding a version before archiving can update the
+        restored rows"""
+        grocery = self.store.groceries.get()
+        Grocery.objects.filter(id=grocery.id).update(version=3)
+        self.complete_store()
+        self.store.refresh_from_db()
+        self.archive()
+
+        self.client.post(restore_url(self.store.id))
+
+        self.assertEqual(
+            Store.objects.get(id=self.store.id).version, self.store.version)
+        self.assertEqual(Grocery.objects.get(id=grocery.id).version, 4)
+
+    def test_archive_limited_to_owner(self):
+        """Test other users cannot see or restore archived stores"""
+        self.complete_store()
+        self.archive()
+
+        self.client.force_authenticate(user=self.friend)
+        self.assertEqual(self.client.get(self.archived_url).data['results'],
+                         [])
+        res = self.client.get(archived_store_url(self.store.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        res = self.client.post(restore_url(self.store.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
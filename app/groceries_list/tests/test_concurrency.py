@@ -0,0 +1,132 @@
+"""
+Tests for optimistic concurrency on stores and groceries.
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+
+from core.models import Grocery, Store
+
+from .test_groceries_list_setup import GroceriesListAPITestSetup
+
+
+class ConcurrencyAPITests(GroceriesListAPITestSetup):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        self.store = self.create_store(owner=self.user, name='Target')
+        self.grocery = self.store.groceries.create(
+            owner=self.user, name='Milk', store_id=self.store.id)
+
+    def test_etag_is_version(self):
+        """Test details return their version as ETag"""
+        res = self.client.get(self.store_detail_url(self.store.id))
+        self.assertEqual(res['ETag'], '"1"')
+        self.assertEqual(res.data['version'], 1)
+        res = self.client.get(self.grocery_detail_url(self.grocery.id))
+        self.assertEqual(res['ETag'], '"1"')
+
+    def test_update_with_current_version(self):
+        """Test a matching If-Match updates and bumps the version"""
+        res = self.client.patch(
+            self.store_detail_url(self.store.id),
+            {'name': 'Costco'},
+            format='json',
+            HTTP_IF_MATCH='"1"'
+        )
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res['ETag'], '"2"')
+        self.assertEqual(res.data['name'], 'Costco')
+
+    def test_stale_update_rejected(self):
+        """Test a stale version gets 412 and changes nothing"""
+        Store.objects.filter(id=self.store.id).update(version=2)
+        res = self.client.patch(
+            self.store_detail_url(self.store.id),
+            {'name': 'Costco'},
+            format='json',
+            HTTP_IF_MATCH='"1"'
+        )
+        self.assertEqual(res.status_code,
+                         status.HTTP_412_PRECONDITION_FAILED)
+        self.store.refresh_from_db()
+        self.assertEqual(self.store.name, 'Target')
+
+    def test_stale_version_field_rejected(self):
+        """Test the version can be sent in the body"""
+        res = self.client.patch(
+            self.grocery_detail_url(self.grocery.id),
+            {'is_completed': True, 'version': 3},
+            format='json'
+        )
+        self.assertEqual(res.status_code,
+                         status.HTTP_412_PRECONDITION_FAILED)
+        res = self.client.delete(
+            self.grocery_detail_url(self.grocery.id),
+            HTTP_IF_MATCH='"3"'
+        )
+        self.assertEqual(res.status_code,
+                         status.HTTP_412_PRECONDITION_FAILED)
+        self.assertTrue(Grocery.objects.filter(id=self.grocery.id).exists())
+
+    def test_update_writes_changed_columns(self):
+        """Test concurrent edits of different fields are both kept"""
+        Grocery.objects.filter(id=self.grocery.id).update(qty=5)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(
+                self.grocery_detail_url(self.grocery.id),
+                {'name': 'Oat milk'},
+                format='json'
+            )
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['qty'], 5)
+        update = next(q['sql'] for q in ctx.captured_queries
+                      if q['sql'].startswith('UPDATE "core_grocery"'))
+        self.assertNotIn('"qty"', update)
+
+    def test_completion_bumps_store_version_on_change(self):
+        """Test the store version only moves when completion flips"""
+        url = self.grocery_detail_url(self.grocery.id)
+        res = self.client.patch(url, {'qty': 2}, format='json')
+        self.assertFalse(res.data['is_store_completed'])
+        self.store.refresh_from_db()
+        self.assertEqual(self.store.version, 1)
+
+        res = self.client.patch(url, {'is_completed': True}, format='json')
+        self.assertTrue(res.data['is_store_completed'])
+        self.store.refresh_from_db()
+        self.assertEqual(self.store.version, 2)
+        self.assertIsNotNone(self.store.completed_at)
+
+    def test_form_false_is_not_completed(self):
+        """Test a form encoded 'false' leaves the grocery open"""
+        res = self.client.patch(
+            self.grocery_detail_url(self.grocery.id),
+            {'is_completed': 'false'},
+        )
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.grocery.refresh_from_db()
+        self.assertFalse(self.grocery.is_completed)
+
+        res = self.client.patch(
+            self.store_detail_url(self.store.id),
+            {'is_completed': 'false'},
+        )
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.store.refresh_from_db()
+        self.assertFalse(self.store.is_completed)
+
+    def test_invalid_values_rejected(self):
+        """Test name and qty are validated before the UPDATE"""
+        res = self.client.patch(
+            self.grocery_detail_url(self.grocery.id),
+            {'qty': 'many', 'name': 'x' * 300},
+            format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('qty', res.data)
+        self.assertIn('name', res.data)
+        self.grocery.refresh_from_db()
+        self.assertEqual(self.grocery.version, 1)
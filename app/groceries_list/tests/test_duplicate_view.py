@@ -0,0 +1,127 @@
+"""
+Tests for duplicating stores and recurring lists.
+"""
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+
+from core.models import Grocery, RecurringStore, Store
+
+from .test_groceries_list_setup import GroceriesListAPITestSetup
+
+
+def duplicate_url(store_id):
+    return reverse('groceries_list:duplicate_store', args=[store_id])
+
+
+def recurrence_url(store_id):
+    return reverse('groceries_list:store_recurrence', args=[store_id])
+
+
+class DuplicateStoreAPITests(GroceriesListAPITestSetup):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        self.store = self.create_store(
+            owner=self.user, name='Weekly', is_completed=True)
+        for i in range(5):
+            self.store.groceries.create(
+                owner=self.user,
+                name='Item %d' % i,
+                qty=i + 1,
+                store_id=self.store.id,
+                is_completed=True
+            )
+        self.store.groceries.first().soft_delete()
+
+    def test_duplicate_store(self):
+        """Test a copy has the live groceries reset to incomplete"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(duplicate_url(self.store.id))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotEqual(res.data['id'], self.store.id)
+        self.assertEqual(res.data['name'], 'Weekly')
+        self.assertFalse(res.data['is_completed'])
+        self.assertEqual(
+            sorted((g['name'], g['qty']) for g in res.data['groceries']),
+            [('Item %d' % i, i + 1) for i in range(1, 5)]
+        )
+        self.assertFalse(any(g['is_completed']
+                             for g in res.data['groceries']))
+        inserts = [q for q in ctx.captured_queries
+                   if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 3)
+
+    def test_duplicate_with_name(self):
+        """Test the copy can be renamed"""
+        res = self.client.post(
+            duplicate_url(self.store.id), {'name': 'Next week'})
+        self.assertEqual(res.data['name'], 'Next week')
+        self.assertEqual(
+            Grocery.objects.filter(store_id=res.data['id']).count(), 4)
+
+    def test_duplicate_other_users_store(self):
+        """Test users cannot copy stores they do not own"""
+        self.create_user(email='other@example.com', username='other')
+        res = self.client.post(duplicate_url(self.store.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_recurring_store(self):
+        """Test a schedule copies the template when due"""
+        res = self.client.put(
+            recurrence_url(self.store.id),
+            {'interval_days': 7},
+            format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['interval_days'], 7)
+
+        out = StringIO()
+        call_command('run_recurring_stores', stdout=out)
+        self.assertIn('Copied 0 stores', out.getvalue())
+        self.assertEqual(Store.objects.count(), 1)
+
+        next_run_at = timezone.now() - timedelta(days=15)
+        RecurringStore.objects.update(next_run_at=next_run_at)
+        out = StringIO()
+        call_command('run_recurring_stores', stdout=out)
+
+        self.assertIn('Copied 1 stores', out.getvalue())
+        self.assertEqual(Store.objects.count(), 2)
+        recurrence = RecurringStore.objects.get()
+        self.assertEqual(recurrence.next_run_at,
+                         next_run_at + timedelta(days=21))
+
+    def test_remove_recurring_store(self):
+        """Test removing a schedule"""
+        self.client.put(
+            recurrence_url(self.store.id),
+            {'interval_days': 7},
+            format='json'
+        )
+        res = self.client.delete(recurrence_url(self.store.id))
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        res = self.client.get(recurrence_url(self.store.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_templates_not_archived(self):
+        """Test recurring templates stay out of the archive"""
+        RecurringStore.objects.create(
+            store=self.store, next_run_at=timezone.now())
+        Store.objects.filter(id=self.store.id).update(
+            completed_at=timezone.now() - timedelta(days=60))
+
+        out = StringIO()
+        call_command('archive_stores', stdout=out)
+
+        self.assertIn('Archived 0 stores', out.getvalue())
+        self.assertTrue(Store.objects.filter(id=self.store.id).exists())
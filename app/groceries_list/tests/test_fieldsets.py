@@ -0,0 +1,66 @@
+"""
+Tests for sparse fieldsets on the store API.
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+
+from .test_groceries_list_setup import GroceriesListAPITestSetup
+
+
+class SparseFieldsAPITests(GroceriesListAPITestSetup):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        self.store = self.create_store(owner=self.user, name='Target')
+        self.store.groceries.create(
+            owner=self.user, name='Milk', store_id=self.store.id)
+
+    def get_stores(self, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(self.stores_url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res, [q['sql'] for q in ctx.captured_queries]
+
+    def test_default_output_unchanged(self):
+        """Test stores embed groceries without parameters"""
+        res, _ = self.get_stores()
+        self.assertEqual(
+            set(res.data[0]),
+            {'id', 'name', 'groceries', 'is_completed', 'version'}
+        )
+        self.assertEqual(res.data[0]['groceries'][0]['name'], 'Milk')
+
+    def test_fields_skip_groceries(self):
+        """Test ?fields= limits output and skips the groceries query"""
+        res, queries = self.get_stores(fields='name,is_completed')
+        self.assertEqual(res.data, [
+            {'name': 'Target', 'is_completed': False}
+        ])
+        self.assertFalse(any('core_grocery' in sql for sql in queries))
+        store_query = next(sql for sql in queries if 'core_store' in sql)
+        self.assertNotIn('"completed_at"', store_query)
+
+    def test_expand_groceries(self):
+        """Test ?expand=groceries adds the groceries to sparse output"""
+        res, queries = self.get_stores(fields='id', expand='groceries')
+        self.assertEqual(set(res.data[0]), {'id', 'groceries'})
+        self.assertEqual(len(res.data[0]['groceries']), 1)
+        self.assertEqual(
+            len([sql for sql in queries if 'core_grocery' in sql]), 1)
+
+    def test_detail_fields(self):
+        """Test the store detail honours ?fields= and keeps its ETag"""
+        res = self.client.get(
+            self.store_detail_url(self.store.id), {'fields': 'name'})
+        self.assertEqual(res.data, {'name': 'Target'})
+        self.assertEqual(res['ETag'], '"1"')
+
+    def test_unknown_fields_rejected(self):
+        """Test unknown fields and expansions get 400"""
+        res = self.client.get(self.stores_url, {'fields': 'owner'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.get(self.stores_url, {'expand': 'owner'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -7,6 +7,7 @@ from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
 
 from core.models import Store, Grocery
+from groceries_list import suggestions
 
 
 class GroceriesListAPITestSetup(APITestCase):
@@ -14,6 +15,9 @@ class GroceriesListAPITestSetup(APITestCase):
     def setUp(self):
         self.stores_url = reverse('groceries_list:stores')
         self.grocery_url = reverse('groceries_list:add_grocery')
+        self.search_url = reverse('groceries_list:search')
+        self.suggestions_url = reverse('groceries_list:suggestions')
+        suggestions.cache.clear()
         self.user_data = {
             'email': 'email@gamil.com',
             'username': 'testname',
@@ -0,0 +1,134 @@
+"""
+Tests for ordering groceries within a store.
+"""
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+
+from core.models import Grocery
+from core.positions import key_between, spread_keys
+
+from .test_groceries_list_setup import GroceriesListAPITestSetup
+
+
+def move_url(grocery_id):
+    return reverse('groceries_list:move_grocery', args=[grocery_id])
+
+
+class MoveGroceryAPITests(GroceriesListAPITestSetup):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        res = self.client.post(self.stores_url, {
+            'name': 'Target',
+            'groceries': [{'name': name, 'store_id': 0} for name in 'ABCD'],
+        }, format='json')
+        self.store_id = res.data['id']
+        self.ids = {g['name']: g['id'] for g in res.data['groceries']}
+
+    def names(self):
+        res = self.client.get(self.store_detail_url(self.store_id))
+        return ''.join(g['name'] for g in res.data['groceries'])
+
+    def test_groceries_keep_creation_order(self):
+        """Test new groceries are appended to the store"""
+        self.client.post(
+            self.grocery_url,
+            {'name': 'E', 'store_id': self.store_id},
+            format='json'
+        )
+        self.assertEqual(self.names(), 'ABCDE')
+
+    def test_move_grocery(self):
+        """Test moving a grocery updates its own row only"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(
+                move_url(self.ids['D']), {'after': self.ids['A']},
+                format='json')
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['version'], 2)
+        updates = [q for q in ctx.captured_queries
+                   if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.names(), 'ADBC')
+
+        self.client.post(move_url(self.ids['C']), {'after': None},
+                         format='json')
+        self.assertEqual(self.names(), 'CADB')
+
+    def test_move_after_itself_rejected(self):
+        """Test the grocery to move after must be another one"""
+        res = self.client.post(
+            move_url(self.ids['A']), {'after': self.ids['A']},
+            format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_move_between_equal_positions(self):
+        """Test a store with colliding keys is rebalanced on move"""
+        Grocery.objects.filter(store_id=self.store_id).update(position='')
+        self.client.post(move_url(self.ids['A']), {'after': self.ids['C']},
+                         format='json')
+        self.assertEqual(self.names(), 'BCAD')
+        positions = list(Grocery.objects.filter(
+            store_id=self.store_id).values_list('position', flat=True))
+        self.assertEqual(len(set(positions)), 4)
+
+    def test_move_rebalances_keys_too_long(self):
+        """Test a move whose key would not fit the column rebalances"""
+        for name, key in zip('ABCD', ['1', 'a' * 255, 'a' * 254 + 'b', 'z']):
+            Grocery.objects.filter(id=self.ids[name]).update(position=key)
+
+        res = self.client.post(
+            move_url(self.ids['D']), {'after': self.ids['B']},
+            format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.names(), 'ABDC')
+        self.assertLessEqual(len(res.data['position']), 4)
+
+    def test_append_rebalances_keys_too_long(self):
+        """Test appending after a key of the column's length rebalances"""
+        Grocery.objects.filter(id=self.ids['D']).update(position='z' * 255)
+        res = self.client.post(
+            self.grocery_url,
+            {'name': 'E', 'store_id': self.store_id},
+            format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.names(), 'ABCDE')
+
+    def test_move_without_room_conflicts(self):
+        """Test a move finding no room even after rebalancing gets 409"""
+        with patch('groceries_list.views.position_after',
+                   side_effect=ValueError):
+            res = self.client.post(
+                move_url(self.ids['D']), {'after': self.ids['A']},
+                format='json')
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.names(), 'ABCD')
+
+    def test_rebalance_positions(self):
+        """Test the command shortens long keys keeping the order"""
+        key = None
+        for name in 'DCBA':
+            key = key_between(None, key)
+            Grocery.objects.filter(id=self.ids[name]).update(
+                position=key + 'z' * 20)
+
+        out = StringIO()
+        call_command('rebalance_positions', stdout=out)
+
+        self.assertIn('Rebalanced 1 stores', out.getvalue())
+        self.assertEqual(self.names(), 'ABCD')
+        self.assertEqual(
+            list(Grocery.objects.filter(
+                store_id=self.store_id).values_list('position', flat=True)),
+            spread_keys(4)
+        )
@@ -0,0 +1,93 @@
+"""
+Tests that the groceries API queries are served by indexes.
+"""
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+
+from core.models import Store, Grocery
+
+from .test_groceries_list_setup import GroceriesListAPITestSetup
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN plans are Postgres')
+class QueryPlanTests(GroceriesListAPITestSetup):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        self.store = self.seed_stores(self.user)
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='otherpassword',
+            username='otherusername'
+        )
+        self.seed_stores(other_user)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def seed_stores(self, user, stores=20, groceries=50):
+        """Create stores with groceries and return the last store."""
+        for _ in range(stores):
+            store = Store.objects.create(owner=user, name='Store')
+            items = Grocery.objects.bulk_create([
+                Grocery(
+                    owner=user,
+                    name='Item %d' % i,
+                    store_id=store.id,
+                    is_completed=i % 2 == 0
+                )
+                for i in range(groceries)
+            ])
+            store.groceries.add(*items)
+        return store
+
+    def assert_index_scans(self, queries):
+        """Assert that no SELECT falls back to a sequential scan."""
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            for query in queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN ' + query['sql'])
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+                self.assertNotIn('Seq Scan', plan, query['sql'])
+
+    def test_store_list_uses_indexes(self):
+        """Test listing stores uses indexes."""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(self.stores_url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assert_index_scans(ctx.captured_queries)
+
+    def test_store_detail_uses_indexes(self):
+        """Test retrieving and deleting a store uses indexes."""
+        url = self.store_detail_url(self.store.id)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+            self.client.delete(url)
+        self.assert_index_scans(ctx.captured_queries)
+
+    def test_grocery_update_uses_indexes(self):
+        """Test updating a grocery and recomputing completion uses indexes."""
+        grocery = self.store.groceries.first()
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(
+                self.grocery_detail_url(grocery.id),
+                {'is_completed': True},
+                format='json'
+            )
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assert_index_scans(ctx.captured_queries)
+
+    def test_search_uses_indexes(self):
+        """Test searching names uses the full-text indexes."""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(self.search_url, {'q': 'ite'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.data['groceries'])
+        self.assert_index_scans(ctx.captured_queries)
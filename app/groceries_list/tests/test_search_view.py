@@ -0,0 +1,93 @@
+"""
+Tests for the search API.
+"""
+from rest_framework import status
+
+from .test_groceries_list_setup import GroceriesListAPITestSetup
+
+
+class SearchAPITests(GroceriesListAPITestSetup):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        self.store = self.create_store(owner=self.user, name='Whole Foods')
+        self.store.groceries.create(
+                                    owner=self.user,
+                                    name='Oat Milk',
+                                    store_id=self.store.id
+                                    )
+        self.store.groceries.create(
+                                    owner=self.user,
+                                    name='Bread',
+                                    store_id=self.store.id
+                                    )
+
+    def test_auth_required(self):
+        """Test auth is required to call API."""
+        self.client.logout()
+        res = self.client.get(self.search_url, {'q': 'milk'})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_search_groceries_and_stores(self):
+        """Test search matches grocery and store names."""
+        res = self.client.get(self.search_url, {'q': 'milk'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [g['name'] for g in res.data['groceries']], ['Oat Milk'])
+        self.assertEqual(res.data['stores'], [])
+
+        res = self.client.get(self.search_url, {'q': 'whole'})
+        self.assertEqual(
+            [s['id'] for s in res.data['stores']], [self.store.id])
+
+    def test_search_prefix(self):
+        """Test every term matches as a prefix for autocomplete."""
+        res = self.client.get(self.search_url, {'q': 'oat mi'})
+        self.assertEqual(
+            [g['name'] for g in res.data['groceries']], ['Oat Milk'])
+
+    def test_search_includes_shared_stores(self):
+        """Test search covers stores shared with the user."""
+        other_user = self.create_user(
+                                        email='other@example.com',
+                                        username='otherusername'
+                                    )
+        other_store = self.create_store(owner=other_user, name='Costco')
+        other_store.groceries.create(
+                                    owner=other_user,
+                                    name='Milk',
+                                    store_id=other_store.id
+                                    )
+        self.client.force_authenticate(user=self.user)
+        res = self.client.get(self.search_url, {'q': 'milk'})
+        self.assertEqual(len(res.data['groceries']), 1)
+
+        other_store.shares.add(self.user)
+        res = self.client.get(self.search_url, {'q': 'milk'})
+        self.assertEqual(
+            sorted(g['name'] for g in res.data['groceries']),
+            ['Milk', 'Oat Milk']
+        )
+
+    def test_search_limited_to_user(self):
+        """Test other users' groceries are not returned."""
+        other_user = self.create_user(
+                                        email='other@example.com',
+                                        username='otherusername'
+                                    )
+        other_store = self.create_store(owner=other_user, name='Costco')
+        other_store.groceries.create(
+                                    owner=other_user,
+                                    name='Bread',
+                                    store_id=other_store.id
+                                    )
+        self.client.force_authenticate(user=self.user)
+        res = self.client.get(self.search_url, {'q': 'bread'})
+        self.assertEqual(len(res.data['groceries']), 1)
+
+    def test_search_empty_query(self):
+        """Test a blank or symbol-only query returns nothing."""
+        res = self.client.get(self.search_url, {'q': ' &:* '})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'stores': [], 'groceries': []})
@@ -0,0 +1,98 @@
+"""
+Tests for the consolidated shopping list API.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+
+from .test_groceries_list_setup import GroceriesListAPITestSetup
+
+SHOPPING_LIST_URL = reverse('groceries_list:shopping_list')
+
+
+class ShoppingListAPITests(GroceriesListAPITestSetup):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        self.target = self.create_store(owner=self.user, name='Target')
+        self.costco = self.create_store(owner=self.user, name='Costco')
+        self.add(self.target, 'Milk', 2)
+        self.add(self.target, 'Eggs', 1)
+        self.add(self.target, 'Bread', 1, is_completed=True)
+        self.add(self.costco, ' milk ', 3)
+        self.add(self.costco, 'Oat  milk', 1)
+
+    def add(self, store, name, qty, owner=None, **params):
+        return store.groceries.create(
+            owner=owner or self.user,
+            name=name,
+            qty=qty,
+            store_id=store.id,
+            **params
+        )
+
+    def test_auth_required(self):
+        """Test auth is required to get the shopping list."""
+        self.client.force_authenticate(user=None)
+        res = self.client.get(SHOPPING_LIST_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_merge_by_name(self):
+        """Test incomplete groceries are merged by normalized name"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(SHOPPING_LIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        groceries = {g['name'].strip().lower(): g
+                     for g in res.data['groceries']}
+        self.assertEqual(list(groceries), ['eggs', 'milk', 'oat  milk'])
+        self.assertEqual(groceries['milk']['qty'], 5)
+        self.assertEqual(groceries['milk']['items'], 2)
+        self.assertEqual(groceries['milk']['store_ids'],
+                         sorted([self.target.id, self.costco.id]))
+        self.assertEqual(groceries['eggs']['store_ids'], [self.target.id])
+
+    def test_completed_and_other_stores_excluded(self):
+        """Test completed stores and other users' stores are left out,
+        stores shared with the user are included"""
+        self.costco.is_completed = True
+        self.costco.save()
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='otherpassword',
+            username='other'
+        )
+        walmart = self.create_store(owner=other, name='Walmart')
+        self.add(walmart, 'MILK', 4, owner=other)
+        self.add(self.create_store(owner=other, name='Aldi'), 'Milk', 7,
+                 owner=other)
+        walmart.shares.add(self.user)
+
+        res = self.client.get(SHOPPING_LIST_URL)
+
+        milk = [g for g in res.data['groceries']
+                if g['name'].lower() == 'milk'][0]
+        self.assertEqual(milk['qty'], 6)
+        self.assertEqual(milk['store_ids'],
+                         sorted([self.target.id, walmart.id]))
+
+    def test_paginated(self):
+        """Test the list is served a page of names at a time"""
+        res = self.client.get(SHOPPING_LIST_URL, {'limit': 2})
+
+        self.assertEqual(
+            [g['name'].strip().lower() for g in res.data['groceries']],
+            ['eggs', 'milk'])
+        self.assertEqual(res.data['next'], 'milk')
+
+        res = self.client.get(
+            SHOPPING_LIST_URL, {'limit': 2, 'after': res.data['next']})
+
+        self.assertEqual(
+            [g['name'] for g in res.data['groceries']], ['Oat  milk'])
+        self.assertIsNone(res.data['next'])
@@ -3,7 +3,7 @@ Tests for the store API.
 """
 from rest_framework import status
 
-from core.models import Store
+from core.models import Store, Grocery
 from groceries_list.serializers import (
                                         StoresListSerializer,
                                         StoreDetailSerializer
@@ -172,6 +172,21 @@ class StoreAPITests(GroceriesListAPITestSetup):
                         status.HTTP_404_NOT_FOUND
                         )
 
+    def test_delete_store_is_soft(self):
+        """Test delete only tombstones the store, purge removes rows"""
+        user = self.create_user()
+        store = self.create_store(owner=user, name="Target")
+        store.groceries.create(owner=user, name='Onion', store_id=store.id)
+
+        res = self.client.delete(self.store_detail_url(store.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(Store.all_objects.get(id=store.id).deleted_at)
+        self.assertEqual(Grocery.all_objects.filter(
+            store_id=store.id, deleted_at__isnull=True).count(), 1)
+        self.assertFalse(Grocery.objects.filter(store_id=store.id).exists())
+        self.assertEqual(self.client.get(self.stores_url).data, [])
+
     def test_update_store(self):
         """Test update store name """
         user = self.create_user()
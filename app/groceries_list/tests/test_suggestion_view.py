@@ -0,0 +1,73 @@
+"""
+Tests for the grocery name suggestion API.
+"""
+from django.test import override_settings
+
+from rest_framework import status
+
+from groceries_list import suggestions
+
+from .test_groceries_list_setup import GroceriesListAPITestSetup
+
+
+class SuggestionAPITests(GroceriesListAPITestSetup):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        self.store = self.create_store(owner=self.user, name='Target')
+        for name in ['Milk', 'milk', 'Mint', 'Bread']:
+            self.store.groceries.create(
+                                        owner=self.user,
+                                        name=name,
+                                        store_id=self.store.id
+                                        )
+
+    def test_auth_required(self):
+        """Test auth is required to call API."""
+        self.client.logout()
+        res = self.client.get(self.suggestions_url, {'q': 'm'})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_suggest_by_frequency(self):
+        """Test names are case-insensitive and ranked by use."""
+        res = self.client.get(self.suggestions_url, {'q': 'M'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['suggestions'][1], 'Mint')
+        self.assertEqual(res.data['suggestions'][0].lower(), 'milk')
+
+    def test_suggest_learns_new_groceries(self):
+        """Test groceries added through the API update the index."""
+        self.client.get(self.suggestions_url, {'q': 'm'})
+        for _ in range(3):
+            self.client.post(
+                self.grocery_url,
+                {'name': 'Mint', 'store_id': self.store.id},
+                format='json'
+            )
+        self.client.patch(
+            self.store_detail_url(self.store.id),
+            {'groceries': [{'name': 'Mango'}]},
+            format='json'
+        )
+        res = self.client.get(self.suggestions_url, {'q': 'm'})
+        self.assertEqual(res.data['suggestions'], ['Mint', 'milk', 'Mango'])
+
+    def test_suggest_limited_to_user(self):
+        """Test other users' history is not suggested."""
+        self.create_user(
+                                        email='other@example.com',
+                                        username='otherusername'
+                                    )
+        res = self.client.get(self.suggestions_url, {'q': 'm'})
+        self.assertEqual(res.data['suggestions'], [])
+        self.client.force_authenticate(user=self.user)
+        res = self.client.get(self.suggestions_url, {'q': 'b'})
+        self.assertEqual(res.data['suggestions'], ['Bread'])
+
+    @override_settings(GROCERY_SUGGESTIONS={'CACHE_SIZE': 1})
+    def test_cache_evicts_least_recently_used(self):
+        """Test the cache keeps at most CACHE_SIZE users."""
+        suggestions.cache.get(self.user.id)
+        suggestions.cache.get(self.user.id + 1)
+        self.assertEqual(list(suggestions.cache.entries), [self.user.id + 1])
@@ -0,0 +1,90 @@
+"""
+Tests for the store summary API.
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+
+from rest_framework import status
+
+from core.models import Grocery, Store
+
+from .test_groceries_list_setup import GroceriesListAPITestSetup
+
+SUMMARY_URL = reverse('groceries_list:summary')
+
+
+class SummaryAPITests(GroceriesListAPITestSetup):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        self.store = self.create_store(owner=self.user, name='Target')
+        for i in range(3):
+            self.store.groceries.create(
+                owner=self.user,
+                name='Item %d' % i,
+                store_id=self.store.id,
+                is_completed=i == 0
+            )
+        self.empty_store = self.create_store(owner=self.user, name='Costco')
+
+    def test_auth_required(self):
+        """Test auth is required to get the summary."""
+        self.client.force_authenticate(user=None)
+        res = self.client.get(SUMMARY_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_summary_counts(self):
+        """Test total and completed counts in one query"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(SUMMARY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        summary = {row['id']: row for row in res.data['results']}
+        self.assertEqual(summary[self.store.id]['name'], 'Target')
+        self.assertEqual(summary[self.store.id]['total'], 3)
+        self.assertEqual(summary[self.store.id]['completed'], 1)
+        self.assertEqual(summary[self.empty_store.id]['total'], 0)
+        self.assertIsNotNone(summary[self.empty_store.id]['updated_at'])
+
+    def test_summary_ignores_deleted_and_other_users(self):
+        """Test soft deleted groceries and other users' stores are left out"""
+        self.store.groceries.first().soft_delete()
+        other = self.create_user(
+            email='other@example.com', username='other')
+        self.create_store(owner=other, name='Walmart')
+        self.client.force_authenticate(user=self.user)
+
+        res = self.client.get(SUMMARY_URL)
+
+        summary = {row['id']: row for row in res.data['results']}
+        self.assertEqual(set(summary), {self.store.id, self.empty_store.id})
+        self.assertEqual(summary[self.store.id]['total'], 2)
+
+    def test_updated_at_follows_groceries(self):
+        """Test a grocery edit moves its store's updated_at"""
+        res = self.client.get(SUMMARY_URL)
+        before = {
+            row['id']: parse_datetime(row['updated_at'])
+            for row in res.data['results']
+        }
+        grocery = Grocery.objects.filter(store_id=self.store.id).first()
+
+        self.client.patch(
+            self.grocery_detail_url(grocery.id),
+            {'qty': 4},
+            format='json'
+        )
+
+        res = self.client.get(SUMMARY_URL)
+        after = {
+            row['id']: parse_datetime(row['updated_at'])
+            for row in res.data['results']
+        }
+        self.assertGreater(after[self.store.id], before[self.store.id])
+        self.assertEqual(
+            after[self.empty_store.id], before[self.empty_store.id])
+        self.assertEqual(Store.objects.get(id=self.store.id).version, 1)
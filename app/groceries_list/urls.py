@@ -6,10 +6,61 @@ app_name = 'groceries_list'
 urlpatterns = [
     path('', views.StoreListAPIView.as_view(), name="stores"),
     path('<int:id>', views.StoreDetailAPIView.as_view(), name="store"),
+    path(
+        '<int:id>/duplicate',
+        views.StoreDuplicateAPIView.as_view(),
+        name='duplicate_store'
+        ),
+    path(
+        '<int:id>/recurrence',
+        views.RecurringStoreAPIView.as_view(),
+        name='store_recurrence'
+        ),
+    path(
+        'archived',
+        views.ArchivedStoreListAPIView.as_view(),
+        name='archived_stores'
+        ),
+    path(
+        'archived/<int:id>',
+        views.ArchivedStoreDetailAPIView.as_view(),
+        name='archived_store'
+        ),
+    path(
+        'archived/<int:id>/restore',
+        views.ArchivedStoreRestoreAPIView.as_view(),
+        name='restore_store'
+        ),
+    path(
+        'summary',
+        views.StoreSummaryAPIView.as_view(),
+        name='summary'
+        ),
+    path(
+        'shopping-list',
+        views.ShoppingListAPIView.as_view(),
+        name='shopping_list'
+        ),
+    path(
+        'analytics',
+        views.AnalyticsAPIView.as_view(),
+        name='analytics'
+        ),
+    path('search', views.SearchAPIView.as_view(), name='search'),
+    path(
+        'suggestions',
+        views.SuggestionAPIView.as_view(),
+        name='suggestions'
+        ),
     path(
         'grocery/<int:id>',
         views.GroceryDetailAPIView.as_view(),
         name='grocery'
         ),
+    path(
+        'grocery/<int:id>/move',
+        views.GroceryMoveAPIView.as_view(),
+        name='move_grocery'
+        ),
     path('grocery', views.GroceryCreateAPIView.as_view(), name='add_grocery')
 ]
@@ -1,31 +1,79 @@
 """
 Views for the goroceries API
 """
-from django.db.models import Q
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import Greatest
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework import permissions
 from rest_framework.generics import (
+                                        GenericAPIView,
+                                        ListAPIView,
                                         ListCreateAPIView,
+                                        RetrieveAPIView,
                                         RetrieveUpdateDestroyAPIView,
                                         CreateAPIView
 )
+from rest_framework.pagination import CursorPagination
 from rest_framework import status
 
 from .permissions import IsOwner
 from .serializers import (
+                            ArchivedStoreSerializer,
+                            DuplicateStoreSerializer,
+                            MoveGrocerySerializer,
+                            RecurringStoreSerializer,
+                            ShoppingListItemSerializer,
                             StoreDetailSerializer,
+                            StoreSummarySerializer,
                             StoresListSerializer,
-                            GrocerySerializer
+                            GrocerySerializer,
+                            ItemStatsSerializer,
+                            WeeklyStatsSerializer,
+                            StoreSearchSerializer
+    )
+from .concurrency import (
+                            completion_changes,
+                            etag,
+                            expected_version,
+                            PositionConflict,
+                            refresh_store_completion,
+                            validated_changes,
+                            versioned_update
     )
+from .fieldsets import SparseFieldsMixin
+from .search import search
+from .shopping import shopping_list
+from .suggestions import record_groceries, suggest
+from core import archive
+from core.cloning import clone_store
+from core.positions import next_positions, position_after
 from core.models import (
+    ArchivedStore,
+    ItemStats,
+    RecurringStore,
     Store,
-    Grocery
+    Grocery,
+    WeeklyStats
+)
+from core.replicas import ReplicaReadMixin
+from core.sharding import (
+    ShardMixin,
+    ShardMoving,
+    shard_of_store,
+    shard_state,
 )
 
 
-class StoreListAPIView(ListCreateAPIView):
+class StoreListAPIView(
+        ShardMixin, ReplicaReadMixin, SparseFieldsMixin, ListCreateAPIView):
     """Retrive Store List"""
     serializer_class = StoresListSerializer
     queryset = Store.objects.all()
@@ -38,7 +86,42 @@ class StoreListAPIView(ListCreateAPIView):
         return self.queryset.filter(owner=self.request.user)
 
 
-class StoreDetailAPIView(RetrieveUpdateDestroyAPIView):
+class SummaryPagination(CursorPagination):
+    """Keyset pagination over store summaries, newest first"""
+    ordering = '-id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class StoreSummaryAPIView(ShardMixin, ReplicaReadMixin, ListAPIView):
+    """Grocery counts per store, aggregated in one query"""
+    serializer_class = StoreSummarySerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = SummaryPagination
+
+    def get_queryset(self):
+        live = Q(groceries__deleted_at__isnull=True)
+        return Store.objects.filter(
+            owner=self.request.user
+        ).values(
+            'id', 'name', 'is_completed'
+        ).annotate(
+            total=Count('groceries', filter=live),
+            completed=Count(
+                'groceries',
+                filter=live & Q(groceries__is_completed=True)
+            ),
+            last_modified=Greatest(
+                'updated_at', Max('groceries__updated_at')),
+        )
+
+
+class StoreDetailAPIView(
+        ShardMixin,
+        ReplicaReadMixin,
+        SparseFieldsMixin,
+        RetrieveUpdateDestroyAPIView):
     """View for retrive and delete Store"""
     serializer_class = StoreDetailSerializer
     permission_classes = (permissions.IsAuthenticated, IsOwner,)
@@ -49,14 +132,23 @@ class StoreDetailAPIView(RetrieveUpdateDestroyAPIView):
         """Retrieve Store Detail"""
         return self.queryset.filter(owner=self.request.user)
 
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve Store Detail with its version as ETag"""
+        store = self.get_object()
+        res = Response(self.get_serializer(store).data)
+        res['ETag'] = etag(store.version)
+        return res
+
     def delete(self, request, *args, **kwargs):
-        """Delete Store detail and Grocery that has the store_id"""
+        """Soft delete Store detail. Its groceries are hidden with it,
+        the purge_deleted command removes the rows later"""
         store_id = kwargs['id']
-        store = get_object_or_404(Store, pk=store_id)
-        store.delete()
-        groceries = Grocery.objects.filter(Q(store_id=store_id))
-        for grocery in groceries:
-            grocery.delete()
+        versioned_update(
+                        self.get_queryset(),
+                        store_id,
+                        expected_version(request),
+                        {'deleted_at': timezone.now()}
+                        )
         return Response(data={'id': store_id}, status=status.HTTP_200_OK)
 
     def update(self, request, *args, **kwargs):
@@ -69,52 +161,151 @@ class StoreDetailAPIView(RetrieveUpdateDestroyAPIView):
         flag all the groceries to completed"""
         data = request.data
         store_id = kwargs['id']
-        store = get_object_or_404(Store, pk=store_id)
+        changes = validated_changes(
+            self.get_serializer(), data, ('name', 'is_completed'))
+        is_completed = changes.pop('is_completed', None)
+        if is_completed is not None:
+            changes.update(completion_changes(is_completed))
+        versioned_update(
+                        self.get_queryset(),
+                        store_id,
+                        expected_version(request),
+                        changes
+                        )
+        store = get_object_or_404(self.get_queryset(), pk=store_id)
 
-        for key, value in data.items():
-            # create new grocery
-            if(key == "groceries"):
-                for grocery in value:
+        # create new grocery
+        if "groceries" in data:
+            with transaction.atomic(using=store._state.db):
+                # Keeps archive_batch off the store meanwhile
+                if not self.get_queryset().select_for_update(
+                        no_key=True).filter(pk=store_id).exists():
+                    raise Http404
+                positions = next_positions(
+                    store_id, len(data['groceries']), using=store._state.db)
+                new_groceries = [
                     store.groceries.create(
                                         owner=request.user,
                                         name=grocery['name'],
                                         store_id=store_id,
-                                        is_completed=False
+                                        is_completed=False,
+                                        position=position
                                         )
-            # set attribute
-            else:
-                setattr(store, key, value)
-        store.save()
-
-        if "is_completed" in data.keys() and data['is_completed']:
-            groceries = store.groceries.all()
-            if groceries:
-                for grocery in groceries:
-                    setattr(grocery, 'is_completed', True)
-                    grocery.save()
+                    for grocery, position in zip(data['groceries'], positions)
+                ]
+            record_groceries(request.user, new_groceries)
 
-        return Response(
+        if is_completed:
+            now = timezone.now()
+            Grocery.objects.filter(
+                store_id=store_id,
+                is_completed=False
+            ).update(
+                is_completed=True,
+                completed_at=now,
+                version=F('version') + 1,
+                updated_at=now
+            )
+
+        res = Response(
                         data=StoreDetailSerializer(store).data,
                         status=status.HTTP_202_ACCEPTED
                         )
+        res['ETag'] = etag(store.version)
+        return res
+
+
+class StoreDuplicateAPIView(ShardMixin, GenericAPIView):
+    """Copy a store with its groceries, reset to incomplete"""
+    serializer_class = DuplicateStoreSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        """Duplicate the store, optionally under a new name"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        store = get_object_or_404(
+            Store.objects.filter(owner=request.user), pk=kwargs['id'])
+        new_store, groceries = clone_store(
+            store, serializer.validated_data.get('name'))
+        record_groceries(request.user, groceries)
+        return Response(
+                        data=StoreDetailSerializer(new_store).data,
+                        status=status.HTTP_201_CREATED
+                        )
+
+
+class RecurringStoreAPIView(ShardMixin, GenericAPIView):
+    """Get, set or remove the recurring copy schedule of a store"""
+    serializer_class = RecurringStoreSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_store(self):
+        return get_object_or_404(
+            Store.objects.filter(owner=self.request.user),
+            pk=self.kwargs['id']
+        )
 
+    def get(self, request, *args, **kwargs):
+        """Return the schedule"""
+        recurrence = get_object_or_404(
+            RecurringStore, store=self.get_store())
+        return Response(data=self.get_serializer(recurrence).data)
 
-class GroceryCreateAPIView(CreateAPIView):
+    def put(self, request, *args, **kwargs):
+        """Create or replace the schedule. The first copy is made after
+        interval_days unless next_run_at is given"""
+        store = self.get_store()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        data.setdefault(
+            'next_run_at',
+            timezone.now() + timedelta(days=data['interval_days'])
+        )
+        recurrence, _ = RecurringStore.objects.update_or_create(
+            store=store, defaults=data)
+        return Response(
+                        data=self.get_serializer(recurrence).data,
+                        status=status.HTTP_200_OK
+                        )
+
+    def delete(self, request, *args, **kwargs):
+        """Stop copying the store"""
+        RecurringStore.objects.filter(store=self.get_store()).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class GroceryCreateAPIView(ShardMixin, CreateAPIView):
     """View for create new Grocery"""
     serializer_class = GrocerySerializer
     permission_classes = (permissions.IsAuthenticated, IsOwner,)
 
     def post(self, request, *args, **kwargs):
-        """Create Grocery and add to the store"""
+        """Create Grocery and add to the store, on the store owner's
+        shard so sharees add to stores shared from other shards"""
         data = request.data
-        stores = Store.objects.filter(Q(id=data['store_id']))
-        if stores:
-            store = stores[0]
-            grocery = store.groceries.create(
-                                            owner=request.user,
-                                            name=data['name'],
-                                            store_id=data['store_id']
-                                        )
+        found = shard_of_store(data['store_id'], request.user)
+        if found is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        alias, owner_id = found
+        if owner_id != request.user.id and shard_state(owner_id)[1]:
+            raise ShardMoving()
+        # The store stays locked until the grocery is in, so
+        # archive_batch cannot move it meanwhile
+        with transaction.atomic(using=alias):
+            store = Store.objects.using(alias).select_for_update(
+                no_key=True).filter(id=data['store_id']).first()
+            if store is not None:
+                position, = next_positions(store.id, 1, using=alias)
+                grocery = store.groceries.create(
+                                                owner=request.user,
+                                                name=data['name'],
+                                                store_id=data['store_id'],
+                                                position=position
+                                            )
+        if store is not None:
+            record_groceries(request.user, [grocery])
             return Response(
                             data=GrocerySerializer(grocery).data,
                             status=status.HTTP_201_CREATED
@@ -123,20 +314,7 @@ class GroceryCreateAPIView(CreateAPIView):
             return Response(status=status.HTTP_404_NOT_FOUND)
 
 
-def is_store_completed(store):
-    is_store_completed = True
-    groceries = store.groceries.all()
-    if not groceries:
-        is_store_completed = False
-    else:
-        for groceryItem in groceries:
-            if not groceryItem.is_completed:
-                is_store_completed = False
-
-    return is_store_completed
-
-
-class GroceryDetailAPIView(RetrieveUpdateDestroyAPIView):
+class GroceryDetailAPIView(ShardMixin, RetrieveUpdateDestroyAPIView):
     """View for Grocery Detail: put, patch, delete"""
     serializer_class = GrocerySerializer
     permission_classes = (permissions.IsAuthenticated, IsOwner,)
@@ -147,6 +325,12 @@ class GroceryDetailAPIView(RetrieveUpdateDestroyAPIView):
         """Retrive Grocery Detail"""
         return self.queryset.filter(owner=self.request.user)
 
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve Grocery Detail with its version as ETag"""
+        res = super().retrieve(request, *args, **kwargs)
+        res['ETag'] = etag(res.data['version'])
+        return res
+
     def update(self, request, *args, **kwargs):
         """Put/Update Grocery Detail. Copy patch method"""
         res = self.partial_update(request, *args, **kwargs)
@@ -157,35 +341,250 @@ class GroceryDetailAPIView(RetrieveUpdateDestroyAPIView):
         the store are completed. Then turn store in_completed to True"""
         data = request.data
         grocery_id = kwargs['id']
-        grocery = get_object_or_404(Grocery, pk=grocery_id)
-        for key, value in data.items():
-            setattr(grocery, key, value)
-        grocery.save()
-        store = get_object_or_404(Store, pk=grocery.store_id)
-        store_completed = is_store_completed(store)
-        setattr(store, "is_completed", store_completed)
-        store.save()
+        changes = validated_changes(
+            self.get_serializer(), data, ('name', 'qty', 'is_completed'))
+        is_completed = changes.pop('is_completed', None)
+        if is_completed is not None:
+            changes.update(completion_changes(is_completed))
+        versioned_update(
+                        self.get_queryset(),
+                        grocery_id,
+                        expected_version(request),
+                        changes
+                        )
+        grocery = get_object_or_404(self.get_queryset(), pk=grocery_id)
+        store_completed = refresh_store_completion(grocery.store_id)
         grocery_serialized_data = GrocerySerializer(grocery).data
         grocery_serialized_data['is_store_completed'] = store_completed
-        return Response(
+        res = Response(
                         data=grocery_serialized_data,
                         status=status.HTTP_202_ACCEPTED
                         )
+        res['ETag'] = etag(grocery.version)
+        return res
 
     def delete(self, request, *args, **kwargs):
-        """Delete Grocery obj / Check all od the groceries
+        """Soft delete Grocery obj / Check all od the groceries
         at the store are completed"""
         grocery_id = kwargs['id']
-        grocery = get_object_or_404(Grocery, pk=grocery_id)
-        store = get_object_or_404(Store, pk=grocery.store_id)
-        grocery.delete()
-        store_completed = is_store_completed(store)
-        if store.is_completed != store_completed:
-            setattr(
-                    store,
-                    "is_completed",
-                    is_store_completed(store)
-                    )
-            store.save()
+        grocery = get_object_or_404(self.get_queryset(), pk=grocery_id)
+        versioned_update(
+                        self.get_queryset(),
+                        grocery_id,
+                        expected_version(request),
+                        {'deleted_at': timezone.now()}
+                        )
+        refresh_store_completion(grocery.store_id)
 
         return Response(status=status.HTTP_200_OK)
+
+
+class GroceryMoveAPIView(ShardMixin, GenericAPIView):
+    """Reorder a Grocery within its store"""
+    serializer_class = MoveGrocerySerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_queryset(self):
+        return Grocery.objects.filter(owner=self.request.user)
+
+    def post(self, request, *args, **kwargs):
+        """Place the grocery right after the grocery `after`, first if
+        null. Only the moved grocery's row is updated."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        grocery = get_object_or_404(self.get_queryset(), pk=kwargs['id'])
+        alias = grocery._state.db
+        after_id = serializer.validated_data['after']
+        after = None
+        if after_id is not None:
+            after = Grocery.objects.using(alias).filter(
+                id=after_id, store_id=grocery.store_id).first()
+            if after is None or after.id == grocery.id:
+                raise ValidationError(
+                    {'after': ['Not another grocery of this store.']})
+        try:
+            position = position_after(grocery, after, alias)
+        except ValueError:
+            raise PositionConflict()
+        versioned_update(
+                        self.get_queryset(),
+                        grocery.id,
+                        expected_version(request),
+                        {'position': position}
+                        )
+        grocery = get_object_or_404(self.get_queryset(), pk=grocery.id)
+        res = Response(
+                        data=GrocerySerializer(grocery).data,
+                        status=status.HTTP_202_ACCEPTED
+                        )
+        res['ETag'] = etag(grocery.version)
+        return res
+
+
+def get_limit(request, default, maximum):
+    """Read ?limit= clamped to 1..maximum"""
+    try:
+        limit = int(request.query_params.get('limit', ''))
+    except ValueError:
+        return default
+    return max(1, min(limit, maximum))
+
+
+class SearchAPIView(GenericAPIView):
+    """Search store and grocery names across owned and shared stores"""
+    permission_classes = (permissions.IsAuthenticated,)
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        """Return ranked stores and groceries matching ?q="""
+        stores, groceries = search(
+                                    request.user,
+                                    request.query_params.get('q', ''),
+                                    get_limit(request, self.default_limit,
+                                              self.max_limit)
+                                )
+        return Response(
+                        data={
+                            'stores': StoreSearchSerializer(
+                                stores, many=True).data,
+                            'groceries': GrocerySerializer(
+                                groceries, many=True).data,
+                        },
+                        status=status.HTTP_200_OK
+                        )
+
+
+class ShoppingListAPIView(GenericAPIView):
+    """Everything left to buy, merged across owned and shared stores.
+    Not served from replicas, shopping_list reads each shard directly."""
+    permission_classes = (permissions.IsAuthenticated,)
+    default_limit = 200
+    max_limit = 500
+
+    def get(self, request, *args, **kwargs):
+        """Return incomplete groceries grouped by name with summed qty,
+        a page of ?limit= names. next is the ?after= of the next page,
+        null on the last one."""
+        limit = get_limit(request, self.default_limit, self.max_limit)
+        groceries = shopping_list(
+            request.user, limit, request.query_params.get('after'))
+        return Response(
+                        data={
+                            'groceries': ShoppingListItemSerializer(
+                                groceries, many=True).data,
+                            'next': (groceries[-1]['key']
+                                     if len(groceries) == limit else None),
+                        },
+                        status=status.HTTP_200_OK
+                        )
+
+
+class AnalyticsAPIView(ShardMixin, ReplicaReadMixin, GenericAPIView):
+    """Shopping analytics of the user, read from the rollup tables
+    maintained by the rollup_analytics command"""
+    permission_classes = (permissions.IsAuthenticated,)
+    weeks = 12
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        """Return the completion rate, the weekly trend and the most
+        bought groceries (top ?limit=)"""
+        items = ItemStats.objects.filter(owner=request.user)
+        totals = items.aggregate(
+            added=Sum('added'), completed=Sum('completed'))
+        added = totals['added'] or 0
+        completed = totals['completed'] or 0
+        today = timezone.localdate()
+        since = today - timedelta(
+            days=today.weekday(), weeks=self.weeks - 1)
+        weekly = WeeklyStats.objects.filter(
+            owner=request.user, week__gte=since).order_by('week')
+        top = items.filter(completed__gt=0).order_by(
+            '-completed', 'name')[:get_limit(
+                request, self.default_limit, self.max_limit)]
+        return Response(
+                        data={
+                            'added': added,
+                            'completed': completed,
+                            'completion_rate': (
+                                completed / added if added else None),
+                            'weekly': WeeklyStatsSerializer(
+                                weekly, many=True).data,
+                            'top_items': ItemStatsSerializer(
+                                top, many=True).data,
+                        },
+                        status=status.HTTP_200_OK
+                        )
+
+
+class SuggestionAPIView(ShardMixin, GenericAPIView):
+    """Suggest grocery names from the user's history"""
+    permission_classes = (permissions.IsAuthenticated,)
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        """Return the most used grocery names starting with ?q="""
+        names = suggest(
+                        request.user,
+                        request.query_params.get('q', ''),
+                        get_limit(request, self.default_limit, self.max_limit)
+                        )
+        return Response(
+                        data={'suggestions': names},
+                        status=status.HTTP_200_OK
+                        )
+
+
+class ArchivePagination(CursorPagination):
+    """Keyset pagination over archived stores, newest first"""
+    ordering = '-id'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class ArchivedStoreListAPIView(ShardMixin, ReplicaReadMixin, ListAPIView):
+    """Browse the user's archived stores"""
+    serializer_class = ArchivedStoreSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = ArchivePagination
+
+    def get_queryset(self):
+        return ArchivedStore.objects.filter(
+            owner=self.request.user
+        ).prefetch_related('groceries')
+
+
+class ArchivedStoreDetailAPIView(
+        ShardMixin, ReplicaReadMixin, RetrieveAPIView):
+    """Retrieve an archived store"""
+    serializer_class = ArchivedStoreSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    lookup_field = "id"
+
+    def get_queryset(self):
+        return ArchivedStore.objects.filter(owner=self.request.user)
+
+
+class ArchivedStoreRestoreAPIView(ShardMixin, GenericAPIView):
+    """Move an archived store back to the store list"""
+    permission_classes = (permissions.IsAuthenticated,)
+    serializer_class = StoreDetailSerializer
+    lookup_field = "id"
+
+    def get_queryset(self):
+        return ArchivedStore.objects.filter(owner=self.request.user)
+
+    def post(self, request, *args, **kwargs):
+        """Restore the archived store with its groceries"""
+        try:
+            store = archive.restore(self.get_object())
+        except ArchivedStore.DoesNotExist:
+            raise Http404
+        return Response(
+                        data=StoreDetailSerializer(store).data,
+                        status=status.HTTP_201_CREATED
+                        )
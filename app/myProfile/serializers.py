@@ -28,3 +28,8 @@ class MyProfileSerializer(serializers.ModelSerializer):
         model = MyProfile
         fields = ['id', 'friends']
         read_only_fields = ['id']
+
+
+class AddFriendSerializer(serializers.Serializer):
+    """Serializer for adding a friend by user id"""
+    id = serializers.IntegerField()
@@ -0,0 +1,112 @@
+"""
+Tests for the friends API.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+
+from core.models import MyProfile
+
+from .test_my_profile_setup import MyProfileAPITestSetup
+
+
+class FriendAPITests(MyProfileAPITestSetup):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        self.friend = self.create_user(
+                                        email='friend@example.com',
+                                        username='friend'
+                                    )
+        self.client.force_authenticate(user=self.user)
+
+    def add_friends(self, owner, *friends):
+        profile, _ = MyProfile.objects.get_or_create(owner=owner)
+        profile.friends.add(*friends)
+
+    def test_auth_required(self):
+        """Test auth is required to call API."""
+        self.client.logout()
+        res = self.client.get(self.friends_url)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_add_friend(self):
+        """Test adding a friend creates the profile on first use."""
+        res = self.client.post(
+            self.friends_url, {'id': self.friend.id}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['username'], self.friend.username)
+        profile = MyProfile.objects.get(owner=self.user)
+        self.assertEqual(list(profile.friends.all()), [self.friend])
+
+    def test_one_profile_per_owner(self):
+        """Test adding friends reuses the profile and a second profile
+        cannot be created."""
+        for friend in (self.friend, self.create_user(
+                email='other@example.com', username='other')):
+            self.client.post(
+                self.friends_url, {'id': friend.id}, format='json')
+
+        profile = MyProfile.objects.get(owner=self.user)
+        self.assertEqual(profile.friends.count(), 2)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            MyProfile.objects.create(owner=self.user)
+
+    def test_add_friend_errors(self):
+        """Test adding yourself or an unknown user fails."""
+        res = self.client.post(
+            self.friends_url, {'id': self.user.id}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.post(
+            self.friends_url, {'id': self.friend.id + 100}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_friends_paginated(self):
+        """Test friends are listed in pages with one query per page."""
+        friends = [
+            self.create_user(
+                email='friend%d@example.com' % i,
+                username='friend%d' % i
+            )
+            for i in range(3)
+        ]
+        self.add_friends(self.user, *friends)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(self.friends_url, {'page_size': 2})
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [f['id'] for f in res.data['results']],
+            [friends[0].id, friends[1].id]
+        )
+        res = self.client.get(res.data['next'])
+        self.assertEqual(
+            [f['id'] for f in res.data['results']], [friends[2].id])
+        self.assertIsNone(res.data['next'])
+
+    def test_remove_friend(self):
+        """Test removing a friend keeps the user."""
+        self.add_friends(self.user, self.friend)
+        res = self.client.delete(self.friend_url(self.friend.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.get(self.friends_url)
+        self.assertEqual(res.data['results'], [])
+        res = self.client.delete(self.friend_url(self.friend.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_mutual_friends(self):
+        """Test mutual friends is the intersection of both lists."""
+        mutual = self.create_user(
+                                    email='mutual@example.com',
+                                    username='mutual'
+                                )
+        mine = self.create_user(email='mine@example.com', username='mine')
+        self.add_friends(self.user, mutual, mine, self.friend)
+        self.add_friends(self.friend, mutual)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(self.mutual_friends_url(self.friend.id))
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(
+            [f['id'] for f in res.data['results']], [mutual.id])
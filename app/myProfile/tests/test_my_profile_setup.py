@@ -0,0 +1,37 @@
+"""
+Setup for the MyProfile API test.
+"""
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework.test import APITestCase
+
+
+class MyProfileAPITestSetup(APITestCase):
+
+    def setUp(self):
+        self.friends_url = reverse('myProfile:friends')
+        return super().setUp()
+
+    def tearDown(self):
+        return super().tearDown()
+
+    def create_user(self, **params):
+        """Create and return user."""
+        defaults = {
+            'email': "email@gamil.com",
+            'password': "testpassword",
+            'username': "testname"
+        }
+        defaults.update(params)
+        user = get_user_model().objects.create_user(**defaults)
+        user.is_verified = True
+        return user
+
+    def friend_url(self, user_id):
+        """Create and return a friend detail URL."""
+        return reverse('myProfile:friend', args=[user_id])
+
+    def mutual_friends_url(self, user_id):
+        """Create and return a mutual friends URL."""
+        return reverse('myProfile:mutual-friends', args=[user_id])
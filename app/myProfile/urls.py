@@ -0,0 +1,23 @@
+"""
+URL mappings for the MyProfile API.
+"""
+from django.urls import path
+
+from myProfile import views
+
+
+app_name = 'myProfile'
+
+urlpatterns = [
+    path('friends/', views.FriendListAPIView.as_view(), name='friends'),
+    path(
+        'friends/<int:id>/',
+        views.FriendDetailAPIView.as_view(),
+        name='friend'
+        ),
+    path(
+        'friends/<int:id>/mutual/',
+        views.MutualFriendListAPIView.as_view(),
+        name='mutual-friends'
+        ),
+]
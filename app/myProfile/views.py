@@ -1,3 +1,90 @@
-from django.shortcuts import render # noqa
+"""
+Views for the MyProfile friends API
+"""
+from django.contrib.auth import get_user_model
+from django.shortcuts import get_object_or_404
 
-# Create your views here.
+from rest_framework import permissions, status
+from rest_framework.generics import GenericAPIView, ListAPIView
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from core.models import MyProfile
+
+from .serializers import AddFriendSerializer, FriendSerializer
+
+
+def friend_ids(owner_id):
+    """Subquery of the ids a user has added as friends"""
+    return MyProfile.friends.through.objects.filter(
+        myprofile__owner_id=owner_id
+    ).values('user_id')
+
+
+def get_profile(user):
+    """Return the user's profile, creating it on first use. The unique
+    owner makes concurrent first uses share one profile."""
+    return MyProfile.objects.get_or_create(owner=user)[0]
+
+
+class FriendPagination(CursorPagination):
+    """Keyset pagination, no COUNT or OFFSET for long friend lists"""
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class FriendListAPIView(ListAPIView):
+    """List and add friends"""
+    serializer_class = FriendSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = FriendPagination
+
+    def get_queryset(self):
+        return get_user_model().objects.filter(
+            id__in=friend_ids(self.request.user.id)
+        ).only('id', 'username', 'email')
+
+    def post(self, request, *args, **kwargs):
+        """Add a user to the friends list"""
+        serializer = AddFriendSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        friend_id = serializer.validated_data['id']
+        if friend_id == request.user.id:
+            return Response(
+                {'error': ['You cannot add yourself as a friend.']},
+                status=status.HTTP_400_BAD_REQUEST
+                )
+        friend = get_object_or_404(get_user_model(), pk=friend_id)
+        get_profile(request.user).friends.add(friend)
+        return Response(
+                        data=FriendSerializer(friend).data,
+                        status=status.HTTP_201_CREATED
+                        )
+
+
+class FriendDetailAPIView(GenericAPIView):
+    """Remove a friend"""
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def delete(self, request, *args, **kwargs):
+        """Delete the friendship, not the user"""
+        friend_id = kwargs['id']
+        deleted, _ = MyProfile.friends.through.objects.filter(
+            myprofile__owner=request.user,
+            user_id=friend_id
+        ).delete()
+        if not deleted:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(data={'id': friend_id}, status=status.HTTP_200_OK)
+
+
+class MutualFriendListAPIView(FriendListAPIView):
+    """List friends shared with another user"""
+    http_method_names = ['get', 'head', 'options']
+
+    def get_queryset(self):
+        return super().get_queryset().filter(
+            id__in=friend_ids(self.kwargs['id'])
+        )
@@ -11,6 +11,9 @@ from django.core.exceptions import ValidationError
 from django.utils.http import urlsafe_base64_decode
 from django.utils.encoding import force_str
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.urls import reverse
+
+from core.models import AccountDeletion, DataExport
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -134,6 +137,31 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
+class AccountDeletionSerializer(serializers.ModelSerializer):
+    """Serializer for the progress of an account deletion"""
+
+    class Meta:
+        model = AccountDeletion
+        fields = ['id', 'status', 'deleted', 'created_at', 'finished_at']
+        read_only_fields = fields
+
+
+class DataExportSerializer(serializers.ModelSerializer):
+    """Serializer for a data export, with its download link once done"""
+    download = serializers.SerializerMethodField()
+
+    class Meta:
+        model = DataExport
+        fields = ['id', 'status', 'size', 'created_at', 'finished_at',
+                  'download']
+        read_only_fields = fields
+
+    def get_download(self, obj):
+        if obj.status != DataExport.DONE:
+            return None
+        return reverse('user:data-export-download', kwargs={'id': obj.id})
+
+
 class RequestPasswordResetSerializer(serializers.Serializer):
     """Serializer for request password reset"""
 
@@ -0,0 +1,53 @@
+"""
+Background tasks of the user app.
+
+Email tasks are queued with the user id only, the tokens in the links
+are made when the email is sent so they are never stored in Task.args.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.urls import reverse
+from django.utils.encoding import smart_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.taskqueue import task
+
+from .utils import Util
+
+
+@task(max_attempts=5)
+def email_verification(user_id, domain):
+    """Send the link verifying a user's email"""
+    user = get_user_model().objects.get(id=user_id)
+    token = RefreshToken.for_user(user).access_token
+    absurl = 'http://' + domain + reverse('user:verify-email') + \
+        '?token=' + str(token)
+    Util.send_email({
+        'domain': absurl,
+        'email_subject': 'Verify your email',
+        'email_body': 'Hi ' + user.username +
+                      ' Use link below to verify your email \n' +
+                      'domain: ' + absurl,
+        'email_to': [user.email],
+    })
+
+
+@task(max_attempts=5)
+def email_password_reset(user_id, domain, redirect_url):
+    """Send the link resetting a user's password"""
+    user = get_user_model().objects.get(id=user_id)
+    uidb64 = urlsafe_base64_encode(smart_bytes(user.id))
+    token = PasswordResetTokenGenerator().make_token(user)
+    absurl = 'http://' + domain + reverse(
+        'user:validate-password-reset',
+        kwargs={'uidb64': uidb64, 'token': token}
+    )
+    Util.send_email({
+        'email_body': 'Hello, \n' +
+                      'Use link below to reset your password  \n' +
+                      absurl + '?redirect_url=' + redirect_url,
+        'email_to': [user.email],
+        'email_subject': 'Reset your passsword',
+    })
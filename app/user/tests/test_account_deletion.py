@@ -0,0 +1,158 @@
+"""
+Tests for deleting an account.
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.accounts import delete_account, request_deletion
+from core.models import AccountDeletion, Grocery, MyProfile, Store, Task
+from core.sharding import shard_aliases
+
+from .test_setup import UserAPITestSetup
+
+ME_URL = reverse('user:me')
+
+
+def create_user(email, username):
+    return get_user_model().objects.create_user(
+        email=email, username=username, password='testpass123')
+
+
+def create_store(user, name, groceries):
+    store = Store.objects.create(owner=user, name=name)
+    for index in range(groceries):
+        Grocery.objects.create(
+            owner=user, store_id=store.id, name='item %d' % index)
+    return store
+
+
+class AccountDeletionAPITests(UserAPITestSetup):
+    """Test deleting the authenticated user's account."""
+
+    databases = '__all__'
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_user('gone@example.com', 'gone')
+        self.friend = create_user('friend@example.com', 'friend')
+        self.store = create_store(self.user, 'Market', 3)
+        self.store.shares.add(self.friend)
+        self.shared = create_store(self.friend, 'Shared', 1)
+        self.shared.shares.add(self.user)
+        profile = MyProfile.objects.create(owner=self.user)
+        profile.friends.add(self.friend)
+        MyProfile.objects.create(owner=self.friend).friends.add(self.user)
+        self.client.force_authenticate(self.user)
+
+    def test_delete_deactivates_and_queues(self):
+        """Test the user is deactivated at once and the data kept until
+        the task runs."""
+        res = self.client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['status'], AccountDeletion.PENDING)
+        self.assertEqual(res['Location'], reverse(
+            'user:account-deletion', kwargs={'id': res.data['id']}))
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertTrue(Store.objects.filter(id=self.store.id).exists())
+
+    def test_delete_removes_data(self):
+        """Test the task deletes the user and their rows, not others'."""
+        res = self.client.delete(ME_URL)
+        self.run_tasks()
+
+        self.assertFalse(
+            get_user_model().objects.filter(id=self.user.id).exists())
+        self.assertFalse(MyProfile.objects.filter(owner=self.user).exists())
+        self.assertFalse(
+            MyProfile.objects.get(owner=self.friend).friends.exists())
+        for alias in shard_aliases():
+            self.assertFalse(Store.all_objects.using(alias).filter(
+                owner_id=self.user.id).exists())
+            self.assertFalse(Grocery.all_objects.using(alias).filter(
+                owner_id=self.user.id).exists())
+        self.shared.refresh_from_db()
+        self.assertFalse(self.shared.shares.exists())
+        self.assertEqual(Grocery.objects.using(self.shared._state.db).filter(
+            store_id=self.shared.id).count(), 1)
+
+        self.client.force_authenticate(None)
+        res = self.client.get(res['Location'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['status'], AccountDeletion.DONE)
+        self.assertEqual(res.data['deleted']['groceries'], 3)
+        self.assertEqual(res.data['deleted']['stores'], 1)
+        self.assertEqual(res.data['deleted']['shares'], 1)
+        self.assertEqual(res.data['deleted']['friends'], 2)
+        self.assertIsNotNone(res.data['finished_at'])
+
+    def test_delete_twice_reuses_deletion(self):
+        """Test asking again before the task ran queues nothing new."""
+        first = request_deletion(self.user)
+        second = request_deletion(self.user)
+
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(AccountDeletion.objects.count(), 1)
+
+    def test_failed_deletion_retried(self):
+        """Test a deletion whose task gave up is failed, then finished
+        when retried from the admin."""
+        self.client.delete(ME_URL)
+        Task.objects.update(max_attempts=1)
+        with patch('core.accounts.batches', side_effect=OSError), \
+                self.assertLogs('core.taskqueue', 'WARNING') as logs:
+            self.run_tasks()
+        self.assertIn('core.tasks.delete_account failed', logs.output[0])
+        self.assertIn('OSError', logs.output[0])
+        deletion = AccountDeletion.objects.get()
+        self.assertEqual(deletion.status, AccountDeletion.FAILED)
+
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='testpass123',
+            username='admin')
+        self.client.force_login(admin)
+        self.client.post(
+            reverse('admin:core_accountdeletion_changelist'),
+            {'action': 'retry', '_selected_action': [deletion.id]})
+        self.run_tasks()
+
+        deletion.refresh_from_db()
+        self.assertEqual(deletion.status, AccountDeletion.DONE)
+        self.assertFalse(
+            get_user_model().objects.filter(id=self.user.id).exists())
+
+
+class DeleteAccountTests(APITestCase):
+    """Test the batched deletion itself."""
+
+    databases = '__all__'
+
+    def test_small_batches(self):
+        """Test every row goes whatever the batch size."""
+        user = create_user('batch@example.com', 'batch')
+        create_store(user, 'One', 5)
+        create_store(user, 'Two', 2)
+        deletion = AccountDeletion.objects.create(user_id=user.id)
+
+        delete_account(deletion.id, batch_size=2)
+
+        deletion.refresh_from_db()
+        self.assertEqual(deletion.status, AccountDeletion.DONE)
+        self.assertEqual(deletion.deleted['groceries'], 7)
+        self.assertEqual(deletion.deleted['stores'], 2)
+        self.assertFalse(get_user_model().objects.filter(id=user.id).exists())
+
+    def test_unknown_deletion(self):
+        """Test the progress of an unknown deletion is not found."""
+        res = self.client.get(reverse(
+            'user:account-deletion',
+            kwargs={'id': '00000000-0000-0000-0000-000000000000'}))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,188 @@
+"""
+Tests for the personal data export.
+"""
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+from zipfile import ZipFile
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.exports import purge_expired, write_archive
+from core.models import DataExport, Grocery, MyProfile, Store, Task
+
+from .test_setup import UserAPITestSetup
+
+EXPORT_URL = reverse('user:request-data-export')
+
+
+def create_user(email, username):
+    return get_user_model().objects.create_user(
+        email=email, username=username, password='testpass123')
+
+
+def read_lines(archive, name):
+    return [json.loads(line) for line in archive.read(name).splitlines()]
+
+
+class DataExportTestSetup(APITestCase):
+
+    databases = '__all__'
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+        self.user = create_user('export@example.com', 'exporter')
+        self.friend = create_user('friend@example.com', 'friend')
+        self.store = Store.objects.create(owner=self.user, name='Market')
+        self.store.shares.add(self.friend)
+        for name in ['Milk', 'Eggs']:
+            Grocery.objects.create(
+                owner=self.user, store_id=self.store.id, name=name)
+        deleted = Grocery.objects.create(
+            owner=self.user, store_id=self.store.id, name='Gone')
+        deleted.soft_delete()
+        MyProfile.objects.create(owner=self.user).friends.add(self.friend)
+
+
+class WriteArchiveTests(DataExportTestSetup):
+    """Test the archive contents."""
+
+    def test_archive_contents(self):
+        """Test the archive holds the user's live rows."""
+        buffer = io.BytesIO()
+
+        counts = write_archive(self.user, buffer, chunk_size=1)
+
+        archive = ZipFile(buffer)
+        profile = json.loads(archive.read('profile.json'))
+        self.assertEqual(profile['email'], self.user.email)
+        stores = read_lines(archive, 'stores.jsonl')
+        self.assertEqual([store['name'] for store in stores], ['Market'])
+        groceries = read_lines(archive, 'groceries.jsonl')
+        self.assertEqual(
+            sorted(grocery['name'] for grocery in groceries),
+            ['Eggs', 'Milk'])
+        self.assertEqual(read_lines(archive, 'shares.jsonl'), [
+            {'store_id': self.store.id, 'user_id': self.friend.id}])
+        self.assertEqual(read_lines(archive, 'friends.jsonl'), [
+            {'id': self.friend.id, 'username': 'friend'}])
+        self.assertEqual(counts['groceries.jsonl'], 2)
+
+
+class DataExportAPITests(DataExportTestSetup, UserAPITestSetup):
+    """Test asking for and downloading an export."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def test_export_and_download(self):
+        """Test the export is built in the background then downloaded."""
+        res = self.client.post(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['status'], DataExport.PENDING)
+        self.assertIsNone(res.data['download'])
+        location = res['Location']
+
+        self.run_tasks()
+        res = self.client.get(location)
+
+        self.assertEqual(res.data['status'], DataExport.DONE)
+        self.assertGreater(res.data['size'], 0)
+        res = self.client.get(res.data['download'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/zip')
+        archive = ZipFile(io.BytesIO(b''.join(res.streaming_content)))
+        self.assertIn('groceries.jsonl', archive.namelist())
+
+    def test_pending_export_reused(self):
+        """Test asking again before the export is built queues nothing."""
+        first = self.client.post(EXPORT_URL)
+        second = self.client.post(EXPORT_URL)
+
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertEqual(DataExport.objects.count(), 1)
+
+    def test_failed_export_can_be_asked_again(self):
+        """Test an export whose task gave up is failed and replaced."""
+        first = self.client.post(EXPORT_URL)
+        Task.objects.update(max_attempts=1)
+        with patch('core.exports.write_archive', side_effect=OSError), \
+                self.assertLogs('core.taskqueue', 'WARNING') as logs:
+            self.run_tasks()
+        self.assertIn('core.tasks.export_data failed', logs.output[0])
+        self.assertIn('OSError', logs.output[0])
+
+        res = self.client.get(first['Location'])
+        self.assertEqual(res.data['status'], DataExport.FAILED)
+
+        second = self.client.post(EXPORT_URL)
+        self.assertEqual(second.status_code, status.HTTP_202_ACCEPTED)
+        self.assertNotEqual(second.data['id'], first.data['id'])
+
+    def test_export_requests_throttled(self):
+        """Test a user cannot queue archive builds back to back."""
+        for _ in range(3):
+            self.client.post(EXPORT_URL)
+            self.run_tasks()
+
+        res = self.client.post(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(DataExport.objects.count(), 3)
+
+    def test_download_not_ready(self):
+        """Test an unfinished export cannot be downloaded."""
+        res = self.client.post(EXPORT_URL)
+        url = reverse(
+            'user:data-export-download', kwargs={'id': res.data['id']})
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_other_users_export_hidden(self):
+        """Test users cannot see the exports of others."""
+        res = self.client.post(EXPORT_URL)
+        self.run_tasks()
+        self.client.force_authenticate(self.friend)
+
+        self.assertEqual(
+            self.client.get(res['Location']).status_code,
+            status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            self.client.get(reverse(
+                'user:data-export-download', kwargs={'id': res.data['id']}
+            )).status_code,
+            status.HTTP_404_NOT_FOUND)
+
+    @override_settings(DATA_EXPORT_DAYS=7)
+    def test_purge_expired(self):
+        """Test old exports and their archives are deleted."""
+        self.client.post(EXPORT_URL)
+        self.run_tasks()
+        export = DataExport.objects.get()
+        path = export.file.path
+
+        self.assertEqual(purge_expired(timezone.now()), 0)
+        self.assertEqual(
+            purge_expired(timezone.now() + timedelta(days=8)), 1)
+        self.assertFalse(DataExport.objects.exists())
+        self.assertFalse(export.file.storage.exists(path))
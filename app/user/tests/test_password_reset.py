@@ -11,6 +11,8 @@ from django.utils.http import urlsafe_base64_encode
 
 from rest_framework import status
 
+from core.models import Task
+
 
 class PasswordResetTests(UserAPITestSetup):
     """Test Password reset"""
@@ -44,9 +46,27 @@ class PasswordResetTests(UserAPITestSetup):
             payload,
         )
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.run_tasks()
         self.assertEqual(len(mail.outbox), 2)
         self.assertEqual(mail.outbox[1].subject, 'Reset your passsword')
 
+    def test_reset_token_not_queued(self):
+        """Test the reset task is queued with the user id only and the
+        link it sends is valid"""
+        self.create_user()
+        user = get_user_model().objects.get(email=self.user_data['email'])
+        self.run_tasks()
+
+        self.client.post(self.request_password_reset_url,
+                         {'email': user.email})
+
+        task = Task.objects.get(name='user.tasks.email_password_reset')
+        self.assertEqual(task.args, [user.id, 'testserver', ''])
+        self.run_tasks()
+        link = mail.outbox[-1].body.split('http://testserver')[1]
+        res = self.client.get(link.split('?')[0])
+        self.assertEqual(res.data['message'], 'Credentials Valid')
+
     def test_validate_password_reset_email_with_bad_token_error(self):
         """
         Test error returned when validate resetting password with bad token
@@ -5,13 +5,18 @@ from rest_framework.test import APITestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model # noqa
 from django.core import mail
+from django.core.cache import cache
+from threading import Event
 
 from rest_framework import status
 
+from core import taskqueue
+
 
 class UserAPITestSetup(APITestCase):
 
     def setUp(self):
+        cache.clear()
         self.register_url = reverse('user:register')
         self.login_url = reverse('user:login')
         self.verifyemail_url = reverse('user:verify-email')
@@ -31,6 +36,10 @@ class UserAPITestSetup(APITestCase):
     def tearDown(self):
         return super().tearDown()
 
+    def run_tasks(self):
+        """Run the queued tasks, e.g. send the queued emails."""
+        taskqueue.work(Event(), burst=True)
+
     def create_user(self):
         res = self.client.post(
             self.register_url,
@@ -38,6 +47,7 @@ class UserAPITestSetup(APITestCase):
             format="json"
         )
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.run_tasks()
         self.assertEqual(len(mail.outbox), 1)
         self.assertEqual(mail.outbox[0].subject, 'Verify your email')
 
@@ -0,0 +1,90 @@
+"""
+Tests for the auth endpoint throttles.
+"""
+from unittest.mock import patch
+
+from rest_framework import status
+
+from user.throttling import TokenBucketThrottle
+
+from .test_setup import UserAPITestSetup
+
+
+RATES = {
+    'login_ip': '3/min',
+    'login_email': '2/min',
+    'password_reset_email': '1/hour',
+}
+
+
+@patch.dict(TokenBucketThrottle.THROTTLE_RATES, RATES, clear=True)
+class TokenBucketThrottleTests(UserAPITestSetup):
+    """Test token bucket throttling of the auth endpoints"""
+
+    def login(self, email='someone@example.com', ip='10.0.0.1', **extra):
+        return self.client.post(
+            self.login_url,
+            {'email': email, 'password': 'wrongpassword'},
+            format='json',
+            REMOTE_ADDR=ip,
+            **extra
+        )
+
+    def test_login_throttled_by_email(self):
+        """Test one email is limited whichever IP the requests use."""
+        self.assertEqual(
+            self.login(ip='10.0.0.1').status_code,
+            status.HTTP_401_UNAUTHORIZED
+        )
+        self.login(ip='10.0.0.2')
+        res = self.login(ip='10.0.0.3')
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '30')
+
+    def test_login_throttled_by_ip(self):
+        """Test one IP is limited whichever emails it tries."""
+        for i in range(3):
+            res = self.login(email='user%d@example.com' % i)
+            self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        res = self.login(email='user4@example.com')
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+
+        res = self.login(email='user4@example.com', ip='10.0.0.9')
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_forwarded_for_ignored(self):
+        """Test a client cannot get new buckets by rotating
+        X-Forwarded-For."""
+        for i in range(3):
+            self.login(email='user%d@example.com' % i,
+                       HTTP_X_FORWARDED_FOR='192.0.2.%d' % i)
+        res = self.login(email='user4@example.com',
+                         HTTP_X_FORWARDED_FOR='192.0.2.99')
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_bucket_refills(self):
+        """Test tokens come back at the configured rate."""
+        with patch.object(TokenBucketThrottle, 'timer', return_value=1000):
+            self.login()
+            self.login()
+            res = self.login()
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        with patch.object(TokenBucketThrottle, 'timer', return_value=1031):
+            res = self.login()
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_email_is_case_insensitive(self):
+        """Test the email bucket ignores case and whitespace."""
+        self.client.post(
+            self.request_password_reset_url, {'email': 'A@example.com'})
+        res = self.client.post(
+            self.request_password_reset_url, {'email': ' a@EXAMPLE.com'})
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_unconfigured_scope_not_throttled(self):
+        """Test endpoints without a configured rate are not limited."""
+        for _ in range(5):
+            res = self.client.post(self.register_url, {})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,107 @@
+"""
+Tests for the user search API.
+"""
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from user.throttling import UserSearchThrottle
+
+
+class UserSearchAPITests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.search_url = reverse('user:search')
+        self.user = self.create_user('me@example.com', 'mary')
+        self.client.force_authenticate(user=self.user)
+        return super().setUp()
+
+    def create_user(self, email, username):
+        return get_user_model().objects.create_user(
+            email=email,
+            username=username,
+            password='testpassword'
+        )
+
+    def test_auth_required(self):
+        """Test auth is required to call API."""
+        self.client.logout()
+        res = self.client.get(self.search_url, {'q': 'ma'})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_search_by_username_and_email_prefix(self):
+        """Test case-insensitive prefix match on username or email."""
+        mark = self.create_user('mark@example.com', 'mark')
+        maria = self.create_user('Maria.L@example.com', 'lopez')
+        self.create_user('anna@example.com', 'annamaria')
+
+        res = self.client.get(self.search_url, {'q': 'MAR'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data['results'],
+            [
+                {'id': maria.id, 'username': 'lopez',
+                 'email': 'Maria.L@example.com'},
+                {'id': mark.id, 'username': 'mark',
+                 'email': 'mark@example.com'},
+            ]
+        )
+
+    def test_short_query_returns_nothing(self):
+        """Test one character queries do not hit the database."""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(self.search_url, {'q': 'm'})
+        self.assertEqual(res.data['results'], [])
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_results_capped_and_cached(self):
+        """Test results are capped and repeated prefixes are cached."""
+        for i in range(12):
+            self.create_user('max%d@example.com' % i, 'max%d' % i)
+        res = self.client.get(self.search_url, {'q': 'max'})
+        self.assertEqual(len(res.data['results']), 10)
+
+        with CaptureQueriesContext(connection) as ctx:
+            cached = self.client.get(self.search_url, {'q': 'Max'})
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(cached.data, res.data)
+
+    @patch.dict(UserSearchThrottle.THROTTLE_RATES, {'user_search': '2/min'})
+    def test_search_throttled(self):
+        """Test typeahead requests are rate limited."""
+        for _ in range(2):
+            res = self.client.get(self.search_url, {'q': 'ma'})
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.get(self.search_url, {'q': 'ma'})
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @skipUnless(connection.vendor == 'postgresql', 'EXPLAIN is Postgres')
+    def test_search_uses_prefix_indexes(self):
+        """Test the prefix lookup is served by the expression indexes."""
+        get_user_model().objects.bulk_create([
+            get_user_model()(
+                email='user%d@example.com' % i,
+                username='user%d' % i
+            )
+            for i in range(2000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_user')
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.search_url, {'q': 'ma'})
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN ' + ctx.captured_queries[-1]['sql'])
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertIn('user_username_prefix_idx', plan)
+        self.assertIn('user_email_prefix_idx', plan)
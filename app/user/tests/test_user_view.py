@@ -29,6 +29,7 @@ class UserAPITests(UserAPITestSetup):
         self.assertEqual(res.data['email'], self.user_data['email'])
         self.assertEqual(res.data['username'], self.user_data['username'])
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.run_tasks()
         self.assertEqual(len(mail.outbox), 1)
         self.assertEqual(mail.outbox[0].subject, 'Verify your email')
 
@@ -40,6 +41,7 @@ class UserAPITests(UserAPITestSetup):
             format="json",
         )
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.run_tasks()
         self.assertEqual(len(mail.outbox), 1)
         self.assertEqual(mail.outbox[0].subject, 'Verify your email')
 
@@ -52,6 +54,7 @@ class UserAPITests(UserAPITestSetup):
             format="json",
         )
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.run_tasks()
         self.assertEqual(len(mail.outbox), 2)
         self.assertEqual(mail.outbox[1].subject, 'Verify your email')
 
@@ -91,6 +94,7 @@ class UserAPITests(UserAPITestSetup):
             self.user_data,
             format="json"
         )
+        self.run_tasks()
         self.assertEqual(len(mail.outbox), 1)
         self.assertEqual(mail.outbox[0].subject, 'Verify your email')
 
@@ -100,6 +104,7 @@ class UserAPITests(UserAPITestSetup):
             format="json"
         )
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.run_tasks()
         self.assertEqual(len(mail.outbox), 2)
         self.assertEqual(mail.outbox[1].subject, 'Verify your email')
         self.assertEqual(mail.outbox[1].to[0], self.user_data['email'])
@@ -0,0 +1,108 @@
+"""
+Throttles for the user API
+"""
+import hashlib
+import time
+
+from django.core.cache import cache as default_cache
+
+from rest_framework.throttling import SimpleRateThrottle, UserRateThrottle
+
+
+class UserSearchThrottle(UserRateThrottle):
+    """Limit typeahead user search per authenticated user"""
+    scope = 'user_search'
+
+
+class DataExportThrottle(UserRateThrottle):
+    """Limit how many data export archives a user can have built"""
+    scope = 'data_export'
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """Token bucket kept in the cache.
+    The rate 'N/period' of '<view.throttle_scope>_<kind>' gives a bucket
+    of N tokens refilled continuously over the period, so bursts up to N
+    are allowed while the average rate stays at N per period. The bucket
+    is read and written under a short cache.add() lock, which is atomic
+    on every Django cache backend."""
+    cache = default_cache
+    timer = time.time
+    kind = None
+    lock_timeout = 2
+    lock_attempts = 10
+    lock_delay = 0.01
+
+    def __init__(self):
+        # The scope depends on the view, so rates are resolved per request
+        pass
+
+    def get_ident_key(self, request):
+        """Value the bucket is keyed on, None to skip throttling. The
+        client IP unless overridden, see NUM_PROXIES."""
+        return self.get_ident(request)
+
+    def get_cache_key(self, request, view):
+        ident = self.get_ident_key(request)
+        if not ident:
+            return None
+        digest = hashlib.sha256(ident.encode()).hexdigest()
+        return 'throttle_%s_%s' % (self.scope, digest)
+
+    def allow_request(self, request, view):
+        self.scope = '%s_%s' % (getattr(view, 'throttle_scope', ''), self.kind)
+        if self.scope not in self.THROTTLE_RATES:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.retry_after = self.take_token()
+        return self.retry_after is None
+
+    def take_token(self):
+        """Remove a token, return None or the seconds until one refills"""
+        lock = self.key + ':lock'
+        for _ in range(self.lock_attempts):
+            if self.cache.add(lock, 1, self.lock_timeout):
+                break
+            time.sleep(self.lock_delay)
+        else:
+            # Someone else is hammering the same key, that is a burst too
+            return self.duration / self.num_requests
+
+        try:
+            now = self.timer()
+            tokens, stamp = self.cache.get(
+                self.key, (self.num_requests, now))
+            refill = (now - stamp) * self.num_requests / self.duration
+            tokens = min(self.num_requests, tokens + refill)
+            if tokens >= 1:
+                tokens -= 1
+                wait = None
+            else:
+                wait = (1 - tokens) * self.duration / self.num_requests
+            self.cache.set(self.key, (tokens, now), self.duration)
+        finally:
+            self.cache.delete(lock)
+        return wait
+
+    def wait(self):
+        return self.retry_after
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """Token bucket per client IP"""
+    kind = 'ip'
+
+
+class EmailTokenBucketThrottle(TokenBucketThrottle):
+    """Token bucket per target email address"""
+    kind = 'email'
+
+    def get_ident_key(self, request):
+        email = request.data.get('email', '')
+        if not isinstance(email, str):
+            return None
+        return email.strip().lower()
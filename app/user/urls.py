@@ -21,6 +21,27 @@ urlpatterns = [
             name='verify-email'
         ),
     path('me/', views.ManageUserView.as_view(), name='me'),
+    path(
+        'deletions/<uuid:id>/',
+        views.AccountDeletionView.as_view(),
+        name='account-deletion'
+        ),
+    path(
+        'me/export/',
+        views.RequestDataExportView.as_view(),
+        name='request-data-export'
+        ),
+    path(
+        'exports/<uuid:id>/',
+        views.DataExportView.as_view(),
+        name='data-export'
+        ),
+    path(
+        'exports/<uuid:id>/download/',
+        views.DataExportDownloadView.as_view(),
+        name='data-export-download'
+        ),
+    path('search/', views.UserSearchView.as_view(), name='search'),
     path('token-refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path(
         'request-password-reset/',
@@ -3,19 +3,20 @@ Views for the user API
 """
 from rest_framework import generics, status, permissions
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.exceptions import ErrorDetail
 
 from django.contrib.auth import get_user_model
 from django.contrib.sites.shortcuts import get_current_site
+from django.core.cache import cache
+from django.http import FileResponse
+from django.db.models import Q
 from django.urls import reverse
 from django.conf import settings
 from django.utils.encoding import (
                                     smart_str,
-                                    smart_bytes,
                                     DjangoUnicodeDecodeError
 )
-from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.utils.http import urlsafe_base64_decode
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 
 from .renderers import UserRenderer # noqa , it's not used. I leave it because for future reference
@@ -25,37 +26,40 @@ from .serializers import (
                             LoginSerializer,
                             EmailVerificationSerializer,
                             UserSerializer,
+                            AccountDeletionSerializer,
+                            DataExportSerializer,
                             RequestPasswordResetSerializer,
                             SetNewPasswordSerializer
 )
 
-from .utils import Util
+from core.accounts import request_deletion
+from core.exports import request_export
+from core.models import AccountDeletion, DataExport
+from core.replicas import ReplicaReadMixin
 
+from .throttling import (
+                            DataExportThrottle,
+                            EmailTokenBucketThrottle,
+                            IPTokenBucketThrottle,
+                            UserSearchThrottle
+)
+from .tasks import email_password_reset, email_verification
+from myProfile.serializers import FriendSerializer
+
+import hashlib
 import jwt
 
 
 def send_verification_email(request):
     user = get_user_model().objects.get(email=request.data['email'])
-    token = RefreshToken.for_user(user).access_token
-    current_site = get_current_site(request).domain
-    relativeLink = reverse('user:verify-email')
-    absurl = 'http://'+current_site + relativeLink + "?token=" + str(token)
-    email_body = 'Hi '+user.username +  \
-        ' Use link below to verify your email \n' \
-        + 'domain: ' + absurl
-    data = {
-        'domain': absurl,
-        'email_subject': 'Verify your email',
-        'email_body': email_body,
-        'email_to': [user.email]
-    }
-
-    Util.send_email(data)
+    email_verification.delay(user.id, get_current_site(request).domain)
 
 
 class RegisterView(generics.GenericAPIView):
     """Register user"""
     serializer_class = RegisterSerializer
+    throttle_classes = [IPTokenBucketThrottle, EmailTokenBucketThrottle]
+    throttle_scope = 'register'
     # renderer_classes = (UserRenderer, )
 
     def post(self, request):
@@ -97,6 +101,8 @@ class RegisterView(generics.GenericAPIView):
 class VerifyEmailView(generics.GenericAPIView):
     """Verify Email"""
     serializer_class = EmailVerificationSerializer
+    throttle_classes = [IPTokenBucketThrottle, EmailTokenBucketThrottle]
+    throttle_scope = 'verify_email'
 
     def get(self, request):
         """Verify Email or Send Verification Error"""
@@ -132,6 +138,8 @@ class VerifyEmailView(generics.GenericAPIView):
 class LoginAPIView(generics.GenericAPIView):
     """Authenticate and return tokens for user"""
     serializer_class = LoginSerializer
+    throttle_classes = [IPTokenBucketThrottle, EmailTokenBucketThrottle]
+    throttle_scope = 'login'
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
@@ -152,7 +160,8 @@ class LoginAPIView(generics.GenericAPIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(ReplicaReadMixin,
+                     generics.RetrieveUpdateDestroyAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -161,10 +170,78 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
         """Retrieve and return the authenticated user"""
         return self.request.user
 
+    def destroy(self, request, *args, **kwargs):
+        """Deactivate the user at once and delete their data in the
+        background, return where to follow the deletion"""
+        deletion = request_deletion(self.get_object())
+        location = reverse(
+            'user:account-deletion', kwargs={'id': deletion.id})
+        return Response(
+            AccountDeletionSerializer(deletion).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': location},
+        )
+
+
+class AccountDeletionView(generics.RetrieveAPIView):
+    """Progress of an account deletion, its user is gone once done so
+    the unguessable id is the only key"""
+    serializer_class = AccountDeletionSerializer
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    queryset = AccountDeletion.objects.all()
+    lookup_field = 'id'
+
+
+class RequestDataExportView(generics.GenericAPIView):
+    """Ask for an archive of the authenticated user's data"""
+    serializer_class = DataExportSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [DataExportThrottle]
+
+    def post(self, request):
+        """Queue the export, return where to follow it"""
+        export = request_export(request.user)
+        location = reverse('user:data-export', kwargs={'id': export.id})
+        return Response(
+            self.get_serializer(export).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': location},
+        )
+
+
+class DataExportView(generics.RetrieveAPIView):
+    """Progress of one of the authenticated user's data exports"""
+    serializer_class = DataExportSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_field = 'id'
+
+    def get_queryset(self):
+        return DataExport.objects.filter(owner=self.request.user)
+
+
+class DataExportDownloadView(DataExportView):
+    """Download the archive of a finished data export"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(status=DataExport.DONE)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Stream the archive from the storage"""
+        export = self.get_object()
+        return FileResponse(
+            export.file.open('rb'),
+            as_attachment=True,
+            filename='data-export-%s.zip' % export.created_at.date(),
+            content_type='application/zip',
+        )
+
 
 class RequestPasswordResetEmail(generics.GenericAPIView):
     """Request password reset"""
     serializer_class = RequestPasswordResetSerializer
+    throttle_classes = [IPTokenBucketThrottle, EmailTokenBucketThrottle]
+    throttle_scope = 'password_reset'
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data) # noqa
@@ -173,25 +250,11 @@ class RequestPasswordResetEmail(generics.GenericAPIView):
 
         if get_user_model().objects.filter(email=email).exists():
             user = get_user_model().objects.get(email=email)
-            uidb64 = urlsafe_base64_encode(smart_bytes(user.id))
-            token = PasswordResetTokenGenerator().make_token(user)
-            current_site = get_current_site(request=request).domain
-            relativeLink = reverse(
-                                    'user:validate-password-reset',
-                                    kwargs={'uidb64': uidb64, 'token': token}
-                                )
-            redirect_url = request.data.get('redirect_url', '')
-            absurl = 'http://'+current_site + relativeLink
-            email_body = 'Hello, \n' + \
-                'Use link below to reset your password  \n' + \
-                absurl+"?redirect_url="+redirect_url
-            data = {
-                'email_body': email_body,
-                'email_to': [user.email],
-                'email_subject': 'Reset your passsword'
-                }
-
-            Util.send_email(data)
+            email_password_reset.delay(
+                user.id,
+                get_current_site(request=request).domain,
+                request.data.get('redirect_url', '')
+            )
             return Response(
                 {'success': 'We have sent you a link to reset your password'},
                 status=status.HTTP_200_OK
@@ -248,3 +311,40 @@ class CompletePasswordReset(generics.GenericAPIView):
             {'success': True, 'message': 'Password reset success'},
             status=status.HTTP_200_OK
             )
+
+
+class UserSearchView(generics.GenericAPIView):
+    """Find users by username or email prefix"""
+    serializer_class = FriendSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [UserSearchThrottle]
+    min_length = 2
+    max_results = 10
+    cache_timeout = 60
+
+    def search(self, prefix):
+        """Return matching users, cached per prefix"""
+        key = 'user-search:' + hashlib.md5(prefix.encode()).hexdigest()
+        results = cache.get(key)
+        if results is None:
+            users = get_user_model().objects.filter(
+                Q(username__istartswith=prefix) |
+                Q(email__istartswith=prefix),
+                is_active=True
+            ).only('id', 'username', 'email').order_by('username')
+            # one extra row so the caller can still drop itself
+            results = self.get_serializer(
+                users[:self.max_results + 1], many=True).data
+            cache.set(key, results, self.cache_timeout)
+        return results
+
+    def get(self, request):
+        """Return up to max_results users matching ?q="""
+        prefix = request.query_params.get('q', '').strip().lower()
+        if len(prefix) < self.min_length:
+            return Response({'results': []}, status=status.HTTP_200_OK)
+        results = [
+            user for user in self.search(prefix)
+            if user['id'] != request.user.id
+        ][:self.max_results]
+        return Response({'results': results}, status=status.HTTP_200_OK)